@@ -0,0 +1,94 @@
+"""
+Query parsing and response bodies for /api/activities
+
+    GET /api/activities                          every activity, as a JSON array (streamed)
+    GET /api/activities?limit=50                 one page: {"activities": [...], "next_cursor": "..."}
+    GET /api/activities?limit=50&cursor=...      the following page
+    GET /api/activities?format=ndjson            one JSON object per line, streamed from the cursor
+
+Filters: category, breed_size, age_group, weather, tag. Projection:
+fields=name,category,description (e.g. to skip the instructions arrays).
+Cursors are opaque keyset positions over (category, name, id), so pages stay
+stable while activities are being imported.
+"""
+
+import base64
+import json
+from typing import Dict, Any, Iterator, Tuple
+
+API_FIELDS = [
+    'name', 'category', 'description', 'materials', 'instructions',
+    'safety_notes', 'estimated_time', 'difficulty_level', 'energy_required',
+    'weather_suitable', 'breed_sizes', 'age_groups', 'tags'
+]
+
+FILTERS = ('category', 'breed_size', 'age_group', 'weather', 'tag')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class QueryError(ValueError):
+    """A malformed /api/activities query (answered with 400)"""
+
+def encode_cursor(key: Tuple[str, str, int]) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        category, name, activity_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(category), str(name), int(activity_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise QueryError('invalid cursor') from e
+
+def parse_query(args) -> Dict[str, Any]:
+    """Turn request args into keyword arguments for EnrichmentDatabase.iter_activities"""
+    query = {name: args.get(name) or None for name in FILTERS}
+    
+    fields = args.get('fields')
+    if fields:
+        query['fields'] = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in query['fields'] if field not in API_FIELDS]
+        if unknown or not query['fields']:
+            raise QueryError(f"unknown fields: {', '.join(unknown)}" if unknown else 'no fields requested')
+    else:
+        query['fields'] = API_FIELDS
+    
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            query['limit'] = max(1, min(int(limit), MAX_PAGE_SIZE))
+        except ValueError as e:
+            raise QueryError('limit must be an integer') from e
+    
+    cursor = args.get('cursor')
+    if cursor:
+        query['after'] = decode_cursor(cursor)
+        query.setdefault('limit', DEFAULT_PAGE_SIZE)
+    return query
+
+def fetch_page(db, query: Dict[str, Any]) -> Dict[str, Any]:
+    """One page plus the cursor for the next one (None on the last page)"""
+    limit = query['limit']
+    # Ask for one extra row to know whether another page follows
+    rows = list(db.iter_activities(**dict(query, limit=limit + 1)))
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return {
+        'activities': [activity for _, activity in rows[:limit]],
+        'next_cursor': next_cursor
+    }
+
+def iter_json_array(db, query: Dict[str, Any]) -> Iterator[str]:
+    """The legacy response (a JSON array of every match), produced row by row"""
+    yield '['
+    first = True
+    for _, activity in db.iter_activities(**query):
+        yield ('' if first else ',') + json.dumps(activity)
+        first = False
+    yield ']'
+
+def iter_ndjson(db, query: Dict[str, Any]) -> Iterator[str]:
+    """One activity per line"""
+    for _, activity in db.iter_activities(**query):
+        yield json.dumps(activity) + '\n'
@@ -0,0 +1,135 @@
+"""
+Duplicate detection for activity imports
+
+The library's names are read once into memory, with two derived keys per
+activity, and every candidate is checked against those sets instead of
+querying SQLite per row:
+
+- the exact name (the database enforces this one with a UNIQUE index),
+- a normalized name: case, accents, punctuation, filler words and plural
+  endings removed, so "The Snuffle-Mat Game" meets "snuffle mat games",
+- a content fingerprint: a hash of the normalized instructions, which catches
+  the same activity imported under a different title.
+
+Activities accepted through add() join the sets, so duplicates inside one
+import batch are caught too. Importers call store(), which filters a batch,
+writes what is left with EnrichmentDatabase.add_activities and remembers it.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Words that don't distinguish one activity title from another
+FILLER_WORDS = {'a', 'an', 'the', 'and', 'or', 'for', 'with', 'your', 'dog', 'dogs', 'activity', 'game'}
+
+class DuplicateMatch(NamedTuple):
+    reason: str  # 'name', 'similar name' or 'same content'
+    existing_name: str
+    
+    def __str__(self) -> str:
+        if self.reason == 'name':
+            return 'already exists'
+        if self.reason == 'similar name':
+            return f"similar to '{self.existing_name}'"
+        return f"same instructions as '{self.existing_name}'"
+
+def _words(text: str) -> List[str]:
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def normalize_name(name: str) -> str:
+    """Title reduced to its distinguishing words, singular, in order"""
+    words = []
+    for word in _words(name):
+        if word in FILLER_WORDS or word.rstrip('s') in FILLER_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        words.append(word)
+    return ' '.join(words)
+
+def content_fingerprint(activity: Dict[str, Any]) -> Optional[str]:
+    """Hash of the normalized instructions, or None when there are none to compare"""
+    instructions = activity.get('instructions') or []
+    if isinstance(instructions, str):
+        instructions = [instructions]
+    words = _words(' '.join(str(step) for step in instructions))
+    if len(words) < 5:
+        return None
+    return hashlib.sha1(' '.join(words).encode('utf-8')).hexdigest()
+
+class ActivityDeduplicator:
+    def __init__(self, activities: Iterable[Dict[str, Any]] = ()):
+        self.names = set()
+        self._normalized = {}
+        self._fingerprints = {}
+        for activity in activities:
+            self.add(activity)
+    
+    @classmethod
+    def from_database(cls, db) -> 'ActivityDeduplicator':
+        """Remember every stored activity (read from the in-memory activity index)"""
+        return cls(db.get_activity_index().activities)
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def find(self, activity: Dict[str, Any]) -> Optional[DuplicateMatch]:
+        """The first way activity duplicates a known one, or None"""
+        name = activity.get('name') or ''
+        if name in self.names:
+            return DuplicateMatch('name', name)
+        existing = self._normalized.get(normalize_name(name))
+        if existing is not None:
+            return DuplicateMatch('similar name', existing)
+        existing = self._fingerprints.get(content_fingerprint(activity))
+        if existing is not None:
+            return DuplicateMatch('same content', existing)
+        return None
+    
+    def add(self, activity: Dict[str, Any]):
+        """Remember an activity (the first one to claim a key keeps it)"""
+        name = activity.get('name') or ''
+        self.names.add(name)
+        normalized = normalize_name(name)
+        if normalized:
+            self._normalized.setdefault(normalized, name)
+        fingerprint = content_fingerprint(activity)
+        if fingerprint is not None:
+            self._fingerprints.setdefault(fingerprint, name)
+    
+    def partition(self, activities: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], DuplicateMatch]]]:
+        """
+        Split activities into (new, [(duplicate, match)]). New activities are
+        checked against each other as well, but are only remembered once
+        add() is called for them (i.e. after they were stored).
+        """
+        batch = ActivityDeduplicator()
+        new, duplicates = [], []
+        for activity in activities:
+            match = self.find(activity) or batch.find(activity)
+            if match is None:
+                new.append(activity)
+                batch.add(activity)
+            else:
+                duplicates.append((activity, match))
+        return new, duplicates
+    
+    def store(self, db, activities: Iterable[Dict[str, Any]]) -> Dict[str, list]:
+        """
+        Add the activities that aren't duplicates to db in one transaction and
+        remember them. Returns add_activities' result, with 'duplicates' as
+        [(name, DuplicateMatch)] covering everything that was left out.
+        """
+        new, duplicates = self.partition(activities)
+        result = db.add_activities(new, on_conflict='skip', skip_invalid=True)
+        added = set(result['added'])
+        for activity in new:
+            if activity.get('name') in added:
+                self.add(activity)
+        result['duplicates'] = [(activity.get('name'), match) for activity, match in duplicates]
+        # Names another writer stored since this deduplicator was loaded
+        result['duplicates'] += [(name, DuplicateMatch('name', name)) for name in result['skipped']]
+        return result
@@ -0,0 +1,246 @@
+"""
+Local semantic retrieval over the activity library
+
+Each activity is embedded as a hashed TF-IDF vector: its words (lightly
+stemmed) and adjacent word pairs are hashed into EMBEDDING_DIM signed buckets,
+weighted by 1 + log(term count) and by the bucket's inverse document
+frequency, then L2-normalized. No model download and no network: the same
+text always maps to the same vector.
+
+The vectors form one contiguous float32 matrix whose rows follow the activity
+index positions, so scoring a question against the library (or against a
+candidate list) is a single matrix-vector product. The matrix is saved next to
+the database in <db>.embeddings.npz, together with the activity ids, a checksum
+of each row's text and the IDF weights. When the library changes only new or
+edited rows are embedded again; the IDF weights are re-fit once
+EMBEDDING_REFIT_FRACTION of the rows were embedded with older weights.
+
+numpy is optional, and only imported once something is embedded: without it
+(or with EMBEDDINGS_ENABLED=0) callers get None from
+EnrichmentDatabase.get_activity_embeddings and keep their keyword order.
+"""
+
+import importlib.util
+import logging
+import math
+import os
+import re
+import tempfile
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from app_logging import get_logger, log_event
+
+logger = get_logger('embeddings')
+
+# Whether numpy is installed, checked without importing it
+EMBEDDINGS_ENABLED = (importlib.util.find_spec('numpy') is not None
+                      and os.environ.get('EMBEDDINGS_ENABLED', '1').lower() not in ('0', 'false', 'no'))
+EMBEDDING_DIM = int(os.environ.get('EMBEDDING_DIM', 4096))
+EMBEDDING_REFIT_FRACTION = float(os.environ.get('EMBEDDING_REFIT_FRACTION', 0.2))
+# Scores below this are hash collisions and filler words, not relevance
+EMBEDDING_MIN_SCORE = float(os.environ.get('EMBEDDING_MIN_SCORE', 0.1))
+
+# Activity text that is embedded, with how often each field is counted
+FIELD_WEIGHTS = {
+    'name': 3,
+    'tags': 2,
+    'category': 1,
+    'description': 1,
+    'materials': 1,
+    'instructions': 1
+}
+
+STOPWORDS = {
+    'a', 'an', 'and', 'the', 'is', 'are', 'am', 'my', 'i', 'me', 'do', 'does', 'can', 'could',
+    'would', 'should', 'please', 'some', 'any', 'for', 'to', 'of', 'in', 'on', 'with', 'what',
+    'how', 'it', 'be', 'or', 'your', 'you', 'dog', 'dogs', 'this', 'that', 'at', 'as', 'from'
+}
+
+def embeddings_path(db_path: str) -> str:
+    """Where the embeddings for a database are saved"""
+    return os.path.splitext(db_path)[0] + '.embeddings.npz'
+
+def _stem(word: str) -> str:
+    """Fold the common English endings so 'chewing' and 'chews' meet 'chew'"""
+    for suffix in ('ing', 'ed', 's'):
+        if word.endswith(suffix) and len(word) > len(suffix) + 2 and not word.endswith(('ss', 'us')):
+            return word[:-len(suffix)]
+    return word
+
+def features(text: str) -> List[str]:
+    """Stemmed words plus adjacent word pairs, stopwords removed"""
+    words = [_stem(word) for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+def activity_text(activity: Dict[str, Any]) -> List[str]:
+    """The embedded text of an activity, one string per field repeat"""
+    parts = []
+    for field, weight in FIELD_WEIGHTS.items():
+        value = activity.get(field) or ''
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(item) for item in value)
+        parts.extend([str(value)] * weight)
+    return parts
+
+def _hashed_counts(texts: Iterable[str], dim: int) -> Dict[int, float]:
+    """bucket -> signed, sublinear term weight (before IDF)"""
+    counts = Counter()
+    for text in texts:
+        counts.update(features(text))
+    buckets = {}
+    for feature, count in counts.items():
+        digest = zlib.crc32(feature.encode('utf-8'))
+        bucket = digest % dim
+        sign = -1.0 if digest & 0x80000000 else 1.0
+        buckets[bucket] = buckets.get(bucket, 0.0) + sign * (1.0 + math.log(count))
+    return buckets
+
+def _checksum(texts: Sequence[str]) -> int:
+    return zlib.crc32('\x1f'.join(texts).encode('utf-8'))
+
+class ActivityEmbeddings:
+    """An immutable snapshot of the library's vectors, aligned with ActivityIndex positions"""
+    
+    def __init__(self, matrix, idf, ids, checksums, data_version: Optional[int] = None,
+                 stale_rows: int = 0, reembedded: int = 0):
+        self.matrix = matrix
+        self.idf = idf
+        self.ids = ids
+        self.checksums = checksums
+        self.data_version = data_version
+        # Rows embedded since the IDF weights were last fit
+        self.stale_rows = stale_rows
+        # Rows (re)embedded when this snapshot was built
+        self.reembedded = reembedded
+    
+    @property
+    def dim(self) -> int:
+        return self.idf.shape[0]
+    
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+    
+    def embed(self, text: str):
+        """Unit query vector for text (all zeros when nothing in it is known)"""
+        import numpy as np
+        
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, weight in _hashed_counts([text], self.dim).items():
+            vector[bucket] = weight
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    def scores(self, text: str, positions: Optional[Sequence[int]] = None):
+        """Cosine similarity of text to every activity, or to the given positions"""
+        import numpy as np
+        
+        matrix = self.matrix if positions is None else self.matrix[np.asarray(positions, dtype=np.intp)]
+        return matrix @ self.embed(text)
+    
+    def top_k(self, text: str, k: int, positions: Optional[Sequence[int]] = None) -> List[int]:
+        """Positions of the k activities most similar to text, best first"""
+        import numpy as np
+        
+        if k <= 0 or len(self) == 0 or (positions is not None and not len(positions)):
+            return []
+        scores = self.scores(text, positions)
+        k = min(k, scores.shape[0])
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        best = best[scores[best] >= EMBEDDING_MIN_SCORE]
+        if positions is not None:
+            return [positions[offset] for offset in best.tolist()]
+        return best.tolist()
+    
+    def rank(self, text: str, positions: Sequence[int]) -> List[int]:
+        """All the given positions, most similar to text first (ties keep their order)"""
+        import numpy as np
+        
+        if not len(positions):
+            return []
+        scores = self.scores(text, positions)
+        return [positions[offset] for offset in np.argsort(-scores, kind='stable').tolist()]
+
+def build_embeddings(activities: Sequence[Dict[str, Any]], data_version: Optional[int] = None,
+                     previous: Optional[ActivityEmbeddings] = None, dim: int = EMBEDDING_DIM) -> ActivityEmbeddings:
+    """
+    Embed activities (in index order). Rows of previous whose id and text are
+    unchanged are copied; the rest are embedded with previous's IDF weights
+    unless too many rows have drifted, in which case everything is re-fit.
+    """
+    import numpy as np
+    
+    texts = [activity_text(activity) for activity in activities]
+    checksums = np.array([_checksum(parts) for parts in texts], dtype=np.uint32)
+    ids = np.array([activity['id'] for activity in activities], dtype=np.int64)
+    
+    if previous is not None and previous.dim == dim:
+        previous_rows = {(int(activity_id), int(checksum)): row
+                         for row, (activity_id, checksum) in enumerate(zip(previous.ids, previous.checksums))}
+        reused = [previous_rows.get((int(activity_id), int(checksum))) for activity_id, checksum in zip(ids, checksums)]
+        changed = [position for position, row in enumerate(reused) if row is None]
+        stale_rows = previous.stale_rows + len(changed)
+        if stale_rows <= EMBEDDING_REFIT_FRACTION * len(activities):
+            matrix = np.zeros((len(activities), dim), dtype=np.float32)
+            kept = [(position, row) for position, row in enumerate(reused) if row is not None]
+            if kept:
+                positions, rows = zip(*kept)
+                matrix[list(positions)] = previous.matrix[list(rows)]
+            for position in changed:
+                matrix[position] = _unit_row(_hashed_counts(texts[position], dim), previous.idf, dim)
+            return ActivityEmbeddings(matrix, previous.idf, ids, checksums, data_version, stale_rows, len(changed))
+    
+    counts = [_hashed_counts(parts, dim) for parts in texts]
+    document_frequency = np.zeros(dim, dtype=np.float32)
+    for buckets in counts:
+        document_frequency[list(buckets)] += 1
+    idf = (np.log((1 + len(counts)) / (1 + document_frequency)) + 1).astype(np.float32)
+    matrix = np.zeros((len(counts), dim), dtype=np.float32)
+    for position, buckets in enumerate(counts):
+        matrix[position] = _unit_row(buckets, idf, dim)
+    return ActivityEmbeddings(matrix, idf, ids, checksums, data_version, 0, len(counts))
+
+def _unit_row(buckets: Dict[int, float], idf, dim: int):
+    import numpy as np
+    
+    row = np.zeros(dim, dtype=np.float32)
+    if buckets:
+        indexes = np.fromiter(buckets, dtype=np.intp, count=len(buckets))
+        row[indexes] = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets)) * idf[indexes]
+    norm = np.linalg.norm(row)
+    return row / norm if norm else row
+
+def load_embeddings(path: str) -> Optional[ActivityEmbeddings]:
+    """The saved snapshot, or None when missing or inconsistent"""
+    import numpy as np
+    
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as saved:
+            matrix, ids, checksums, idf = saved['matrix'], saved['ids'], saved['checksums'], saved['idf']
+            stale_rows = int(saved['stale_rows'])
+    except (OSError, KeyError, ValueError) as e:
+        log_event(logger, logging.WARNING, 'embeddings_unreadable', path=path, error=str(e))
+        return None
+    if matrix.ndim != 2 or matrix.shape != (len(ids), idf.shape[0]) or len(checksums) != len(ids):
+        return None
+    return ActivityEmbeddings(np.ascontiguousarray(matrix, dtype=np.float32), idf, ids, checksums, stale_rows=stale_rows)
+
+def save_embeddings(embeddings: ActivityEmbeddings, path: str):
+    """Write the snapshot to a temporary file and move it into place, so readers see old or new"""
+    import numpy as np
+    
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.npz')
+    try:
+        with os.fdopen(handle, 'wb') as temp_file:
+            np.savez(temp_file, matrix=embeddings.matrix, ids=embeddings.ids, checksums=embeddings.checksums,
+                     idf=embeddings.idf, stale_rows=embeddings.stale_rows)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
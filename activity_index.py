@@ -0,0 +1,126 @@
+"""
+In-memory activity index
+
+Holds every activity decoded once, plus integer bitsets (one bit per activity)
+for category, breed size, age group, weather and energy. A profile lookup is a
+handful of bitwise ANDs/ORs, with no SQL involved. The matching positions are
+cached per profile, so picking k random activities is k random offsets into
+that list (see sampling.Sampler) rather than a shuffle of every candidate.
+
+Attribute bitsets reproduce the SQL matching they replace: `breed_sizes LIKE
+'%Small%'` was a case-insensitive substring test, so the same test is applied
+to each attribute value when a bitset is first requested. Breed sizes and age
+groups come from the normalized attribute tables; single-valued attributes
+(weather, energy) come straight from their column.
+"""
+
+import json
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from sampling import Sampler
+
+ACTIVITY_COLUMNS = [
+    'id', 'name', 'category', 'subcategory', 'description', 'materials',
+    'instructions', 'safety_notes', 'estimated_time', 'difficulty_level',
+    'energy_required', 'weather_suitable', 'breed_sizes', 'age_groups', 'tags'
+]
+
+JSON_COLUMNS = ('materials', 'instructions', 'breed_sizes', 'age_groups', 'tags')
+
+# Attributes that get a bitset, mapped to the activity column holding them
+INDEXED_ATTRIBUTES = {
+    'breed_size': 'breed_sizes',
+    'age_group': 'age_groups',
+    'weather': 'weather_suitable',
+    'energy': 'energy_required'
+}
+
+class ActivityIndex:
+    def __init__(self, rows: Iterable[tuple], attribute_values: Dict[str, Dict[int, List[str]]] = None,
+                 data_version: Optional[int] = None):
+        """
+        Build the index from rows selected in ACTIVITY_COLUMNS order.
+        attribute_values optionally maps an attribute to {activity id: [values]}
+        (e.g. from activity_breed_size); other attributes use their column.
+        data_version records which library version the rows were read at.
+        """
+        attribute_values = attribute_values or {}
+        self.data_version = data_version
+        self.activities = []
+        # activity id -> position in activities
+        self.positions = {}
+        self._raw = {attribute: [] for attribute in INDEXED_ATTRIBUTES}
+        self.category_bits = {}
+        
+        for position, row in enumerate(rows):
+            record = dict(zip(ACTIVITY_COLUMNS, row))
+            
+            for attribute, column in INDEXED_ATTRIBUTES.items():
+                if attribute in attribute_values:
+                    values = attribute_values[attribute].get(record['id'], [])
+                else:
+                    values = [record[column] or '']
+                self._raw[attribute].append([str(value).lower() for value in values])
+            
+            for column in JSON_COLUMNS:
+                record[column] = json.loads(record[column]) if record[column] else []
+            
+            self.activities.append(record)
+            self.positions[record['id']] = position
+            category = record['category']
+            self.category_bits[category] = self.category_bits.get(category, 0) | (1 << position)
+        
+        self.all_bits = (1 << len(self.activities)) - 1
+        self._attribute_bits = {attribute: {} for attribute in INDEXED_ATTRIBUTES}
+        self._match_positions = {}
+    
+    def __len__(self) -> int:
+        return len(self.activities)
+    
+    def attribute_bits(self, attribute: str, value: str) -> int:
+        """Bitset of activities with an attribute value containing value (LIKE '%value%')"""
+        cache = self._attribute_bits[attribute]
+        bits = cache.get(value)
+        if bits is None:
+            needle = value.lower()
+            bits = 0
+            for position, values in enumerate(self._raw[attribute]):
+                if any(needle in text for text in values):
+                    bits |= 1 << position
+            cache[value] = bits
+        return bits
+    
+    def match_bits(self, category: Optional[str], breed_size: str, age_group: str, weather: str) -> int:
+        """Bitset of activities matching a profile; category None means any category"""
+        bits = self.all_bits if category is None else self.category_bits.get(category, 0)
+        bits &= self.attribute_bits('breed_size', breed_size) | self.attribute_bits('breed_size', 'All')
+        bits &= self.attribute_bits('age_group', age_group) | self.attribute_bits('age_group', 'All')
+        bits &= self.attribute_bits('weather', weather) | self.attribute_bits('weather', 'Any')
+        return bits
+    
+    def match_positions(self, category: Optional[str], breed_size: str, age_group: str, weather: str) -> Tuple[int, ...]:
+        """Positions of the activities matching a profile, cached per profile"""
+        key = (category, breed_size, age_group, weather)
+        positions = self._match_positions.get(key)
+        if positions is None:
+            positions = tuple(iter_bits(self.match_bits(category, breed_size, age_group, weather)))
+            self._match_positions[key] = positions
+        return positions
+    
+    def match(self, category: Optional[str], breed_size: str, age_group: str, weather: str) -> List[Dict[str, Any]]:
+        """All activities matching a profile, in database order"""
+        return [self.activities[position] for position in self.match_positions(category, breed_size, age_group, weather)]
+    
+    def sample(self, category: Optional[str], breed_size: str, age_group: str, weather: str, limit: int,
+               sampler: Optional[Sampler] = None) -> List[Dict[str, Any]]:
+        """Random selection of up to limit matching activities"""
+        positions = self.match_positions(category, breed_size, age_group, weather)
+        return [self.activities[position] for position in (sampler or _default_sampler).sample(positions, limit)]
+
+_default_sampler = Sampler()
+
+def iter_bits(bits: int):
+    """Yield the positions of the set bits, lowest first"""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
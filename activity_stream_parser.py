@@ -0,0 +1,437 @@
+"""
+Streaming activity parsers
+
+The drop-folder and text importers used to read a whole file, split it into
+sections with re.split and parse each section from a string, so a
+multi-hundred-MB export needed several copies of itself in memory. The
+generators here read the same formats one line at a time, from a text file,
+a binary file or an mmap, and yield each activity as soon as its section ends.
+Only the activity being built is kept, never the text.
+
+The importers' string parsers (parse_activities_from_content,
+parse_simple_format, parse_activity_text and the parse_single_* functions)
+run these over io.StringIO, so each format has this one implementation,
+quirks included:
+
+- stream_simple_activities splits the way the original re.split did. That
+  pattern had no re.MULTILINE, so it only ever separates a "**Title**" line
+  that ends the file; everything before it is parsed as one section.
+- stream_text_activities: a section starts at a capitalized line followed by
+  a "🏃 ..." line, and a file without any such header is split on blank lines
+  instead. Which reading applies is decided by a first pass (has_text_headers)
+  that stops at the first header, so the source must be seekable.
+"""
+
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+# Section headings of the simple **Activity Name** format
+SIMPLE_SECTIONS = (
+    ('**•Materials Needed**', 'materials'),
+    ('**•Step-by-Step Instructions**', 'instructions'),
+    ('**•Safety Notes**', 'safety'),
+    ('**•Estimated Time**', 'time'),
+    ('**•Description**', 'description')
+)
+
+def iter_lines(source) -> Iterator[str]:
+    """Lines of a text file, binary file or mmap, with newlines translated as in text mode"""
+    line = source.readline()
+    if isinstance(line, str):
+        while line:
+            yield line
+            line = source.readline()
+        return
+    while line:
+        text = line.decode('utf-8')
+        if '\r' in text:
+            pieces = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+            for piece in pieces[:-1]:
+                yield piece + '\n'
+            if pieces[-1]:
+                yield pieces[-1]
+        else:
+            yield text
+        line = source.readline()
+
+def _logical_lines(source) -> Iterator[Tuple[str, bool]]:
+    """(line, another line follows) for each item of content.split('\\n')"""
+    ended = True
+    for line in iter_lines(source):
+        ended = line.endswith('\n')
+        yield (line[:-1], True) if ended else (line, False)
+    if ended:
+        yield '', False
+
+def find_words(source, words: Iterable[str] = (), lower_words: Iterable[str] = ()) -> Tuple[Set[str], Set[str]]:
+    """
+    Which of words occur in the text, and which of lower_words occur in its
+    lowercase form. Words must not contain a newline.
+    """
+    found, found_lower = set(), set()
+    remaining, remaining_lower = set(words), set(lower_words)
+    for line in iter_lines(source):
+        if remaining:
+            hits = {word for word in remaining if word in line}
+            found |= hits
+            remaining -= hits
+        if remaining_lower:
+            line_lower = line.lower()
+            hits = {word for word in remaining_lower if word in line_lower}
+            found_lower |= hits
+            remaining_lower -= hits
+        if not remaining and not remaining_lower:
+            break
+    return found, found_lower
+
+def has_text_headers(source) -> bool:
+    """Whether a capitalized line followed by a "🏃 ..." line starts a section past the first line"""
+    previous = None
+    for index, line in enumerate(iter_lines(source)):
+        if index > 1 and 'A' <= previous[:1] <= 'Z' and line.startswith('🏃'):
+            return True
+        previous = line
+    return False
+
+def parse_info_line(info_line: str) -> Dict[str, str]:
+    """Parse the emoji info line: 🏃 Physical | ⏱ 5–7 minutes | 🌿 Outdoor | 🔋 Moderate Energy"""
+    info = {}
+    
+    # Extract category
+    if '🏃' in info_line and 'Physical' in info_line:
+        info['category'] = 'Physical'
+    elif '🧠' in info_line or 'Mental' in info_line:
+        info['category'] = 'Mental'
+    elif '👥' in info_line or 'Social' in info_line:
+        info['category'] = 'Social'
+    elif '🌿' in info_line and 'Environmental' in info_line:
+        info['category'] = 'Environmental'
+    elif 'Instinctual' in info_line:
+        info['category'] = 'Instinctual'
+    elif 'Passive' in info_line:
+        info['category'] = 'Passive'
+    
+    # Extract time
+    time_match = re.search(r'⏱\s*([^|]+)', info_line)
+    if time_match:
+        info['estimated_time'] = time_match.group(1).strip()
+    
+    # Extract location/weather
+    if '🌿' in info_line and 'Outdoor' in info_line:
+        info['weather_suitable'] = 'Nice weather'
+    elif '🏠' in info_line and ('Indoor' in info_line or 'Indoor or Outdoor' in info_line):
+        info['weather_suitable'] = 'Any'
+    
+    # Extract energy level
+    energy_match = re.search(r'🔋\s*([^|]+)', info_line)
+    if energy_match:
+        energy_text = energy_match.group(1).strip()
+        if 'Low' in energy_text:
+            info['energy_required'] = 'Low'
+        elif 'High' in energy_text:
+            info['energy_required'] = 'High'
+        elif 'Moderate' in energy_text:
+            info['energy_required'] = 'Medium'
+    
+    return info
+
+def _new_activity(name: str, category: str, description: str) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'category': category,
+        'subcategory': '',
+        'description': description,
+        'materials': [],
+        'instructions': [],
+        'safety_notes': '',
+        'estimated_time': '',
+        'difficulty_level': 'Medium',
+        'energy_required': 'Medium',
+        'weather_suitable': 'Any',
+        'breed_sizes': ['All'],
+        'age_groups': ['All'],
+        'tags': []
+    }
+
+class _Section:
+    """A section fed line by line, measuring what section.strip() would leave"""
+    
+    def __init__(self):
+        self._next = 0  # offset of the next line in '\n'.join(lines)
+        self._start = None
+        self._end = 0
+    
+    def _track(self, line: str) -> str:
+        """Record line's position and return it stripped"""
+        offset = self._next
+        self._next = offset + len(line) + 1
+        stripped = line.strip()
+        if stripped:
+            if self._start is None:
+                self._start = offset + len(line) - len(line.lstrip())
+            self._end = offset + len(line.rstrip())
+        return stripped
+    
+    @property
+    def stripped_length(self) -> int:
+        return 0 if self._start is None else self._end - self._start
+
+class _SimpleSection(_Section):
+    """One section of the **Activity Name** format (see DropFolderImporter.parse_single_activity)"""
+    
+    def __init__(self, default_category: str, finish: Optional[Callable[[dict], dict]]):
+        super().__init__()
+        self.default_category = default_category
+        self.finish = finish
+        self.activity = None
+        self.named = None  # None until the first non-blank line
+        self.current_section = None
+    
+    def feed(self, line: str):
+        line = self._track(line)
+        if not line:
+            return
+        if self.named is None:
+            name_match = re.match(r'\*\*(.+?)\*\*', line)
+            self.named = name_match is not None
+            if name_match:
+                name = name_match.group(1).strip()
+                self.activity = _new_activity(name, self.default_category, f"A {name.lower()} enrichment activity")
+            return
+        if not self.named:
+            return
+        
+        for heading, section in SIMPLE_SECTIONS:
+            if line.startswith(heading):
+                self.current_section = section
+                return
+        
+        activity = self.activity
+        if self.current_section == 'materials':
+            if line.startswith('*'):
+                material = line.replace('*', '').strip()
+                if material:
+                    activity['materials'].append(material)
+        elif self.current_section == 'instructions':
+            step_match = re.match(r'^(\d+)\.\s*(.+)$', line)
+            if step_match:
+                activity['instructions'].append(step_match.group(2))
+        elif self.current_section == 'safety':
+            if not line.startswith('**'):
+                if activity['safety_notes']:
+                    activity['safety_notes'] += ' ' + line
+                else:
+                    activity['safety_notes'] = line
+        elif self.current_section == 'time':
+            if not line.startswith('**'):
+                activity['estimated_time'] = line
+        elif self.current_section == 'description':
+            if not line.startswith('**'):
+                activity['description'] = line
+    
+    def result(self) -> Optional[Dict[str, Any]]:
+        if self.stripped_length < 50 or not self.named:  # Skip very short sections
+            return None
+        return self.finish(self.activity) if self.finish else self.activity
+
+class _TrailingTitle:
+    """
+    Lines held back because they may still be a "**Title**" (then whitespace
+    only) ending the file, the one place the simple format's split applies
+    """
+    
+    def __init__(self):
+        self.lines = []
+        self._closed = False
+        self._name_length = 0
+    
+    def start(self, line: str) -> bool:
+        """Hold line if it can begin the title"""
+        self.lines = [line]
+        self._closed = False
+        self._name_length = 0
+        if not self._take(line[2:]):
+            self.lines = []
+        return bool(self.lines)
+    
+    def add(self, line: str) -> bool:
+        """Hold line too; False once the held lines can no longer be the title"""
+        self.lines.append(line)
+        return self._take('\n' + line)
+    
+    def _take(self, text: str) -> bool:
+        # Matching \*\*[^*]+\*\*\s* a piece at a time
+        if self._closed:
+            return not text.strip()
+        star = text.find('*')
+        if star < 0:
+            self._name_length += len(text)
+            return True
+        self._name_length += star
+        self._closed = True
+        return self._name_length > 0 and text[star:star + 2] == '**' and not text[star + 2:].strip()
+    
+    @property
+    def complete(self) -> bool:
+        return bool(self.lines) and self._closed
+
+def stream_simple_activities(source, default_category: str = 'Mental',
+                             finish: Optional[Callable[[dict], dict]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Activities of the **Activity Name** format, as the string parsers return
+    them: default_category is the importer's placeholder category and finish
+    its post-processing (DropFolderImporter.set_intelligent_defaults).
+    """
+    section = _SimpleSection(default_category, finish)
+    title = _TrailingTitle()
+    for index, (line, _) in enumerate(_logical_lines(source)):
+        queue = [line]
+        while queue:
+            line = queue.pop(0)
+            if title.lines:
+                if title.add(line):
+                    continue
+                held, title.lines = title.lines, []
+                section.feed(held[0])
+                # A later held line may begin the title instead
+                queue[:0] = held[1:]
+            elif index > 0 and line.startswith('**') and title.start(line):
+                continue
+            else:
+                section.feed(line)
+    
+    if not title.complete:
+        for line in title.lines:
+            section.feed(line)
+        title.lines = []
+    activity = section.result()
+    if activity:
+        yield activity
+    if title.lines:
+        tail = _SimpleSection(default_category, finish)
+        for line in title.lines:
+            tail.feed(line)
+        activity = tail.result()
+        if activity:
+            yield activity
+
+class _TextSection(_Section):
+    """One section of the "Name / 🏃 info line" format (see TextActivityImporter.parse_single_activity)"""
+    
+    def __init__(self):
+        super().__init__()
+        self.activity = None
+        self.position = None  # line number within the stripped section
+        self.has_info_line = False
+        self.current_section = None
+    
+    def feed(self, line: str):
+        stripped = self._track(line)
+        if self.position is None:
+            if stripped:
+                self.position = 0
+                self.activity = _new_activity(stripped, 'Physical', '')
+            return
+        self.position += 1
+        activity = self.activity
+        if self.position == 1:
+            self.has_info_line = '🏃' in line
+            activity.update(parse_info_line(line))
+            return
+        if self.position == 2:
+            activity['description'] = stripped
+            return
+        if not stripped:
+            return
+        line = stripped
+        
+        if line.startswith('Emotional Goal:'):
+            self.current_section = 'emotional_goal'
+        elif line.startswith('You\'ll Need:'):
+            self.current_section = 'materials'
+        elif line.startswith('Steps:'):
+            self.current_section = 'instructions'
+        elif self.current_section == 'emotional_goal':
+            if activity['description']:
+                activity['description'] += ' ' + line
+            else:
+                activity['description'] = line
+        elif self.current_section == 'materials':
+            if line.startswith('•'):
+                material = line.replace('•', '').strip()
+                if material:
+                    activity['materials'].append(material)
+        elif self.current_section == 'instructions':
+            if re.match(r'^\d+\.', line):
+                instruction = re.sub(r'^\d+\.\s*', '', line)
+                if instruction:
+                    activity['instructions'].append(instruction)
+            elif not line.startswith('•'):
+                if activity['instructions']:
+                    activity['instructions'][-1] += ' ' + line
+    
+    def result(self) -> Optional[Dict[str, Any]]:
+        # Skip very short sections and anything without the info line
+        if self.stripped_length < 100 or not self.has_info_line:
+            return None
+        return self.activity
+
+def stream_text_activities(source) -> Iterator[Dict[str, Any]]:
+    """Activities of the "Name / 🏃 info line" format; source is read twice, see has_text_headers"""
+    start = source.tell()
+    headers = has_text_headers(source)
+    source.seek(start)
+    sections = _header_sections(source) if headers else _blank_line_sections(source)
+    for section in sections:
+        activity = section.result()
+        if activity:
+            yield activity
+
+def _header_sections(source) -> Iterator[_TextSection]:
+    """re.split(r'\\n(?=[A-Z][^\\n]*\\n🏃)', content), one section at a time"""
+    section = _TextSection()
+    previous = None
+    for index, (line, _) in enumerate(_logical_lines(source)):
+        if previous is not None:
+            # previous starts a section when this line is its info line
+            if index > 1 and 'A' <= previous[:1] <= 'Z' and line.startswith('🏃'):
+                yield section
+                section = _TextSection()
+            section.feed(previous)
+        previous = line
+    if previous is not None:
+        section.feed(previous)
+    yield section
+
+def _blank_line_sections(source) -> Iterator[_TextSection]:
+    """content.split('\\n\\n'), one section at a time"""
+    section = _TextSection()
+    after_separator = False
+    for index, (line, more) in enumerate(_logical_lines(source)):
+        # An empty line between two newlines, unless the newline before it
+        # already ended a separator
+        if index > 0 and not line and more and not after_separator:
+            yield section
+            section = _TextSection()
+            after_separator = True
+        else:
+            section.feed(line)
+            after_separator = False
+    yield section
+
+def parse_simple_activity(source, default_category: str = 'Mental',
+                          finish: Optional[Callable[[dict], dict]] = None) -> Dict[str, Any]:
+    """The whole source as one **Activity Name** section, however short; {} without a **name** line"""
+    section = _SimpleSection(default_category, finish)
+    for line, _ in _logical_lines(source):
+        section.feed(line)
+    if not section.named:
+        return {}
+    return finish(section.activity) if finish else section.activity
+
+def parse_text_activity(source) -> Dict[str, Any]:
+    """The whole source as one "Name / 🏃 info line" section, however short; {} when it is blank"""
+    section = _TextSection()
+    for line, _ in _logical_lines(source):
+        section.feed(line)
+    return section.activity or {}
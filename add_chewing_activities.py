@@ -7,11 +7,13 @@ Covers recreational vs ingestible bones, safety guidelines, and variety.
 """
 
 from enrichment_database import EnrichmentDatabase
+from activity_dedup import ActivityDeduplicator
 from typing import List, Dict
 
 class ChewingBoneLibrary:
     def __init__(self):
         self.db = EnrichmentDatabase()
+        self.dedup = ActivityDeduplicator.from_database(self.db)
     
     def get_chewing_bone_activities(self) -> List[Dict]:
         """Generate comprehensive chewing and bone activities"""
@@ -299,31 +301,17 @@ class ChewingBoneLibrary:
         print("🦴 Adding Chewing & Bone Activities to Passive Enrichment")
         print("=" * 55)
         
-        added_count = 0
-        for activity in activities:
-            try:
-                if not self.activity_exists(activity['name']):
-                    self.db.add_activity(activity)
-                    print(f"  ✅ Added: {activity['name']}")
-                    added_count += 1
-                else:
-                    print(f"  ⏭️  Skipped: {activity['name']} (already exists)")
-            except Exception as e:
-                print(f"  ❌ Error adding {activity['name']}: {e}")
+        result = self.dedup.store(self.db, activities)
+        for name in result['added']:
+            print(f"  ✅ Added: {name}")
+        for name, match in result['duplicates']:
+            print(f"  ⏭️  Skipped: {name} ({match})")
+        for name, error in result['invalid']:
+            print(f"  ❌ Error adding {name}: {error}")
         
-        print(f"\n📊 Added {added_count} chewing and bone activities!")
+        print(f"\n📊 Added {len(result['added'])} chewing and bone activities!")
         self.show_passive_summary()
     
-    def activity_exists(self, name: str) -> bool:
-        """Check if activity already exists"""
-        import sqlite3
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (name,))
-        exists = cursor.fetchone()[0] > 0
-        conn.close()
-        return exists
-    
     def show_passive_summary(self):
         """Show summary of passive activities"""
         import sqlite3
@@ -1,32 +1,25 @@
-from flask import Flask, render_template, request, jsonify, session
-import requests
-from bs4 import BeautifulSoup
+from flask import Blueprint, Flask, abort, g, render_template, request, jsonify, send_file, session, make_response, Response, stream_with_context
 import os
-from datetime import datetime
-from enrichment_database import EnrichmentDatabase
+from typing import Optional
+from enrichment_database import EnrichmentDatabase, DuplicateActivityError
+from app_services import OPENAI_API_KEY, LazyService, get_db, get_image_pipeline, get_openai_client, warm_up
+from library_snapshot import LibraryPageCache
+import activity_api
+from response_cache import cache_stats
+import hedged_generation
 from chat_assistant import add_chat_routes
 from verified_dog_images import get_unique_dog_image, get_multiple_unique_dog_images
+from image_catalog import get_image_catalog
 from supabase_client import supabase_client
+from app_logging import get_logger, log_event
+import logging
 
-app = Flask(__name__)
-app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'your-secret-key-here-change-in-production')  # Change this in production
+logger = get_logger('app')
 
-# Initialize the enrichment database
-db = EnrichmentDatabase()
+# Page routes; create_app registers them together with the chat routes
+pages = Blueprint('pages', __name__)
 
-# You'll need to add your API keys here (kept for fallback)
-OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-if OPENAI_API_KEY:
-    import openai
-    openai.api_key = OPENAI_API_KEY
-    client = openai
-else:
-    client = None
-
-# Add chat routes to the app
-add_chat_routes(app, OPENAI_API_KEY)
-
-@app.route('/')
+@pages.route('/')
 def landing():
     # Get UNIQUE images for each section - NO REPEATS
     page_images = {
@@ -40,60 +33,10 @@ def landing():
     }
     return render_template('landing.html', images=page_images)
 
-@app.route('/library')
-def activity_library():
-    # Get all activities from database organized by category
-    conn = db.db_path
-    import sqlite3
-    conn = sqlite3.connect(db.db_path)
-    cursor = conn.cursor()
-    
-    # Get all activities with their details
-    cursor.execute('''
-        SELECT name, category, description, materials, instructions, 
-               safety_notes, estimated_time, difficulty_level, energy_required
-        FROM activities 
-        ORDER BY category, name
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
-    # Process results and organize by category
-    activities_by_category = {
-        'Mental': [],
-        'Physical': [],
-        'Social': [], 
-        'Environmental': [],
-        'Instinctual': [],
-        'Passive': []
-    }
-    
-    import json
-    for row in results:
-        activity = {
-            'name': row[0],
-            'category': row[1],
-            'description': row[2] or f"A {row[1].lower()} enrichment activity for your dog",
-            'materials': json.loads(row[3]),
-            'instructions': json.loads(row[4]),
-            'safety_notes': row[5],
-            'estimated_time': row[6],
-            'difficulty_level': row[7] or 'Medium',
-            'energy_required': row[8] or 'Medium'
-        }
-        
-        if activity['category'] in activities_by_category:
-            activities_by_category[activity['category']].append(activity)
-    
-    # Get featured activities (first 4 from different categories)
-    featured = []
-    for category in activities_by_category:
-        if activities_by_category[category] and len(featured) < 4:
-            featured.append(activities_by_category[category][0])
-    
+def render_library(snapshot):
     # Get UNIQUE, DIVERSE images for library page - NO REPEATS
     library_images = {
+        'hero': get_unique_dog_image('hero'),
         'mental': get_multiple_unique_dog_images(6, 'library_mental'),
         'physical': get_multiple_unique_dog_images(6, 'library_physical'), 
         'social': get_multiple_unique_dog_images(6, 'library_social'),
@@ -102,24 +45,42 @@ def activity_library():
         'passive': get_multiple_unique_dog_images(6, 'library_passive')
     }
     
-    return render_template('library.html', 
-                         activities_by_category=activities_by_category,
-                         featured_activities=featured,
+    g.images_pending = 0
+    html = render_template('library.html', 
+                         activities_by_category=snapshot.activities_by_category,
+                         featured_activities=snapshot.featured,
                          images=library_images)
+    # Complete once no image fell back to its original URL while being built
+    return html, g.images_pending == 0
 
-@app.route('/app')
+# The library page is rendered once per library data version
+get_library_cache = LazyService(lambda: LibraryPageCache(get_db(), render_library))
+
+@pages.route('/library')
+def activity_library():
+    page = get_library_cache().get()
+    
+    response = make_response(page.html)
+    response.set_etag(page.etag)
+    if page.last_modified:
+        response.last_modified = page.last_modified
+    # Let browsers keep the page but revalidate it on every visit
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@pages.route('/app')
 def app_form():
     # Get saved profile from session if available
     saved_profile = session.get('dog_profile', {})
     return render_template('index.html', saved_profile=saved_profile)
 
-@app.route('/checkout')
+@pages.route('/checkout')
 def checkout():
     # This will be the payment page - for now just redirect to app
     saved_profile = session.get('dog_profile', {})
     return render_template('index.html', saved_profile=saved_profile)
 
-@app.route('/generate-passive', methods=['POST'])
+@pages.route('/generate-passive', methods=['POST'])
 def generate_passive_activities():
     # Get basic dog info if provided
     breed = request.form.get('breed', 'Any dog')
@@ -134,7 +95,7 @@ def generate_passive_activities():
     
     try:
         # Get passive activities from database
-        activities = db.find_matching_activities(dog_profile, limit=4)
+        activities = get_db().find_matching_activities(dog_profile, limit=4)
         
         # If no passive activities found, get AI-generated ones
         if len(activities) < 4:
@@ -187,6 +148,7 @@ def generate_passive_enrichment_activities_ai(dog_profile):
     """
     
     try:
+        client = get_openai_client()
         if not client:
             raise Exception("OpenAI client not available")
         
@@ -233,7 +195,7 @@ def generate_passive_enrichment_activities_ai(dog_profile):
             }
         ]
 
-@app.route('/generate-activities', methods=['POST'])
+@pages.route('/generate-activities', methods=['POST'])
 def generate_activities():
     # Get form data
     breed = request.form['breed']
@@ -256,49 +218,27 @@ def generate_activities():
     session['dog_profile'] = form_data
     
     try:
-        activities = []
+        # Create legacy profile format
+        legacy_profile = {
+            'breed': breed,
+            'age': age,
+            'energy_level': energy_level,
+            'weather': weather,
+            'enrichment_type': enrichment_type
+        }
         
-        # Try Supabase first if configured
-        if supabase_client.enabled:
-            print("🚀 Using Supabase for activity generation")
-            
-            # Build Supabase dog profile
-            dog_profile = supabase_client.build_dog_profile(form_data)
-            
-            # Get activities from Supabase
-            result = supabase_client.discover_activities(dog_profile, max_activities=4)
-            
-            if result['success'] and result['activities']:
-                # Convert to Flask format
-                activities = supabase_client.convert_activities_to_flask_format(result['activities'])
-                print(f"✅ Supabase returned {len(activities)} activities")
-            else:
-                print(f"❌ Supabase failed: {result.get('error', 'Unknown error')}")
-                raise Exception(result.get('error', 'Supabase generation failed'))
+        # Race Supabase (cached per profile) against the local library; see hedged_generation
+        generation_method, activities = hedged_generation.generate_activities(
+            form_data,
+            lambda: get_db().find_matching_activities(legacy_profile, limit=4)
+        )
+        log_event(logger, logging.DEBUG, 'generation_source', source=generation_method, count=len(activities))
         
-        # Fallback to local database if Supabase fails or not configured
-        if not activities:
-            print("🔄 Falling back to local database")
-            
-            # Create legacy profile format
-            legacy_profile = {
-                'breed': breed,
-                'age': age,
-                'energy_level': energy_level,
-                'weather': weather,
-                'enrichment_type': enrichment_type
-            }
-            
-            # Get activities from local database
-            print(f"DEBUG: Calling local database with profile: {legacy_profile}")
-            activities = db.find_matching_activities(legacy_profile, limit=4)
-            print(f"DEBUG: Local database returned {len(activities)} activities")
-            
-            # If still no activities, use AI fallback
-            if len(activities) < 4:
-                print(f"DEBUG: Only got {len(activities)} from local database, falling back to AI")
-                ai_activities = generate_enrichment_activities_ai(legacy_profile)
-                activities.extend(ai_activities[:4-len(activities)])
+        # If still no activities, use AI fallback
+        if generation_method == 'local' and len(activities) < 4:
+            log_event(logger, logging.INFO, 'ai_fallback', local_count=len(activities))
+            ai_activities = generate_enrichment_activities_ai(legacy_profile)
+            activities.extend(ai_activities[:4-len(activities)])
         
         # Create profile summary for display
         profile_summary = f"Dog breed: {breed}, Age: {age}, Energy level: {energy_level}, Weather: {weather}, Preferred enrichment: {enrichment_type}"
@@ -307,7 +247,7 @@ def generate_activities():
         breed_image = get_unique_dog_image(f'results_{breed}')
         
         # Add generation method to session for debugging
-        session['generation_method'] = 'supabase' if supabase_client.enabled and activities else 'local'
+        session['generation_method'] = generation_method
         
         return render_template('results.html', 
                              activities=activities, 
@@ -316,7 +256,7 @@ def generate_activities():
                              generation_method=session.get('generation_method', 'unknown'))
     
     except Exception as e:
-        print(f"❌ Error in activity generation: {str(e)}")
+        logger.exception('activity_generation_failed')
         return jsonify({'error': str(e)}), 500
 
 def generate_enrichment_activities_ai(dog_profile):
@@ -352,6 +292,7 @@ def generate_enrichment_activities_ai(dog_profile):
     """
     
     try:
+        client = get_openai_client()
         if not client:
             raise Exception("OpenAI client not available")
         
@@ -420,6 +361,7 @@ def generate_enrichment_activities(dog_profile):
     """
     
     try:
+        client = get_openai_client()
         if not client:
             raise Exception("OpenAI client not available")
         
@@ -455,12 +397,12 @@ def generate_enrichment_activities(dog_profile):
             }
         ]
 
-@app.route('/import')
+@pages.route('/import')
 def import_activities():
     """Admin page for importing activities"""
     return render_template('import.html')
 
-@app.route('/import-activity', methods=['POST'])
+@pages.route('/import-activity', methods=['POST'])
 def import_activity():
     """Add new activity from import form"""
     try:
@@ -485,53 +427,88 @@ def import_activity():
         }
         
         # Add to database
-        db.add_activity(activity_data)
+        get_db().add_activity(activity_data)
         
         return jsonify({'success': True, 'message': f"Activity '{data['name']}' added successfully!"})
         
+    except DuplicateActivityError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/activities', methods=['GET'])
+@pages.route('/api/activities', methods=['GET'])
 def get_activities():
-    """API endpoint to get all activities"""
-    import sqlite3
-    
-    conn = sqlite3.connect(db.db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT name, category, description, materials, instructions,
-               safety_notes, estimated_time, difficulty_level, energy_required,
-               weather_suitable, breed_sizes, age_groups, tags
-        FROM activities 
-        ORDER BY category, name
-    ''')
-    
-    results = cursor.fetchall()
-    conn.close()
-    
-    activities = []
-    import json
-    for row in results:
-        activities.append({
-            'name': row[0],
-            'category': row[1],
-            'description': row[2],
-            'materials': json.loads(row[3]),
-            'instructions': json.loads(row[4]),
-            'safety_notes': row[5],
-            'estimated_time': row[6],
-            'difficulty_level': row[7],
-            'energy_required': row[8],
-            'weather_suitable': row[9],
-            'breed_sizes': json.loads(row[10]),
-            'age_groups': json.loads(row[11]),
-            'tags': json.loads(row[12])
-        })
-    
-    return jsonify(activities)
+    """API endpoint to list activities (filterable, paginated or streamed; see activity_api)"""
+    try:
+        query = activity_api.parse_query(request.args)
+    except activity_api.QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        body = activity_api.iter_ndjson(get_db(), query)
+        return Response(stream_with_context(body), mimetype='application/x-ndjson')
+    
+    if 'limit' in query:
+        return jsonify(activity_api.fetch_page(get_db(), query))
+    
+    # No paging requested: the full array, streamed instead of built in memory
+    body = activity_api.iter_json_array(get_db(), query)
+    return Response(stream_with_context(body), mimetype='application/json')
+
+@pages.route('/api/cache-stats', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss counters for the response caches in this worker, plus the Supabase circuit"""
+    stats = cache_stats()
+    stats['supabase_circuit'] = supabase_client.breaker.get_stats()
+    return jsonify(stats)
+
+def image_variants(url: str):
+    """Responsive variants of an image URL for templates (None: use the URL as is)"""
+    pipeline = get_image_pipeline()
+    variants = pipeline.variants(url)
+    if variants is None and pipeline.building(url):
+        g.images_pending = g.get('images_pending', 0) + 1
+    return variants
+
+def image_record(url: str):
+    """Catalog entry of an image URL for templates (dimensions, colour, placeholder), or None"""
+    return get_image_catalog().get(url)
+
+@pages.route('/img/<name>')
+def image_variant(name):
+    """A cached image variant; the name is content-addressed, so the file never changes"""
+    path = get_image_pipeline().variant_path(name)
+    if path is None:
+        abort(404)
+    response = send_file(path, max_age=365 * 24 * 3600)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def create_app(db: Optional[EnrichmentDatabase] = None) -> Flask:
+    """
+    Build the Flask app. Nothing expensive happens here: the database, the
+    OpenAI client and the library page are built on first use (see
+    app_services), so importing this module stays cheap for every worker.
+    Pass db to serve a specific database instead of the default one.
+    """
+    if db is not None:
+        get_db.set(db)
+    
+    app = Flask(__name__)
+    app.secret_key = os.environ.get('FLASK_SECRET_KEY', 'your-secret-key-here-change-in-production')  # Change this in production
+    app.register_blueprint(pages)
+    app.jinja_env.globals['image_variants'] = image_variants
+    app.jinja_env.globals['image_record'] = image_record
+    
+    # Add chat routes to the app (sharing the same database object)
+    app.extensions['chat_assistant'] = add_chat_routes(app, OPENAI_API_KEY, get_db)
+    return app
+
+app = create_app()
 
 if __name__ == '__main__':
+    # Open the database and build the activity index before the first request
+    warm_up()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
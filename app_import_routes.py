@@ -34,16 +34,15 @@ def import_activity():
         
         return jsonify({'success': True, 'message': f"Activity '{data['name']}' added successfully!"})
         
+    except DuplicateActivityError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/activities', methods=['GET'])
 def get_activities():
     """API endpoint to get all activities"""
-    import sqlite3
-    
-    conn = sqlite3.connect(db.db_path)
-    cursor = conn.cursor()
+    cursor = db.get_connection().cursor()
     
     cursor.execute('''
         SELECT name, category, description, materials, instructions,
@@ -54,7 +53,6 @@ def get_activities():
     ''')
     
     results = cursor.fetchall()
-    conn.close()
     
     activities = []
     import json
@@ -0,0 +1,75 @@
+"""
+Structured, level-gated logging for the web app
+
+Every record is one line of key=value pairs (or JSON with LOG_FORMAT=json):
+
+    ts=2025-06-01T12:00:00 level=DEBUG logger=dog_enrichment.database event=match_found count=3
+
+Set LOG_LEVEL=DEBUG to trace profile matching and Supabase calls. At the
+default INFO level a debug call costs a single level check: log_event() bails
+out before building the record, and call sites guard anything expensive to
+compute with logger.isEnabledFor(logging.DEBUG).
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()
+
+ROOT_LOGGER_NAME = 'dog_enrichment'
+
+class StructuredFormatter(logging.Formatter):
+    """Render a record and its structured fields as key=value pairs or JSON"""
+    
+    def __init__(self, as_json: bool = False):
+        super().__init__()
+        self.as_json = as_json
+    
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='seconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        fields.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            fields['exc'] = self.formatException(record.exc_info)
+        
+        if self.as_json:
+            return json.dumps(fields, default=str)
+        return ' '.join(f"{key}={_format_value(value)}" for key, value in fields.items())
+
+def _format_value(value) -> str:
+    text = str(value)
+    if not text or any(char in text for char in ' "=\n'):
+        return json.dumps(text)
+    return text
+
+def configure_logging():
+    """Attach the structured handler to the app's logger tree (once)"""
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    if getattr(root, '_structured_configured', False):
+        return root
+    
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(StructuredFormatter(as_json=LOG_FORMAT == 'json'))
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    root.propagate = False
+    root._structured_configured = True
+    return root
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for one module, e.g. get_logger('database')"""
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields):
+    """Log an event with structured fields; free when the level is disabled"""
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
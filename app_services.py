@@ -0,0 +1,70 @@
+"""
+Process-wide services for the web app, built on first use
+
+Importing app.py used to open the database (schema check, seed data and the
+activity index), import openai and shuffle the image list, so every gunicorn
+worker paid for all of it before serving anything. Each service here is built
+once per process, by the first request that needs it (or by warm_up), and the
+chat routes share the app's database through get_db instead of opening their
+own.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Optional
+
+from enrichment_database import EnrichmentDatabase
+from image_pipeline import ImagePipeline
+
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+
+class LazyService:
+    """Calling it returns build()'s result, built once (thread-safe) on the first call"""
+    
+    def __init__(self, build: Callable[[], Any]):
+        self._build = build
+        self._value = None
+        self._built = False
+        self._lock = threading.Lock()
+    
+    def __call__(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._value = self._build()
+                    self._built = True
+        return self._value
+    
+    @property
+    def built(self) -> bool:
+        return self._built
+    
+    def set(self, value: Any):
+        """Use value instead of building one (e.g. a test database)"""
+        with self._lock:
+            self._value = value
+            self._built = True
+    
+    def reset(self):
+        """Forget the value; the next call builds it again"""
+        with self._lock:
+            self._value = None
+            self._built = False
+
+def _build_openai_client() -> Optional[Any]:
+    """The openai module, configured, or None without an API key (imported only then)"""
+    if not OPENAI_API_KEY:
+        return None
+    import openai
+    openai.api_key = OPENAI_API_KEY
+    return openai
+
+# The one database object shared by the pages and the chat routes
+get_db = LazyService(EnrichmentDatabase)
+get_openai_client = LazyService(_build_openai_client)
+get_image_pipeline = LazyService(ImagePipeline)
+
+def warm_up():
+    """Build what the first request would otherwise wait for (schema check, seed data, activity index, embeddings)"""
+    db = get_db()
+    db.get_activity_embeddings(db.get_activity_index())
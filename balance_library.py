@@ -4,6 +4,7 @@ Library Balancer - Add activities to smaller categories
 """
 
 from enhanced_library import EnhancedActivityLibrary
+from activity_dedup import ActivityDeduplicator
 import sqlite3
 
 def balance_library():
@@ -38,6 +39,7 @@ def balance_library():
         return
     
     # Add activities to boost smaller categories
+    dedup = ActivityDeduplicator.from_database(library.db)
     for category, needed in categories_to_boost:
         print(f"\n📚 Generating {needed} more {category} activities...")
         
@@ -45,20 +47,17 @@ def balance_library():
         ai_activities = library.generate_ai_activities(category, needed)
         curated_activities = library.curate_quality_activities(ai_activities)
         
-        added_count = 0
         for activity in curated_activities:
-            try:
-                activity['category'] = category
-                if not activity_exists(activity['name'], library.db.db_path):
-                    library.db.add_activity(activity)
-                    print(f"  ✅ Added: {activity['name']}")
-                    added_count += 1
-                else:
-                    print(f"  ⏭️  Skipped: {activity['name']} (exists)")
-            except Exception as e:
-                print(f"  ❌ Error: {e}")
+            activity['category'] = category
+        result = dedup.store(library.db, curated_activities)
+        for name in result['added']:
+            print(f"  ✅ Added: {name}")
+        for name, match in result['duplicates']:
+            print(f"  ⏭️  Skipped: {name} ({match})")
+        for name, error in result['invalid']:
+            print(f"  ❌ Error: {name}: {error}")
         
-        print(f"  📊 Added {added_count} {category} activities")
+        print(f"  📊 Added {len(result['added'])} {category} activities")
     
     # Show final status
     print(f"\n🎉 Library Balanced!")
@@ -74,14 +73,5 @@ def balance_library():
     for category, count in final_counts:
         print(f"  {category}: {count}")
 
-def activity_exists(name: str, db_path: str) -> bool:
-    """Check if activity exists"""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (name,))
-    exists = cursor.fetchone()[0] > 0
-    conn.close()
-    return exists
-
 if __name__ == "__main__":
     balance_library()
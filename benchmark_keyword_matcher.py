@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Keyword Extraction Benchmark
+
+Times the table-driven keyword matcher against the original chain of
+`any(word in query ...)` checks on a mix of short and long chat questions,
+after confirming both give identical keywords for every question.
+
+    python benchmark_keyword_matcher.py [iterations]
+"""
+
+import random
+import sys
+import timeit
+
+from keyword_matcher import keyword_matcher
+
+SAMPLE_QUERIES = [
+    "What can I do with my puppy?",
+    "My 4 month old lab is bored",
+    "Ideas for an elderly dog who is anxious",
+    "My dog gulps everything and swallows toys, what is safe?",
+    "He chews everything when I leave, very destructive",
+    "Quiet brain games for a calm evening",
+    "Need physical exercise ideas, she is super active",
+    "Bonding and social games for two dogs",
+    "He cant have rawhide or anything with no bones allowed",
+    "hi",
+    ("I adopted a young rescue last week. She is stressed in the car, gets mental "
+     "stimulation from puzzle feeders, but needs more exercise and I want it to be "
+     "safe because she eats everything she finds on walks. Any passive ideas too?"),
+]
+
+def legacy_extract_keywords(query: str) -> list:
+    """The extraction chat_assistant used before keyword_matcher"""
+    query_lower = query.lower()
+    
+    age_keywords = []
+    if any(word in query_lower for word in ['puppy', 'young', '4 month', 'months old']):
+        age_keywords.append('puppy')
+    if any(word in query_lower for word in ['senior', 'old', 'elderly']):
+        age_keywords.append('senior')
+    
+    behavior_keywords = []
+    if any(word in query_lower for word in ['swallow', 'eats everything', 'gulps']):
+        behavior_keywords.append('safe')
+    if any(word in query_lower for word in ['destructive', 'chews everything']):
+        behavior_keywords.append('chew')
+    if any(word in query_lower for word in ['anxious', 'stressed', 'calm']):
+        behavior_keywords.append('calming')
+    
+    activity_keywords = []
+    if any(word in query_lower for word in ['mental', 'brain', 'puzzle']):
+        activity_keywords.append('mental')
+    if any(word in query_lower for word in ['physical', 'exercise', 'active']):
+        activity_keywords.append('physical')
+    if any(word in query_lower for word in ['social', 'bonding']):
+        activity_keywords.append('social')
+    if any(word in query_lower for word in ['passive', 'quiet', 'calm']):
+        activity_keywords.append('passive')
+    
+    safety_keywords = []
+    if any(word in query_lower for word in ['safe', 'no bones', 'cant have']):
+        safety_keywords.append('safe')
+    
+    return age_keywords + behavior_keywords + activity_keywords + safety_keywords
+
+def random_queries(count: int, seed: int = 7) -> list:
+    """Questions stitched from trigger fragments and filler, to probe overlaps"""
+    rng = random.Random(seed)
+    fragments = [
+        'puppy', 'young', '4 month', 'months old', 'senior', 'old', 'elderly', 'swallow',
+        'eats everything', 'gulps', 'destructive', 'chews everything', 'anxious', 'stressed',
+        'calm', 'calming', 'mental', 'brain', 'puzzle', 'physical', 'exercise', 'active',
+        'social', 'bonding', 'passive', 'quiet', 'safe', 'no bones', 'cant have', 'my dog',
+        'bold', 'unsafe', 'MONTHS OLD', 'Calm', 'help', '', ' ', '?'
+    ]
+    return [''.join(rng.choice(fragments) + rng.choice(['', ' ']) for _ in range(rng.randint(0, 8)))
+            for _ in range(count)]
+
+def check_equivalence(queries) -> int:
+    """Raise on the first query where the two implementations disagree"""
+    for query in queries:
+        expected = legacy_extract_keywords(query)
+        actual = keyword_matcher.keywords(query)
+        if actual != expected:
+            raise AssertionError(f"{query!r}: expected {expected}, got {actual}")
+    return len(queries)
+
+def run_benchmark(iterations: int = 20000):
+    checked = check_equivalence(SAMPLE_QUERIES + random_queries(2000))
+    print(f"✅ Identical keywords for {checked} queries")
+    
+    for label, queries in [('short questions', SAMPLE_QUERIES[:-1]), ('long question', SAMPLE_QUERIES[-1:])]:
+        legacy = timeit.timeit(lambda: [legacy_extract_keywords(q) for q in queries], number=iterations)
+        table = timeit.timeit(lambda: [keyword_matcher.keywords(q) for q in queries], number=iterations)
+        per_query = iterations * len(queries)
+        print(f"\n📊 {label} ({per_query} extractions)")
+        print(f"   legacy:   {legacy / per_query * 1e6:6.2f} µs/query")
+        print(f"   table:    {table / per_query * 1e6:6.2f} µs/query ({legacy / table:.1f}x)")
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
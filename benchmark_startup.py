@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Cold-Start Benchmark
+
+Starts fresh interpreters the way a gunicorn worker starts and times each
+step: importing app.py, the first request to / and /library (which build the
+database, activity index and library page on demand), and a warm repeat.
+Each run works on a copy of enrichment_activities.db in a temporary folder,
+so the working database is never touched.
+
+    python benchmark_startup.py [runs] [--record startup_history.jsonl]
+
+--record appends the medians as one JSON line, to follow cold-start latency
+from one change to the next.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Runs inside each fresh interpreter; prints its timings as JSON
+CHILD = '''
+import json, os, sys, time
+files = set(os.listdir('.'))
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+built_on_import = app.get_db.built
+heavy_modules = [name for name in ('openai', 'bs4', 'requests', 'numpy') if name in sys.modules]
+created_on_import = sorted(set(os.listdir('.')) - files)
+client = app.app.test_client()
+assert client.get('/').status_code == 200
+landing = time.perf_counter()
+assert client.get('/library').status_code == 200
+library = time.perf_counter()
+assert client.get('/library').status_code == 200
+warm = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'first_landing': landing - imported,
+    'first_library': library - landing,
+    'warm_library': warm - library,
+    'built_on_import': built_on_import,
+    'heavy_modules': heavy_modules,
+    'created_on_import': created_on_import
+}))
+'''
+
+def measure_startup(runs: int = 5) -> list:
+    """One timing dict per fresh interpreter; 'ready' is spawn to first /library response"""
+    repo = os.path.dirname(os.path.abspath(__file__))
+    temp_dir = tempfile.mkdtemp()
+    try:
+        env = dict(os.environ, PYTHONPATH=repo, LOG_LEVEL='WARNING')
+        results = []
+        for _ in range(runs):
+            shutil.copy(os.path.join(repo, 'enrichment_activities.db'), os.path.join(temp_dir, 'enrichment_activities.db'))
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', CHILD], cwd=temp_dir, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result['process'] = time.perf_counter() - started
+            result['ready'] = result['import'] + result['first_landing'] + result['first_library']
+            results.append(result)
+        return results
+    finally:
+        shutil.rmtree(temp_dir)
+
+def run_benchmark(runs: int = 5, record: str = None):
+    results = measure_startup(runs)
+    steps = ['import', 'first_landing', 'first_library', 'warm_library', 'ready', 'process']
+    medians = {step: statistics.median(result[step] for result in results) for step in steps}
+    
+    print(f"🚀 Cold start over {runs} fresh interpreters (median / min):")
+    for step in steps:
+        fastest = min(result[step] for result in results)
+        print(f"   {step:14s} {medians[step] * 1000:8.1f} ms  {fastest * 1000:8.1f} ms")
+    heavy = sorted({name for result in results for name in result['heavy_modules']})
+    print(f"   database opened at import: {any(result['built_on_import'] for result in results)}")
+    print(f"   heavy modules imported: {', '.join(heavy) or 'none'}")
+    created = sorted({name for result in results for name in result['created_on_import']})
+    print(f"   files created at import: {', '.join(created) or 'none'}")
+    
+    if record:
+        with open(record, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'at': datetime.now().isoformat(timespec='seconds'), 'runs': runs, **medians}) + '\n')
+        print(f"📝 Recorded in {record}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time app.py cold starts in fresh interpreters")
+    parser.add_argument('runs', nargs='?', type=int, default=5)
+    parser.add_argument('--record', help="append the medians to this JSON-lines file")
+    args = parser.parse_args()
+    run_benchmark(args.runs, args.record)
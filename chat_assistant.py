@@ -6,119 +6,101 @@ Adds intelligent chat support using Supabase enrichment-coach function
 with fallback to local chat for reliability.
 """
 
-from flask import request, jsonify, session
-import openai
+from flask import request, jsonify, session, Response, stream_with_context
 import json
-import sqlite3
-from enrichment_database import EnrichmentDatabase
+import logging
+from typing import Callable, Optional
+from enrichment_database import EnrichmentDatabase, EMBEDDING_RERANK_POOL
 from supabase_client import supabase_client
+from app_logging import get_logger, log_event
+from llm_stream import FakeLLMClient, CHAT_FAKE_LLM, sse_event, stream_chat_tokens
+from chat_cache import get_breakdown_cache, get_chat_cache, breakdown_key, bucket_profile, chat_key
+from keyword_matcher import keyword_matcher
+
+def cached(cache, key, compute):
+    """compute() through cache when there is a key; only successful answers are stored"""
+    if key is None:
+        return compute()
+    return cache.get_or_compute(key, compute, should_cache=lambda result: result['success'])
+
+logger = get_logger('chat')
 
 class EnrichmentChatAssistant:
-    def __init__(self, openai_api_key):
-        if openai_api_key:
+    def __init__(self, openai_api_key, llm_client=None,
+                 get_db: Optional[Callable[[], EnrichmentDatabase]] = None):
+        if llm_client is not None:
+            self.client = llm_client
+        elif openai_api_key:
+            # Only imported when there is a key to use it with
+            import openai
             openai.api_key = openai_api_key
             self.client = openai
+        elif CHAT_FAKE_LLM:
+            # Offline development: canned, token-by-token replies
+            self.client = FakeLLMClient()
         else:
             self.client = None
-        self.db = EnrichmentDatabase()
+        # The app passes its shared getter; standalone use opens a database on first use
+        self._get_db = get_db or EnrichmentDatabase
+        self._db = None
+    
+    @property
+    def db(self) -> EnrichmentDatabase:
+        if self._db is None:
+            self._db = self._get_db()
+        return self._db
     
     def get_relevant_activities(self, user_query: str, limit: int = 3):
-        """Get activities relevant to user's query"""
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
+        """Get the activities most relevant to user's query, best match first"""
+        fields = ('name', 'category', 'description', 'materials', 'instructions',
+                  'safety_notes', 'estimated_time', 'age_groups', 'breed_sizes')
+        index = self.db.get_activity_index()
+        embeddings = self.db.get_activity_embeddings(index)
         
-        # Search for relevant activities based on keywords
+        # Search for relevant activities based on keywords (full-text, BM25-ranked)
         keywords = self.extract_keywords(user_query)
-        
-        search_conditions = []
-        search_params = []
-        
-        for keyword in keywords:
-            search_conditions.append(
-                "(name LIKE ? OR description LIKE ? OR category LIKE ? OR tags LIKE ?)"
-            )
-            search_params.extend([f'%{keyword}%'] * 4)
-        
-        if search_conditions:
-            query = f"""
-                SELECT name, category, description, materials, instructions, safety_notes, estimated_time, age_groups, breed_sizes
-                FROM activities 
-                WHERE {' OR '.join(search_conditions)}
-                LIMIT ?
-            """
-            search_params.append(limit)
-            cursor.execute(query, search_params)
+        if keywords:
+            if embeddings is None:
+                return self.db.search_activities(keywords, fields, limit)
+            # Full-text search recalls candidates; re-rank them against the whole question
+            candidates = self.db.search_activities(keywords, ('id',), limit * EMBEDDING_RERANK_POOL)
+            positions = [index.positions[c['id']] for c in candidates if c['id'] in index.positions]
+            positions = embeddings.rank(user_query, positions)[:limit]
+        elif embeddings is not None:
+            # No known keywords: nearest activities to the question's wording
+            positions = embeddings.top_k(user_query, limit)
         else:
-            # Fallback to random activities
-            cursor.execute("SELECT name, category, description, materials, instructions, safety_notes, estimated_time, age_groups, breed_sizes FROM activities ORDER BY RANDOM() LIMIT ?", (limit,))
-        
-        results = cursor.fetchall()
-        conn.close()
-        
-        activities = []
-        for row in results:
-            activities.append({
-                'name': row[0],
-                'category': row[1],
-                'description': row[2],
-                'materials': json.loads(row[3]),
-                'instructions': json.loads(row[4]),
-                'safety_notes': row[5],
-                'estimated_time': row[6],
-                'age_groups': json.loads(row[7]),
-                'breed_sizes': json.loads(row[8])
-            })
+            positions = []
         
-        return activities
+        # Fallback to random activities, picked from the in-memory index
+        if not positions and not keywords:
+            positions = self.db.sampler.sample(range(len(index)), limit)
+        return [{field: index.activities[position][field] for field in fields} for position in positions]
     
     def extract_keywords(self, query: str) -> list:
-        """Extract relevant keywords from user query"""
-        query_lower = query.lower()
-        
-        # Age-related keywords
-        age_keywords = []
-        if any(word in query_lower for word in ['puppy', 'young', '4 month', 'months old']):
-            age_keywords.append('puppy')
-        if any(word in query_lower for word in ['senior', 'old', 'elderly']):
-            age_keywords.append('senior')
-        
-        # Behavior keywords
-        behavior_keywords = []
-        if any(word in query_lower for word in ['swallow', 'eats everything', 'gulps']):
-            behavior_keywords.append('safe')
-        if any(word in query_lower for word in ['destructive', 'chews everything']):
-            behavior_keywords.append('chew')
-        if any(word in query_lower for word in ['anxious', 'stressed', 'calm']):
-            behavior_keywords.append('calming')
-        
-        # Activity type keywords
-        activity_keywords = []
-        if any(word in query_lower for word in ['mental', 'brain', 'puzzle']):
-            activity_keywords.append('mental')
-        if any(word in query_lower for word in ['physical', 'exercise', 'active']):
-            activity_keywords.append('physical')
-        if any(word in query_lower for word in ['social', 'bonding']):
-            activity_keywords.append('social')
-        if any(word in query_lower for word in ['passive', 'quiet', 'calm']):
-            activity_keywords.append('passive')
-        
-        # Safety keywords
-        safety_keywords = []
-        if any(word in query_lower for word in ['safe', 'no bones', 'cant have']):
-            safety_keywords.append('safe')
-        
-        return age_keywords + behavior_keywords + activity_keywords + safety_keywords
+        """Extract relevant keywords from user query (rules live in keyword_matcher.KEYWORD_RULES)"""
+        return keyword_matcher.keywords(query)
     
     def generate_chat_response(self, user_message: str, conversation_history: list = None) -> dict:
         """Generate AI response using Supabase enrichment-coach with local fallback"""
+        result = self.generate_supabase_chat_response(user_message, conversation_history)
+        if result is not None:
+            return result
         
-        # Try Supabase enrichment-coach first
-        if supabase_client.enabled:
+        # Fallback to local chat system
+        log_event(logger, logging.DEBUG, 'chat_source', source='local')
+        return self.generate_local_chat_response(user_message, conversation_history)
+    
+    def generate_supabase_chat_response(self, user_message: str, conversation_history: list = None):
+        """Supabase enrichment-coach reply, or None when it is unavailable or fails"""
+        
+        # Skipped while Supabase's circuit breaker is open
+        if supabase_client.is_available():
             try:
-                print("🤖 Using Supabase enrichment-coach for chat")
+                log_event(logger, logging.DEBUG, 'chat_source', source='supabase')
                 
-                # Get dog profile from session if available
-                dog_profile = self.build_dog_profile_from_session()
+                # Get dog profile from session if available, reduced to what the cache key covers
+                dog_profile = bucket_profile(self.build_dog_profile_from_session())
                 
                 # Build messages for Supabase
                 messages = []
@@ -126,15 +108,16 @@ class EnrichmentChatAssistant:
                     messages.extend(conversation_history[-4:])  # Keep last 4 messages
                 messages.append({'role': 'user', 'content': user_message})
                 
-                # Call Supabase enrichment coach
-                result = supabase_client.get_enrichment_coach_advice(
-                    user_message, 
-                    dog_profile,
-                    activity_context=None
-                )
+                # Call Supabase enrichment coach (the reply depends on the question and profile only)
+                result = cached(get_chat_cache(), chat_key(user_message, 'supabase', dog_profile=dog_profile),
+                                lambda: supabase_client.get_enrichment_coach_advice(
+                                    user_message, 
+                                    dog_profile,
+                                    activity_context=None
+                                ))
                 
                 if result['success']:
-                    print("✅ Supabase enrichment-coach responded successfully")
+                    log_event(logger, logging.DEBUG, 'supabase_chat_succeeded')
                     return {
                         'success': True,
                         'response': result['reply'],
@@ -143,15 +126,12 @@ class EnrichmentChatAssistant:
                         'conversation_id': self.generate_conversation_id()
                     }
                 else:
-                    print(f"❌ Supabase enrichment-coach failed: {result.get('error')}")
                     raise Exception(result.get('error', 'Supabase chat failed'))
                     
             except Exception as e:
-                print(f"🔄 Supabase chat failed, falling back to local: {str(e)}")
+                log_event(logger, logging.WARNING, 'supabase_chat_failed', error=str(e))
         
-        # Fallback to local chat system
-        print("🔄 Using local chat system")
-        return self.generate_local_chat_response(user_message, conversation_history)
+        return None
     
     def build_dog_profile_from_session(self) -> dict:
         """Build dog profile from session data or use defaults"""
@@ -173,8 +153,8 @@ class EnrichmentChatAssistant:
             'mobilityIssues': []
         }
     
-    def generate_local_chat_response(self, user_message: str, conversation_history: list = None) -> dict:
-        """Original local chat response generation"""
+    def build_local_chat_messages(self, user_message: str, conversation_history: list = None) -> tuple:
+        """Build the local model's messages; returns (messages, relevant activities)"""
         
         # Get relevant activities for context
         relevant_activities = self.get_relevant_activities(user_message, limit=3)
@@ -233,14 +213,29 @@ class EnrichmentChatAssistant:
         # Add current user message
         messages.append({"role": "user", "content": user_message})
         
+        return messages, relevant_activities
+    
+    def generate_local_chat_response(self, user_message: str, conversation_history: list = None) -> dict:
+        """Original local chat response generation"""
+        messages, relevant_activities = self.build_local_chat_messages(user_message, conversation_history)
+        
+        if not self.client:
+            return {
+                'success': False,
+                'error': "OpenAI API not available",
+                'relevant_activities': relevant_activities[:2] if relevant_activities else []
+            }
+        
+        # Opening questions are cached; follow-ups depend on the conversation
+        key = None if conversation_history else chat_key(user_message, 'local', relevant_activities)
+        result = cached(get_chat_cache(), key, lambda: self.complete_local_chat(messages, relevant_activities))
+        if result['success']:
+            result = dict(result, conversation_id=self.generate_conversation_id())
+        return result
+    
+    def complete_local_chat(self, messages: list, relevant_activities: list) -> dict:
+        """Run the local model on prepared messages"""
         try:
-            if not self.client:
-                return {
-                    'success': False,
-                    'error': "OpenAI API not available",
-                    'relevant_activities': relevant_activities[:2] if relevant_activities else []
-                }
-            
             response = self.client.ChatCompletion.create(
                 model="gpt-3.5-turbo",
                 messages=messages,
@@ -266,16 +261,66 @@ class EnrichmentChatAssistant:
                 'source': 'local'
             }
     
+    def stream_chat_response(self, user_message: str, conversation_history: list = None):
+        """
+        Streaming counterpart of generate_chat_response, yielding (event, data):
+        'context' with the relevant activities first, then 'token' chunks as
+        the model produces them, then 'done' (or 'error').
+        """
+        # Supabase's coach doesn't stream, so its reply arrives as a single chunk
+        result = self.generate_supabase_chat_response(user_message, conversation_history)
+        if result is not None:
+            yield 'context', {'relevant_activities': result.get('activities', []), 'source': 'supabase'}
+            yield 'token', {'text': result['response']}
+            yield 'done', {'source': 'supabase', 'conversation_id': result['conversation_id']}
+            return
+        
+        log_event(logger, logging.DEBUG, 'chat_source', source='local', streaming=True)
+        messages, relevant_activities = self.build_local_chat_messages(user_message, conversation_history)
+        yield 'context', {'relevant_activities': relevant_activities[:2], 'source': 'local'}
+        
+        if not self.client:
+            yield 'error', {'error': "OpenAI API not available"}
+            return
+        
+        # Shares cache entries with generate_local_chat_response
+        key = None if conversation_history else chat_key(user_message, 'local', relevant_activities)
+        cached_reply = get_chat_cache().get(key) if key else None
+        if cached_reply is not None:
+            yield 'token', {'text': cached_reply['response']}
+            yield 'done', {'source': 'local', 'conversation_id': self.generate_conversation_id()}
+            return
+        
+        reply = []
+        try:
+            for text in stream_chat_tokens(self.client, model="gpt-3.5-turbo", messages=messages,
+                                           max_tokens=800, temperature=0.7):
+                reply.append(text)
+                yield 'token', {'text': text}
+        except Exception as e:
+            log_event(logger, logging.WARNING, 'chat_stream_failed', error=str(e))
+            yield 'error', {'error': f"Sorry, I'm having trouble right now. Please try again. ({str(e)})"}
+            return
+        
+        if key:
+            get_chat_cache().set(key, {
+                'success': True,
+                'response': ''.join(reply),
+                'relevant_activities': relevant_activities[:2],
+                'source': 'local'
+            })
+        yield 'done', {'source': 'local', 'conversation_id': self.generate_conversation_id()}
+    
     def generate_activity_breakdown(self, activity_name: str) -> dict:
         """Generate detailed breakdown using Supabase coach with local fallback"""
         
         # Try Supabase enrichment-coach for activity-specific help
-        if supabase_client.enabled:
+        if supabase_client.is_available():
             try:
-                print(f"🎨 Using Supabase for activity breakdown: {activity_name}")
+                log_event(logger, logging.DEBUG, 'breakdown_source', source='supabase', activity=activity_name)
                 
-                # Get dog profile from session
-                dog_profile = self.build_dog_profile_from_session()
+                # Get dog profile from session, reduced to what the cache key covers
+                dog_profile = bucket_profile(self.build_dog_profile_from_session())
                 
                 # Get activity details for context
                 activity_details = self.get_activity_from_database(activity_name)
@@ -292,14 +337,15 @@ class EnrichmentChatAssistant:
                     # Ask for detailed breakdown
                     message = f"Please provide a detailed step-by-step breakdown for the '{activity_name}' activity. Include preparation steps, success criteria, troubleshooting tips, and how to make it easier or harder based on my dog's profile."
                     
-                    result = supabase_client.get_enrichment_coach_advice(
-                        message,
-                        dog_profile,
-                        activity_context=activity_context
-                    )
+                    result = cached(get_breakdown_cache(), breakdown_key(activity_details, 'supabase', dog_profile),
+                                    lambda: supabase_client.get_enrichment_coach_advice(
+                                        message,
+                                        dog_profile,
+                                        activity_context=activity_context
+                                    ))
                     
                     if result['success']:
-                        print("✅ Supabase activity breakdown successful")
+                        log_event(logger, logging.DEBUG, 'supabase_breakdown_succeeded', activity=activity_name)
                         return {
                             'success': True,
                             'activity': activity_details,
@@ -308,26 +354,22 @@ class EnrichmentChatAssistant:
                             'source': 'supabase'
                         }
                     else:
-                        print(f"❌ Supabase breakdown failed: {result.get('error')}")
                         raise Exception(result.get('error', 'Supabase breakdown failed'))
                 else:
-                    print(f"❌ Activity '{activity_name}' not found in database")
                     raise Exception(f"Activity '{activity_name}' not found")
                     
             except Exception as e:
-                print(f"🔄 Supabase breakdown failed, falling back to local: {str(e)}")
+                log_event(logger, logging.WARNING, 'supabase_breakdown_failed', activity=activity_name, error=str(e))
         
         # Fallback to local breakdown
-        print("🔄 Using local activity breakdown")
+        log_event(logger, logging.DEBUG, 'breakdown_source', source='local', activity=activity_name)
         return self.generate_local_activity_breakdown(activity_name)
     
     def get_activity_from_database(self, activity_name: str) -> dict:
         """Get activity details from local database"""
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.get_connection().cursor()
         cursor.execute("SELECT * FROM activities WHERE name = ?", (activity_name,))
         result = cursor.fetchone()
-        conn.close()
         
         if not result:
             return None
@@ -348,11 +390,9 @@ class EnrichmentChatAssistant:
         """Original local activity breakdown generation"""
         
         # Get activity from database
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.get_connection().cursor()
         cursor.execute("SELECT * FROM activities WHERE name = ?", (activity_name,))
         result = cursor.fetchone()
-        conn.close()
         
         if not result:
             return {
@@ -394,15 +434,21 @@ class EnrichmentChatAssistant:
         Format as clear, numbered steps that a beginner could follow.
         """
         
+        if not self.client:
+            return {
+                'success': False,
+                'error': f"OpenAI API not available for activity breakdown.",
+                'activity': activity,
+                'source': 'local'
+            }
+        
+        # The prompt depends only on the activity row, so the answer is cached under its content
+        return cached(get_breakdown_cache(), breakdown_key(activity, 'local'),
+                      lambda: self.complete_local_breakdown(activity, breakdown_prompt))
+    
+    def complete_local_breakdown(self, activity: dict, breakdown_prompt: str) -> dict:
+        """Run the local model on a breakdown prompt"""
         try:
-            if not self.client:
-                return {
-                    'success': False,
-                    'error': f"OpenAI API not available for activity breakdown.",
-                    'activity': activity,
-                    'source': 'local'
-                }
-            
             response = self.client.ChatCompletion.create(
                 model="gpt-3.5-turbo",
                 messages=[
@@ -435,10 +481,10 @@ class EnrichmentChatAssistant:
         return f"conv_{int(time.time())}_{random.randint(1000, 9999)}"
 
 # Flask routes for chat functionality
-def add_chat_routes(app, openai_api_key):
-    """Add chat routes to Flask app"""
+def add_chat_routes(app, openai_api_key, get_db: Optional[Callable[[], EnrichmentDatabase]] = None):
+    """Add chat routes to Flask app; returns the assistant serving them"""
     
-    chat_assistant = EnrichmentChatAssistant(openai_api_key)
+    chat_assistant = EnrichmentChatAssistant(openai_api_key, get_db=get_db)
     
     @app.route('/api/chat', methods=['POST'])
     def chat_endpoint():
@@ -465,6 +511,30 @@ def add_chat_routes(app, openai_api_key):
                 'error': f'Chat error: {str(e)}'
             }), 500
     
+    @app.route('/api/chat/stream', methods=['POST'])
+    def chat_stream_endpoint():
+        """Handle chat messages, streaming the reply as Server-Sent Events"""
+        data = request.json or {}
+        user_message = data.get('message', '').strip()
+        conversation_history = data.get('history', [])
+        
+        if not user_message:
+            return jsonify({
+                'success': False,
+                'error': 'Please enter a message'
+            }), 400
+        
+        def events():
+            for event, payload in chat_assistant.stream_chat_response(user_message, conversation_history):
+                yield sse_event(event, payload)
+        
+        return Response(
+            stream_with_context(events()),
+            mimetype='text/event-stream',
+            # Keep proxies from buffering the stream
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    
     @app.route('/api/activity-breakdown', methods=['POST'])
     def activity_breakdown_endpoint():
         """Handle activity breakdown requests"""
@@ -488,6 +558,8 @@ def add_chat_routes(app, openai_api_key):
                 'success': False,
                 'error': f'Breakdown error: {str(e)}'
             }), 500
+    
+    return chat_assistant
 
 if __name__ == "__main__":
     # Test the chat assistant
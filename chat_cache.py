@@ -0,0 +1,92 @@
+"""
+Response caches for the chat assistant
+
+Breakdowns: the prompt depends only on the activity row (plus, for the
+Supabase coach, the dog's profile bucket), so answers are cached persistently
+under a hash of (activity content, prompt version, profile bucket). Editing an
+activity changes its content hash, so the edited row is never served an old
+breakdown; stale entries simply age out.
+
+Chat: first messages (no conversation history) are cached under their
+normalized wording, so "How do I keep my puppy busy?" and "how do i keep my
+puppy busy" share an answer. The key also carries a fingerprint of the
+library activities given to the model as context, which again invalidates
+answers built on an activity that has since been edited.
+
+Both caches are built on first use (the breakdown cache opens its SQLite
+file then), so importing this module creates nothing.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from app_services import LazyService
+from response_cache import create_response_cache, cache_key
+
+# Bump when a breakdown prompt changes so old answers are not reused
+BREAKDOWN_PROMPT_VERSION = 1
+CHAT_PROMPT_VERSION = 1
+
+BREAKDOWN_CACHE_TTL = float(os.environ.get('BREAKDOWN_CACHE_TTL', 30 * 24 * 3600))
+BREAKDOWN_CACHE_MAX_ENTRIES = int(os.environ.get('BREAKDOWN_CACHE_MAX_ENTRIES', 2048))
+# Breakdowns are worth keeping across restarts, so they default to the SQLite file
+BREAKDOWN_CACHE_BACKEND = os.environ.get('BREAKDOWN_CACHE_BACKEND', 'sqlite').lower()
+CHAT_CACHE_TTL = float(os.environ.get('CHAT_CACHE_TTL', 6 * 3600))
+CHAT_CACHE_MAX_ENTRIES = int(os.environ.get('CHAT_CACHE_MAX_ENTRIES', 1024))
+
+# Words that don't change what is being asked
+STOPWORDS = {
+    'a', 'an', 'the', 'is', 'are', 'am', 'my', 'i', 'me', 'do', 'does', 'can',
+    'could', 'would', 'should', 'please', 'some', 'any', 'for', 'to', 'of',
+    'with', 'what', 'hi', 'hello', 'hey', 'thanks', 'thank', 'you', 'it', 'be'
+}
+
+# Coach replies are shared by every dog with the same values for these fields
+PROFILE_BUCKET_FIELDS = ('size', 'ageGroup', 'energyLevel', 'livingSituation')
+
+get_breakdown_cache = LazyService(lambda: create_response_cache(
+    'activity_breakdown', BREAKDOWN_CACHE_TTL, max_entries=BREAKDOWN_CACHE_MAX_ENTRIES, backend=BREAKDOWN_CACHE_BACKEND
+))
+get_chat_cache = LazyService(lambda: create_response_cache('chat_replies', CHAT_CACHE_TTL, max_entries=CHAT_CACHE_MAX_ENTRIES))
+
+def normalize_query(query: str) -> str:
+    """Lowercase words without punctuation or filler words, in their original order"""
+    words = re.findall(r"[a-z0-9]+", query.lower())
+    return ' '.join(word for word in words if word not in STOPWORDS)
+
+def bucket_profile(dog_profile: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    The dog profile cut down to the fields its cache bucket is keyed on. This
+    is what the coach is sent, so a cached reply never names another user's dog.
+    """
+    if not dog_profile:
+        return None
+    return {field: dog_profile.get(field) for field in PROFILE_BUCKET_FIELDS}
+
+def profile_bucket(dog_profile: Optional[Dict[str, Any]]) -> Optional[tuple]:
+    """The parts of a Supabase dog profile that shape advice (not the dog's name or breed)"""
+    profile = bucket_profile(dog_profile)
+    return tuple(profile.values()) if profile else None
+
+def breakdown_key(activity: Dict[str, Any], source: str, dog_profile: Dict[str, Any] = None) -> str:
+    return cache_key({
+        'activity': activity,
+        'prompt_version': BREAKDOWN_PROMPT_VERSION,
+        'source': source,
+        'profile': profile_bucket(dog_profile)
+    })
+
+def chat_key(query: str, source: str, context_activities: List[Dict[str, Any]] = None,
+             dog_profile: Dict[str, Any] = None) -> Optional[str]:
+    """None when the question normalizes to nothing worth caching"""
+    normalized = normalize_query(query)
+    if not normalized:
+        return None
+    return cache_key({
+        'query': normalized,
+        'prompt_version': CHAT_PROMPT_VERSION,
+        'source': source,
+        'context': cache_key(context_activities or []),
+        'profile': profile_bucket(dog_profile)
+    })
@@ -34,7 +34,11 @@ class LibraryChecker:
             print(f"  {category}: {count} activities")
         
         # Check for chewing activities specifically
-        cursor.execute("SELECT COUNT(*) FROM activities WHERE name LIKE '%chew%' OR name LIKE '%bone%' OR name LIKE '%Kong%'")
+        cursor.execute("""
+            SELECT COUNT(*) FROM activities
+            WHERE name LIKE '%chew%' OR name LIKE '%bone%' OR name LIKE '%Kong%'
+            OR id IN (SELECT activity_id FROM activity_tag WHERE tag = 'chewing')
+        """)
         chewing_count = cursor.fetchone()[0]
         print(f"\n🦴 Chewing/Bone Activities: {chewing_count}")
         
@@ -56,6 +60,19 @@ class LibraryChecker:
                 subcat_name = subcat if subcat else "General"
                 print(f"  {subcat_name}: {count}")
         
+        # Coverage by breed size and age group (via the indexed attribute tables)
+        cursor.execute("SELECT breed_size, COUNT(DISTINCT activity_id) FROM activity_breed_size GROUP BY breed_size ORDER BY breed_size")
+        by_breed_size = cursor.fetchall()
+        cursor.execute("SELECT age_group, COUNT(DISTINCT activity_id) FROM activity_age_group GROUP BY age_group ORDER BY age_group")
+        by_age_group = cursor.fetchall()
+        
+        print(f"\n📏 Breed Size Coverage:")
+        for breed_size, count in by_breed_size:
+            print(f"  {breed_size}: {count}")
+        print(f"\n🎂 Age Group Coverage:")
+        for age_group, count in by_age_group:
+            print(f"  {age_group}: {count}")
+        
         # Check for missing categories
         expected_categories = ['Mental', 'Physical', 'Social', 'Environmental', 'Instinctual', 'Passive']
         existing_categories = [cat for cat, _ in by_category]
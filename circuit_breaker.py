@@ -0,0 +1,83 @@
+"""
+Circuit breaker for calls to remote services
+
+After `failure_threshold` consecutive failures the circuit opens and callers
+are told to skip the service for `reset_timeout` seconds, instead of each one
+waiting for its own timeout. When the cool-down ends a single trial call is let
+through (half-open): success closes the circuit, failure opens it again.
+
+State is per process; every gunicorn worker trips its own breaker.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from app_logging import get_logger, log_event
+
+logger = get_logger('circuit')
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+    
+    def allow_request(self) -> bool:
+        """Whether a call may go out now (claims the trial slot when half-open)"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+    
+    def is_available(self) -> bool:
+        """Whether a call would be allowed, without claiming the trial slot"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == CLOSED or not self._trial_in_flight
+    
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                log_event(logger, logging.INFO, 'circuit_closed', circuit=self.name)
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    log_event(logger, logging.WARNING, 'circuit_opened', circuit=self.name,
+                              failures=self.failures, cooldown_s=self.reset_timeout)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'short_circuited': self.short_circuited
+            }
@@ -7,7 +7,7 @@ your database to its original state with only the well-curated activities.
 """
 
 import sqlite3
-from enrichment_database import EnrichmentDatabase
+from enrichment_database import EnrichmentDatabase, ATTRIBUTE_TABLES
 
 class DatabaseCleanup:
     def __init__(self):
@@ -40,6 +40,9 @@ class DatabaseCleanup:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         cursor.execute("DROP TABLE IF EXISTS activities")
+        for table in ATTRIBUTE_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute("DROP TABLE IF EXISTS activities_fts")
         conn.commit()
         conn.close()
         
@@ -1,5 +1,7 @@
 import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
 def get_database_path():
@@ -27,3 +29,80 @@ def ensure_database_directory():
     if db_dir:
         os.makedirs(db_dir, exist_ok=True)
     return db_path
+
+# SQLite tuning, overridable per deployment
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 16384))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))
+SQLITE_CACHED_STATEMENTS = int(os.environ.get('SQLITE_CACHED_STATEMENTS', 256))
+
+class ConnectionManager:
+    """
+    Hands out one long-lived SQLite connection per thread.
+    
+    Connections are opened lazily, tuned once (WAL, page cache, mmap) and then
+    reused, so the schema parse, page-cache warmup and prepared statement cache
+    survive between requests. Connections are never shared across threads or
+    across a fork: a worker that inherits the manager opens its own.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open_connections = []  # (thread, pid, connection)
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        
+        conn = self._open()
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        
+        with self._lock:
+            # Drop connections owned by threads that have finished
+            alive = []
+            for thread, pid, other in self._open_connections:
+                if pid == os.getpid() and not thread.is_alive():
+                    other.close()
+                else:
+                    alive.append((thread, pid, other))
+            alive.append((threading.current_thread(), os.getpid(), conn))
+            self._open_connections = alive
+        
+        return conn
+    
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=SQLITE_BUSY_TIMEOUT,
+            cached_statements=SQLITE_CACHED_STATEMENTS,
+            # Each connection stays on its own thread; this only lets
+            # close_all() clean up after threads that have exited
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+    
+    @contextmanager
+    def transaction(self):
+        """Yield this thread's connection inside a commit/rollback block"""
+        conn = self.get_connection()
+        with conn:
+            yield conn
+    
+    def close_all(self):
+        """Close every connection this process opened (e.g. on shutdown)"""
+        with self._lock:
+            for thread, pid, conn in self._open_connections:
+                if pid == os.getpid():
+                    conn.close()
+            self._open_connections = []
+        self._local = threading.local()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Drop Folder Watcher
+
+Keeps importing activity files as they land in new_activities/, instead of
+someone running drop_folder_importer.py by hand:
+
+    python drop_folder_watcher.py [--improved] [--poll] [--workers N]
+
+On Linux the folder is watched with inotify (through ctypes, no extra
+package); elsewhere, or with --poll, the folder listing is compared every
+WATCH_POLL_INTERVAL seconds. Events are debounced: a file is imported once it
+has been quiet for WATCH_DEBOUNCE seconds, so a copy still in progress is not
+parsed half-written. Only the files that changed are parsed, and each batch
+goes through import_pipeline (ordered inserts, one transaction per group,
+atomic move to processed_activities/).
+
+The running web app needs no signal: every commit bumps the library data
+version, and each worker re-reads it at most every DATA_VERSION_CHECK_INTERVAL
+seconds, rebuilding its activity index, embeddings and cached library page.
+With --reload-pidfile the watcher also sends the gunicorn master SIGHUP after
+each import that added activities, so it rebuilds the shared snapshot once
+and forks fresh workers from it (see preload.py).
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import signal
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from import_pipeline import IMPORT_WORKERS, print_report, run_import
+from preload import request_reload
+
+WATCH_DEBOUNCE = float(os.environ.get('WATCH_DEBOUNCE', 1.0))
+WATCH_POLL_INTERVAL = float(os.environ.get('WATCH_POLL_INTERVAL', 2.0))
+GUNICORN_PIDFILE = os.environ.get('GUNICORN_PIDFILE')
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+def _txt_names(folder: Path) -> Set[str]:
+    return {entry.name for entry in os.scandir(folder) if entry.is_file() and entry.name.endswith('.txt')}
+
+class InotifyWatcher:
+    """Names of .txt files created, written or moved into a folder (Linux only)"""
+    
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self.fd, os.fsencode(self.folder), mask) < 0:
+            error = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(error, f"cannot watch {self.folder}")
+    
+    def changes(self, timeout: float) -> Set[str]:
+        """Wait up to timeout seconds and return the files touched meanwhile"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        names = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped: fall back to everything that's there
+                names |= _txt_names(self.folder)
+            elif name.endswith('.txt'):
+                names.add(name)
+        return names
+    
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """Same interface as InotifyWatcher, by comparing (mtime, size) listings"""
+    
+    def __init__(self, folder: Path, interval: float = WATCH_POLL_INTERVAL):
+        self.folder = Path(folder)
+        self.interval = interval
+        self._seen = self._snapshot()
+    
+    def _snapshot(self) -> Dict[str, tuple]:
+        snapshot = {}
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name.endswith('.txt'):
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+    
+    def changes(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._snapshot()
+        changed = {name for name, state in snapshot.items() if self._seen.get(name) != state}
+        self._seen = snapshot
+        return changed
+    
+    def close(self):
+        pass
+
+def open_watcher(folder: Path, poll: bool = False):
+    """inotify when possible, polling otherwise"""
+    if not poll:
+        try:
+            return InotifyWatcher(folder)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️ inotify unavailable ({e}), polling every {WATCH_POLL_INTERVAL:g}s")
+    return PollingWatcher(folder)
+
+def watch(importer, poll: bool = False, workers: int = IMPORT_WORKERS, debounce: float = WATCH_DEBOUNCE,
+          stop: Optional[threading.Event] = None, reload_pidfile: Optional[str] = None):
+    """Import files from importer.drop_folder as they settle, until stop is set"""
+    stop = stop or threading.Event()
+    watcher = open_watcher(importer.drop_folder, poll)
+    # name -> when it last changed; files already waiting are imported first
+    pending = {name: 0.0 for name in _txt_names(importer.drop_folder)}
+    print(f"👀 Watching {importer.drop_folder}/ ({type(watcher).__name__}, {debounce:g}s debounce)")
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            if pending:
+                timeout = max(0.0, min(changed_at for changed_at in pending.values()) + debounce - now)
+            else:
+                timeout = 1.0
+            for name in watcher.changes(min(timeout, 1.0)):
+                pending[name] = time.monotonic()
+            
+            now = time.monotonic()
+            ready = sorted(name for name, changed_at in pending.items() if now - changed_at >= debounce)
+            for name in ready:
+                del pending[name]
+            paths = [importer.drop_folder / name for name in ready if (importer.drop_folder / name).is_file()]
+            if paths:
+                report = run_import(importer, paths, workers)
+                print_report(report)
+                if reload_pidfile and report['added'] and request_reload(reload_pidfile):
+                    print(f"🔄 Asked the web server to reload ({reload_pidfile})")
+    finally:
+        watcher.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import activity files as they arrive in new_activities/")
+    parser.add_argument('--improved', action='store_true', help="use the improved (concatenated-format) parser")
+    parser.add_argument('--poll', action='store_true', help="poll the folder instead of using inotify")
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS, help="parser processes (0 = one per CPU)")
+    parser.add_argument('--debounce', type=float, default=WATCH_DEBOUNCE, help="seconds a file must be quiet")
+    parser.add_argument('--reload-pidfile', default=GUNICORN_PIDFILE or None,
+                        help="gunicorn pidfile; its master reloads after imports that added activities")
+    args = parser.parse_args()
+    
+    if args.improved:
+        from improved_importer import ImprovedDropFolderImporter as Importer
+    else:
+        from drop_folder_importer import DropFolderImporter as Importer
+    
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        watch(Importer(), args.poll, args.workers, args.debounce, stop, args.reload_pidfile)
+    except KeyboardInterrupt:
+        pass
+    print("\n👋 Watcher stopped")
+
+if __name__ == "__main__":
+    main()
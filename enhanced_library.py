@@ -12,6 +12,7 @@ import time
 import random
 import openai
 from enrichment_database import EnrichmentDatabase
+from activity_dedup import ActivityDeduplicator
 import re
 from typing import List, Dict, Any
 
@@ -215,6 +216,7 @@ class EnhancedActivityLibrary:
         print("=" * 50)
         
         categories = ['Mental', 'Physical', 'Social', 'Environmental', 'Instinctual', 'Passive']
+        dedup = ActivityDeduplicator.from_database(self.db)
         
         for category in categories:
             print(f"\n📚 Building {category} activities...")
@@ -241,18 +243,18 @@ class EnhancedActivityLibrary:
             # Curate and improve quality
             curated_activities = self.curate_quality_activities(all_activities[:target_per_category])
             
-            # Add to database
-            added_count = 0
+            # Add to database, one transaction per category
             for activity in curated_activities:
-                try:
-                    activity['category'] = category  # Ensure correct category
-                    self.db.add_activity(activity)
-                    print(f"  ✅ Added: {activity['name']}")
-                    added_count += 1
-                except Exception as e:
-                    print(f"  ❌ Error adding {activity.get('name', 'Unknown')}: {e}")
+                activity['category'] = category  # Ensure correct category
+            result = dedup.store(self.db, curated_activities)
+            for name in result['added']:
+                print(f"  ✅ Added: {name}")
+            for name, match in result['duplicates']:
+                print(f"  ⏭️  Skipped: {name} ({match})")
+            for name, error in result['invalid']:
+                print(f"  ❌ Error adding {name or 'Unknown'}: {error}")
             
-            print(f"  📊 Added {added_count} {category} activities")
+            print(f"  📊 Added {len(result['added'])} {category} activities")
         
         self.show_library_summary()
     
@@ -1,180 +1,604 @@
 import sqlite3
+import itertools
 import json
-from typing import List, Dict, Any
-from database_config import ensure_database_directory
+import logging
+import os
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Sequence, Tuple, TypeVar
+from database_config import ensure_database_directory, ConnectionManager
+from activity_index import ActivityIndex, ACTIVITY_COLUMNS, JSON_COLUMNS
+from sampling import Sampler
+from activity_embeddings import (
+    ActivityEmbeddings, EMBEDDINGS_ENABLED, build_embeddings, embeddings_path, load_embeddings, save_embeddings
+)
+from app_logging import get_logger, log_event
+
+logger = get_logger('database')
+
+T = TypeVar('T')
+
+# Multi-valued attributes normalized out of their JSON columns:
+# table -> (value column, JSON source column on activities)
+ATTRIBUTE_TABLES = {
+    'activity_breed_size': ('breed_size', 'breed_sizes'),
+    'activity_age_group': ('age_group', 'age_groups'),
+    'activity_tag': ('tag', 'tags'),
+    'activity_material': ('material', 'materials')
+}
+
+# (schema version, EnrichmentDatabase method) applied in order by init_database;
+# the version is tracked in PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    (1, 'migrate_attribute_tables'),
+    (2, 'migrate_unique_names')
+]
+
+# Columns mirrored into the activities_fts full-text index, with their BM25
+# weights (a hit in the name counts for more than one in the instructions)
+SEARCH_COLUMNS = {
+    'name': 10.0,
+    'description': 4.0,
+    'category': 3.0,
+    'tags': 6.0,
+    'materials': 1.0,
+    'instructions': 1.0
+}
+
+# How long a worker trusts its last read of the library data version before
+# re-checking it (picks up imports made by other processes)
+DATA_VERSION_CHECK_INTERVAL = float(os.environ.get('DATA_VERSION_CHECK_INTERVAL', '1.0'))
+
+# How many random profile matches find_matching_activities draws per requested
+# activity before keeping those closest to the profile (embedding re-rank)
+EMBEDDING_RERANK_POOL = int(os.environ.get('EMBEDDING_RERANK_POOL', 3))
+
+# Columns written by add_activities, in _activity_row order
+ACTIVITY_WRITE_COLUMNS = (
+    'name', 'category', 'subcategory', 'description', 'materials', 'instructions',
+    'safety_notes', 'estimated_time', 'difficulty_level', 'energy_required',
+    'weather_suitable', 'breed_sizes', 'age_groups', 'tags'
+)
+
+# Rows per executemany call in add_activities (all chunks share one transaction)
+ADD_ACTIVITIES_CHUNK_SIZE = int(os.environ.get('ADD_ACTIVITIES_CHUNK_SIZE', 500))
+
+def _activity_row(activity_data: Dict[str, Any]) -> tuple:
+    """Column values for an activity, with the defaults add_activity has always used"""
+    return (
+        activity_data['name'],
+        activity_data['category'],
+        activity_data.get('subcategory', ''),
+        activity_data.get('description', ''),
+        json.dumps(activity_data['materials']),
+        json.dumps(activity_data['instructions']),
+        activity_data['safety_notes'],
+        activity_data['estimated_time'],
+        activity_data.get('difficulty_level', 'Medium'),
+        activity_data.get('energy_required', 'Medium'),
+        activity_data.get('weather_suitable', 'Any'),
+        json.dumps(activity_data.get('breed_sizes', ['All'])),
+        json.dumps(activity_data.get('age_groups', ['All'])),
+        json.dumps(activity_data.get('tags', []))
+    )
+
+def _chunks(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, max(1, size)))
+        if not chunk:
+            return
+        yield chunk
+
+def _json_array(expression: str) -> str:
+    """SQL for a JSON column that falls back to an empty array when malformed"""
+    return f"CASE WHEN json_valid({expression}) THEN {expression} ELSE '[]' END"
+
+class DuplicateActivityError(ValueError):
+    """An activity with the same name is already in the library"""
+
+class DuplicateNamesError(RuntimeError):
+    """Schema v2 (unique names) can't be applied: these names are repeated"""
+    
+    def __init__(self, duplicates: List[Tuple[str, int]]):
+        self.duplicates = duplicates
+        listed = ', '.join(f"{name!r} x{count}" for name, count in duplicates[:20])
+        if len(duplicates) > 20:
+            listed += f", ... ({len(duplicates) - 20} more)"
+        super().__init__(
+            f"{len(duplicates)} activity names are repeated: {listed}. Rename them, or run "
+            f"`python migrate_database.py --merge-duplicates` to keep the oldest row of each "
+            f"and export the others to a JSON file"
+        )
 
 class EnrichmentDatabase:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, sampler: Optional[Sampler] = None):
         if db_path is None:
             self.db_path = ensure_database_directory()
         else:
             self.db_path = db_path
+        self.connections = ConnectionManager(self.db_path)
+        self._activity_index = None
+        self._index_lock = threading.Lock()
+        self._embeddings = None
+        self._embeddings_lock = threading.Lock()
+        self.embeddings_path = embeddings_path(self.db_path)
+        # Pass Sampler(seed) for reproducible activity picks
+        self.sampler = sampler or Sampler()
+        self.search_enabled = False
+        self._data_version = None
+        self._version_checked_at = 0.0
         self.init_database()
         self.populate_initial_data()
     
+    def get_connection(self) -> sqlite3.Connection:
+        """Return the reusable connection for the current thread (never close it)"""
+        return self.connections.get_connection()
+    
     def init_database(self):
-        """Initialize the database with activity tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        """Initialize the database with activity tables and bring the schema up to date"""
+        if self.schema_is_current():
+            return
+        with self.connections.transaction() as conn:
+            # Take the write lock first so concurrent workers migrate one at a time
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            
+            # Create activities table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS activities (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    subcategory TEXT,
+                    description TEXT,
+                    materials TEXT, -- JSON array
+                    instructions TEXT, -- JSON array
+                    safety_notes TEXT,
+                    estimated_time TEXT,
+                    difficulty_level TEXT,
+                    energy_required TEXT,
+                    weather_suitable TEXT,
+                    breed_sizes TEXT, -- JSON array
+                    age_groups TEXT, -- JSON array
+                    tags TEXT, -- JSON array
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Keyset pagination order for /api/activities (the rowid rides along)
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_activities_category_name ON activities (category, name)")
+            
+            self.create_attribute_tables(cursor)
+            self.create_version_tracking(cursor)
+            self.search_enabled = self.create_search_index(cursor)
+            
+            cursor.execute("PRAGMA user_version")
+            version = cursor.fetchone()[0]
+            for target_version, migration in SCHEMA_MIGRATIONS:
+                if version < target_version:
+                    getattr(self, migration)(cursor)
+                    cursor.execute(f"PRAGMA user_version = {target_version}")
+    
+    def schema_is_current(self) -> bool:
+        """
+        Whether init_database has already run to the latest schema version (with
+        the search index), so opening the database needs no write transaction
+        """
+        cursor = self.get_connection().cursor()
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] < SCHEMA_MIGRATIONS[-1][0]:
+            return False
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'activities_fts'")
+        self.search_enabled = cursor.fetchone() is not None
+        return self.search_enabled
+    
+    def create_attribute_tables(self, cursor: sqlite3.Cursor):
+        """Create the normalized attribute tables and the triggers that keep them in sync"""
+        for table, (column, source) in ATTRIBUTE_TABLES.items():
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    activity_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    {column} TEXT NOT NULL,
+                    PRIMARY KEY (activity_id, position)
+                ) WITHOUT ROWID
+            ''')
+            # Covering index for "which activities have this value" lookups
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column}, activity_id)")
         
-        # Create activities table
+        # Triggers fire for every writer (importers and admin scripts included),
+        # so the attribute tables never drift from the JSON columns
+        inserts = ''.join(
+            f"INSERT INTO {table} (activity_id, position, {column}) "
+            f"SELECT NEW.id, key, value FROM json_each({_json_array('NEW.' + source)});\n"
+            for table, (column, source) in ATTRIBUTE_TABLES.items()
+        )
+        def deletes(row):
+            return ''.join(f"DELETE FROM {table} WHERE activity_id = {row}.id;\n" for table in ATTRIBUTE_TABLES)
+        sources = ', '.join(source for _, source in ATTRIBUTE_TABLES.values())
+        
+        # The insert trigger clears first in case ids restart after the table is dropped
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS activities_attributes_insert AFTER INSERT ON activities BEGIN\n{deletes('NEW')}{inserts}END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS activities_attributes_update AFTER UPDATE OF {sources} ON activities BEGIN\n{deletes('OLD')}{inserts}END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS activities_attributes_delete AFTER DELETE ON activities BEGIN\n{deletes('OLD')}END")
+    
+    def create_version_tracking(self, cursor: sqlite3.Cursor):
+        """Create the library data-version counter, bumped on every write to activities"""
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS activities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT NOT NULL,
-                subcategory TEXT,
-                description TEXT,
-                materials TEXT, -- JSON array
-                instructions TEXT, -- JSON array
-                safety_notes TEXT,
-                estimated_time TEXT,
-                difficulty_level TEXT,
-                energy_required TEXT,
-                weather_suitable TEXT,
-                breed_sizes TEXT, -- JSON array
-                age_groups TEXT, -- JSON array
-                tags TEXT, -- JSON array
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            CREATE TABLE IF NOT EXISTS library_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
+        cursor.execute("INSERT OR IGNORE INTO library_version (id, version) VALUES (1, 0)")
         
-        conn.commit()
-        conn.close()
+        # Triggers rather than application code, so importers and admin scripts
+        # writing with their own connections bump the version too
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS activities_version_{event.lower()} AFTER {event} ON activities BEGIN
+                    UPDATE library_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1;
+                END
+            ''')
+    
+    def create_search_index(self, cursor: sqlite3.Cursor) -> bool:
+        """
+        Create the FTS5 index over activities and its sync triggers. Returns
+        False when this SQLite build has no FTS5 (search falls back to LIKE).
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'activities_fts'")
+        existed = cursor.fetchone() is not None
+        columns = ', '.join(SEARCH_COLUMNS)
+        try:
+            # External content: the index stores tokens only and reads rows from activities
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5(
+                    {columns}, content='activities', content_rowid='id',
+                    tokenize='porter unicode61', prefix='2 3'
+                )
+            ''')
+        except sqlite3.OperationalError as e:
+            log_event(logger, logging.WARNING, 'search_index_unavailable', error=str(e))
+            return False
+        
+        new_values = ', '.join(f"NEW.{column}" for column in SEARCH_COLUMNS)
+        old_values = ', '.join(f"OLD.{column}" for column in SEARCH_COLUMNS)
+        remove = f"INSERT INTO activities_fts (activities_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});"
+        add = f"INSERT INTO activities_fts (rowid, {columns}) VALUES (NEW.id, {new_values});"
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS activities_fts_insert AFTER INSERT ON activities BEGIN {add} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS activities_fts_delete AFTER DELETE ON activities BEGIN {remove} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS activities_fts_update AFTER UPDATE OF {columns} ON activities BEGIN {remove} {add} END")
+        
+        if not existed:
+            # New index (fresh install, or a build that just gained FTS5): index existing rows
+            cursor.execute("INSERT INTO activities_fts (activities_fts) VALUES ('rebuild')")
+        return True
+    
+    def migrate_attribute_tables(self, cursor: sqlite3.Cursor):
+        """Schema v1: backfill the attribute tables from the JSON columns of existing rows"""
+        for table, (column, source) in ATTRIBUTE_TABLES.items():
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(f'''
+                INSERT INTO {table} (activity_id, position, {column})
+                SELECT activities.id, item.key, item.value
+                FROM activities, json_each({_json_array('activities.' + source)}) AS item
+            ''')
+    
+    def migrate_unique_names(self, cursor: sqlite3.Cursor):
+        """
+        Schema v2: make names unique. Repeated names raise DuplicateNamesError
+        (rolling the whole upgrade back) rather than deleting rows on start-up;
+        migrate_database.py --merge-duplicates resolves them explicitly.
+        """
+        cursor.execute("SELECT name, COUNT(*) FROM activities GROUP BY name HAVING COUNT(*) > 1 ORDER BY name")
+        duplicates = cursor.fetchall()
+        if duplicates:
+            raise DuplicateNamesError(duplicates)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_activities_name ON activities (name)")
     
     def add_activity(self, activity_data: Dict[str, Any]):
         """Add a new activity to the database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        self.add_activities([activity_data])
+    
+    def add_activities(self, activities: Iterable[Dict[str, Any]], chunk_size: int = ADD_ACTIVITIES_CHUNK_SIZE,
+                       on_conflict: str = 'error', skip_invalid: bool = False) -> Dict[str, list]:
+        """
+        Add many activities in one transaction (one commit, one fsync), running
+        executemany over chunks of chunk_size rows. Names are unique;
+        on_conflict decides what happens to an activity whose name is already
+        in the library or earlier in the batch: 'error' raises
+        DuplicateActivityError, 'skip' keeps the existing row, 'replace' updates
+        that row in place (upsert by name, the id is kept).
+        An activity missing a required field raises ValueError, unless
+        skip_invalid, which reports it and carries on. Either error adds nothing.
+        Returns {'added', 'updated', 'skipped': [names], 'invalid': [(name, error)]}.
+        """
+        if on_conflict not in ('error', 'skip', 'replace'):
+            raise ValueError(f"on_conflict must be 'error', 'skip' or 'replace', not {on_conflict!r}")
+        result = {'added': [], 'updated': [], 'skipped': [], 'invalid': []}
+        insert_sql = (f"INSERT INTO activities ({', '.join(ACTIVITY_WRITE_COLUMNS)}) "
+                      f"VALUES ({', '.join('?' for _ in ACTIVITY_WRITE_COLUMNS)})")
+        if on_conflict == 'replace':
+            insert_sql += " ON CONFLICT (name) DO UPDATE SET " + ', '.join(
+                f"{column} = excluded.{column}" for column in ACTIVITY_WRITE_COLUMNS[1:]
+            )
         
-        cursor.execute('''
-            INSERT INTO activities 
-            (name, category, subcategory, description, materials, instructions, 
-             safety_notes, estimated_time, difficulty_level, energy_required, 
-             weather_suitable, breed_sizes, age_groups, tags)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            activity_data['name'],
-            activity_data['category'],
-            activity_data.get('subcategory', ''),
-            activity_data.get('description', ''),
-            json.dumps(activity_data['materials']),
-            json.dumps(activity_data['instructions']),
-            activity_data['safety_notes'],
-            activity_data['estimated_time'],
-            activity_data.get('difficulty_level', 'Medium'),
-            activity_data.get('energy_required', 'Medium'),
-            activity_data.get('weather_suitable', 'Any'),
-            json.dumps(activity_data.get('breed_sizes', ['All'])),
-            json.dumps(activity_data.get('age_groups', ['All'])),
-            json.dumps(activity_data.get('tags', []))
-        ))
+        with self.connections.transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            batch_names = set()
+            for chunk in _chunks(activities, chunk_size):
+                rows = []
+                for activity_data in chunk:
+                    try:
+                        rows.append(_activity_row(activity_data))
+                    except KeyError as e:
+                        if not skip_invalid:
+                            raise ValueError(f"Activity {activity_data.get('name')!r} is missing {e}") from e
+                        result['invalid'].append((activity_data.get('name'), f"missing {e}"))
+                
+                # One indexed lookup per chunk for the names already stored
+                names = list({row[0] for row in rows})
+                existing = {name for (name,) in conn.execute(
+                    f"SELECT name FROM activities WHERE name IN ({', '.join('?' for _ in names)})", names
+                )} if names else set()
+                
+                inserts = []
+                for row in rows:
+                    name = row[0]
+                    if name not in existing and name not in batch_names:
+                        result['added'].append(name)
+                    elif on_conflict == 'error':
+                        raise DuplicateActivityError(f"An activity named {name!r} already exists")
+                    elif on_conflict == 'skip':
+                        result['skipped'].append(name)
+                        continue
+                    elif name not in result['updated']:
+                        result['updated'].append(name)
+                    batch_names.add(name)
+                    inserts.append(row)
+                
+                if inserts:
+                    conn.executemany(insert_sql, inserts)
         
-        conn.commit()
-        conn.close()
+        if result['added'] or result['updated']:
+            self.invalidate_activity_index()
+        return result
     
-    def find_matching_activities(self, dog_profile: Dict[str, str], limit: int = 4) -> List[Dict[str, Any]]:
-        """Find activities that match the dog's profile"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def get_library_version(self) -> tuple:
+        """Current (data version, updated_at) of the activities table, read from the database"""
+        cursor = self.get_connection().cursor()
+        cursor.execute("SELECT version, updated_at FROM library_version WHERE id = 1")
+        row = cursor.fetchone()
+        return (row[0], row[1]) if row else (0, None)
+    
+    def get_data_version(self) -> int:
+        """Library data version, re-read at most every DATA_VERSION_CHECK_INTERVAL seconds"""
+        now = time.monotonic()
+        if self._data_version is None or now - self._version_checked_at >= DATA_VERSION_CHECK_INTERVAL:
+            self._data_version = self.get_library_version()[0]
+            self._version_checked_at = now
+        return self._data_version
+    
+    def get_activity_index(self) -> ActivityIndex:
+        """Return the in-memory activity index, rebuilding it when the data version moves"""
+        version = self.get_data_version()
+        index = self._activity_index
+        if index is None or index.data_version != version:
+            with self._index_lock:
+                index = self._activity_index
+                if index is None or index.data_version != version:
+                    cursor = self.get_connection().cursor()
+                    cursor.execute(f"SELECT {', '.join(ACTIVITY_COLUMNS)} FROM activities ORDER BY id")
+                    rows = cursor.fetchall()
+                    
+                    attribute_values = {}
+                    for attribute, table in (('breed_size', 'activity_breed_size'), ('age_group', 'activity_age_group')):
+                        column = ATTRIBUTE_TABLES[table][0]
+                        values = attribute_values[attribute] = {}
+                        cursor.execute(f"SELECT activity_id, {column} FROM {table} ORDER BY activity_id, position")
+                        for activity_id, value in cursor.fetchall():
+                            values.setdefault(activity_id, []).append(value)
+                    
+                    index = ActivityIndex(rows, attribute_values, data_version=version)
+                    self._activity_index = index
+        return index
+    
+    def get_activity_embeddings(self, index: Optional[ActivityIndex] = None) -> Optional[ActivityEmbeddings]:
+        """
+        Embeddings whose rows follow the positions of index (default: the
+        current activity index), or None when numpy is unavailable. Rows for
+        activities added or edited since the last build are embedded on the
+        next call; the rest are reused, from memory or from the saved file.
+        """
+        if not EMBEDDINGS_ENABLED:
+            return None
+        index = index or self.get_activity_index()
+        embeddings = self._embeddings
+        if embeddings is None or embeddings.data_version != index.data_version:
+            with self._embeddings_lock:
+                embeddings = self._embeddings
+                if embeddings is None or embeddings.data_version != index.data_version:
+                    previous = embeddings or load_embeddings(self.embeddings_path)
+                    embeddings = build_embeddings(index.activities, index.data_version, previous)
+                    if embeddings.reembedded:
+                        try:
+                            save_embeddings(embeddings, self.embeddings_path)
+                        except OSError as e:
+                            log_event(logger, logging.WARNING, 'embeddings_not_saved', error=str(e))
+                        log_event(logger, logging.INFO, 'embeddings_updated', rows=len(embeddings),
+                                  reembedded=embeddings.reembedded)
+                    self._embeddings = embeddings
+        return embeddings
+    
+    def invalidate_activity_index(self):
+        """Drop the in-memory index and re-read the data version on the next lookup"""
+        self._activity_index = None
+        self._data_version = None
+    
+    def iter_activities(self, fields: Sequence[str], category: Optional[str] = None,
+                        breed_size: Optional[str] = None, age_group: Optional[str] = None,
+                        weather: Optional[str] = None, tag: Optional[str] = None,
+                        after: Optional[Tuple[str, str, int]] = None, limit: Optional[int] = None,
+                        batch_size: int = 100) -> Iterator[Tuple[Tuple[str, str, int], Dict[str, Any]]]:
+        """
+        Yield (sort key, activity) in (category, name, id) order, reading the
+        cursor in batches. Only the requested fields are selected and decoded.
+        Breed size and age group also match activities for 'All', weather also
+        matches 'Any'; after is the sort key of the last row already seen.
+        """
+        conditions, params = [], []
+        if category:
+            conditions.append("category = ?")
+            params.append(category)
+        for value, table in ((breed_size, 'activity_breed_size'), (age_group, 'activity_age_group')):
+            if value:
+                column = ATTRIBUTE_TABLES[table][0]
+                conditions.append(
+                    f"EXISTS (SELECT 1 FROM {table} WHERE {table}.activity_id = activities.id "
+                    f"AND ({table}.{column} = ? COLLATE NOCASE OR {table}.{column} = 'All'))"
+                )
+                params.append(value)
+        if weather:
+            conditions.append("(weather_suitable LIKE ? OR weather_suitable LIKE '%Any%')")
+            params.append(f"%{weather}%")
+        if tag:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM activity_tag WHERE activity_tag.activity_id = activities.id "
+                "AND activity_tag.tag = ? COLLATE NOCASE)"
+            )
+            params.append(tag)
+        if after:
+            conditions.append("(category, name, id) > (?, ?, ?)")
+            params.extend(after)
+        
+        query = f"SELECT {', '.join(list(fields) + ['category', 'name', 'id'])} FROM activities"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY category, name, id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
         
-        # Debug: Print what we're searching for
-        print(f"DEBUG: Searching for activities with profile: {dog_profile}")
+        width = len(fields)
+        cursor = self.get_connection().cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    activity = dict(zip(fields, row[:width]))
+                    for column in JSON_COLUMNS:
+                        if column in activity:
+                            activity[column] = json.loads(activity[column]) if activity[column] else []
+                    yield tuple(row[width:]), activity
+        finally:
+            # Release the read snapshot even if the client disconnects mid-stream
+            cursor.close()
+    
+    def search_activities(self, terms: Sequence[str], fields: Sequence[str], limit: int = 3) -> List[Dict[str, Any]]:
+        """
+        Activities matching any of the terms, best BM25 match first. A term of
+        several words is matched as a phrase; single words also match as
+        prefixes ('chew' finds 'chewing'). Without FTS5, falls back to LIKE
+        matching in database order.
+        """
+        terms = [' '.join(re.findall(r"\w+", term)) for term in terms]
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+        
+        selected = ', '.join(f"activities.{field}" for field in fields)
+        cursor = self.get_connection().cursor()
+        if self.search_enabled:
+            match = ' OR '.join(f'"{term}"' if ' ' in term else f'"{term}"*' for term in terms)
+            weights = ', '.join(str(weight) for weight in SEARCH_COLUMNS.values())
+            cursor.execute(f'''
+                SELECT {selected} FROM activities_fts
+                JOIN activities ON activities.id = activities_fts.rowid
+                WHERE activities_fts MATCH ?
+                ORDER BY bm25(activities_fts, {weights})
+                LIMIT ?
+            ''', (match, limit))
+        else:
+            conditions = ' OR '.join(
+                '(' + ' OR '.join(f"activities.{column} LIKE ?" for column in SEARCH_COLUMNS) + ')' for _ in terms
+            )
+            params = [f'%{term}%' for term in terms for _ in SEARCH_COLUMNS]
+            cursor.execute(f"SELECT {selected} FROM activities WHERE {conditions} LIMIT ?", params + [limit])
         
+        activities = []
+        for row in cursor.fetchall():
+            activity = dict(zip(fields, row))
+            for column in JSON_COLUMNS:
+                if column in activity:
+                    activity[column] = json.loads(activity[column]) if activity[column] else []
+            activities.append(activity)
+        return activities
+    
+    def find_matching_activities(self, dog_profile: Dict[str, str], limit: int = 4) -> List[Dict[str, Any]]:
+        """Find activities that match the dog's profile"""
         # Extract profile info
         breed_size = self.extract_breed_size(dog_profile.get('breed', ''))
         age_group = self.extract_age_group(dog_profile.get('age', ''))
-        energy_level = dog_profile.get('energy_level', '')
         weather = self.extract_weather_preference(dog_profile.get('weather', ''))
         enrichment_type = dog_profile.get('enrichment_type', '')
+        category = self.extract_category(enrichment_type)
+        
+        index = self.get_activity_index()
+        embeddings = self.get_activity_embeddings(index)
+        if embeddings is None:
+            results = index.sample(category, breed_size, age_group, weather, limit, sampler=self.sampler)
+        else:
+            # Draw a wider random pool and keep the activities closest to the profile's wording
+            positions = index.match_positions(category, breed_size, age_group, weather)
+            pool = self.sampler.sample(positions, limit * EMBEDDING_RERANK_POOL)
+            profile_text = ' '.join(str(value) for value in dog_profile.values() if isinstance(value, str))
+            results = [index.activities[position] for position in embeddings.rank(profile_text, pool)[:limit]]
+        
+        activities = []
+        for row in results:
+            activity = {
+                'name': row['name'],
+                'category': row['category'],
+                'materials': list(row['materials']),
+                'instructions': list(row['instructions']),
+                'safety_notes': row['safety_notes'],
+                'estimated_time': row['estimated_time']
+            }
+            activities.append(activity)
         
-        print(f"DEBUG: Extracted - breed_size: {breed_size}, enrichment_type: {enrichment_type}")
+        if logger.isEnabledFor(logging.DEBUG):
+            log_event(logger, logging.DEBUG, 'match_activities',
+                      category=category or 'any', breed_size=breed_size, age_group=age_group,
+                      weather=weather, library_size=len(index), limit=limit,
+                      returned='|'.join(activity['name'] for activity in activities))
         
-        # Create search patterns - fix category matching
+        return activities
+    
+    def extract_category(self, enrichment_type: str) -> Optional[str]:
+        """Map the enrichment type answer to a category (None for mixed)"""
         enrichment_type_lower = enrichment_type.lower()
         if 'mental' in enrichment_type_lower:
-            category_pattern = 'Mental'
+            return 'Mental'
         elif 'physical' in enrichment_type_lower:
-            category_pattern = 'Physical'
+            return 'Physical'
         elif 'social' in enrichment_type_lower:
-            category_pattern = 'Social'
+            return 'Social'
         elif 'environmental' in enrichment_type_lower:
-            category_pattern = 'Environmental'
+            return 'Environmental'
         elif 'instinctual' in enrichment_type_lower:
-            category_pattern = 'Instinctual'
+            return 'Instinctual'
         elif 'passive' in enrichment_type_lower:
-            category_pattern = 'Passive'
+            return 'Passive'
         elif 'mixed' in enrichment_type_lower:
-            category_pattern = '%'  # Match any category for mixed
+            return None  # Match any category for mixed
         else:
-            category_pattern = 'Mental'  # Default fallback
-            
-        breed_pattern = f"%{breed_size}%"
-        age_pattern = f"%{age_group}%"
-        weather_pattern = f"%{weather}%"
-        
-        print(f"DEBUG: Search patterns - category: {category_pattern}, breed: {breed_pattern}")
-        
-        # First, let's see what's actually in the database
-        cursor.execute("SELECT name, category FROM activities")
-        all_activities = cursor.fetchall()
-        print(f"DEBUG: Database contains {len(all_activities)} activities:")
-        for activity in all_activities:
-            print(f"  - {activity[0]} ({activity[1]})")
-        
-        # Build dynamic query based on preferences
-        if category_pattern == '%':  # Mixed enrichment - get variety
-            query = '''
-                SELECT * FROM activities 
-                WHERE (breed_sizes LIKE ? OR breed_sizes LIKE ?)
-                AND (age_groups LIKE ? OR age_groups LIKE ?)
-                AND (weather_suitable LIKE ? OR weather_suitable LIKE ?)
-                ORDER BY RANDOM()
-                LIMIT ?
-            '''
-            cursor.execute(query, (
-                breed_pattern, '%All%',
-                age_pattern, '%All%', 
-                weather_pattern, '%Any%',
-                limit
-            ))
-        else:  # Specific category
-            query = '''
-                SELECT * FROM activities 
-                WHERE category = ? 
-                AND (breed_sizes LIKE ? OR breed_sizes LIKE ?)
-                AND (age_groups LIKE ? OR age_groups LIKE ?)
-                AND (weather_suitable LIKE ? OR weather_suitable LIKE ?)
-                ORDER BY RANDOM()
-                LIMIT ?
-            '''
-            cursor.execute(query, (
-                category_pattern, breed_pattern, '%All%',
-                age_pattern, '%All%', 
-                weather_pattern, '%Any%',
-                limit
-            ))
-        
-        results = cursor.fetchall()
-        print(f"DEBUG: Found {len(results)} matching activities")
-        
-        conn.close()
-        
-        # Convert to dictionaries and parse JSON fields
-        activities = []
-        for row in results:
-            activity = {
-                'name': row[1],
-                'category': row[2],
-                'materials': json.loads(row[5]),
-                'instructions': json.loads(row[6]),
-                'safety_notes': row[7],
-                'estimated_time': row[8]
-            }
-            activities.append(activity)
-            print(f"DEBUG: Returning activity: {activity['name']}")
-        
-        return activities
+            return 'Mental'  # Default fallback
     
     def extract_breed_size(self, breed_str: str) -> str:
         """Extract size from breed string"""
@@ -218,21 +642,15 @@ class EnrichmentDatabase:
     
     def populate_initial_data(self):
         """Populate database with initial set of diverse activities"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.get_connection().cursor()
         
         # Check if data already exists
         cursor.execute("SELECT COUNT(*) FROM activities")
         if cursor.fetchone()[0] > 0:
-            conn.close()
             return
         
-        conn.close()
-        
         # Add initial activities
-        initial_activities = self.get_initial_activities()
-        for activity in initial_activities:
-            self.add_activity(activity)
+        self.add_activities(self.get_initial_activities())
     
     def get_initial_activities(self) -> List[Dict[str, Any]]:
         """Return a comprehensive list of initial activities"""
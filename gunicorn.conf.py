@@ -0,0 +1,24 @@
+"""
+Gunicorn settings: preloaded app, snapshot shared by the workers
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master builds the read-only snapshot (activity index, embeddings, library
+page, templates) before forking, and again on SIGHUP; the hooks live in
+preload.py.
+"""
+
+import os
+
+import preload
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = True
+pidfile = os.environ.get('GUNICORN_PIDFILE') or None
+
+when_ready = preload.when_ready
+on_reload = preload.on_reload
+post_fork = preload.post_fork
+post_worker_init = preload.post_worker_init
+worker_exit = preload.worker_exit
@@ -0,0 +1,103 @@
+"""
+Hedged activity generation for /generate-activities
+
+The Supabase discover-activities call runs in a small thread pool while the
+local library is matched in the request thread. If Supabase answers within
+GENERATION_LATENCY_BUDGET seconds its activities are served; otherwise the
+local matches are served straight away and the Supabase call keeps running in
+the background, storing its answer in the discover cache so the next visitor
+with the same profile gets it instantly.
+
+GENERATION_MODE=sequential restores the old order (wait for Supabase, then
+fall back to the local library).
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Tuple
+
+from supabase_client import supabase_client
+from app_logging import get_logger, log_event
+
+logger = get_logger('generation')
+
+GENERATION_MODE = os.environ.get('GENERATION_MODE', 'race').lower()
+GENERATION_LATENCY_BUDGET = float(os.environ.get('GENERATION_LATENCY_BUDGET', 1.5))
+GENERATION_WORKERS = int(os.environ.get('GENERATION_WORKERS', 4))
+
+_executor = None
+_executor_lock = threading.Lock()
+# Bounds the Supabase calls in flight so a slow upstream can't queue work without limit
+_slots = threading.BoundedSemaphore(GENERATION_WORKERS)
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Created on first use, so each forked worker gets its own threads"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix='supabase')
+    return _executor
+
+def _discover(dog_profile: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return supabase_client.discover_activities_cached(dog_profile, max_activities=4)
+    finally:
+        _slots.release()
+
+def _supabase_activities(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if result['success'] and result['activities']:
+        return supabase_client.convert_activities_to_flask_format(result['activities'])
+    log_event(logger, logging.WARNING, 'supabase_failed', error=result.get('error', 'Unknown error'))
+    return []
+
+def generate_activities(form_data: Dict[str, str], local_match: Callable[[], List[Dict[str, Any]]],
+                        budget: float = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Return (generation method, activities) for a form submission, where
+    local_match() returns the local library's matches for the same profile.
+    """
+    if not supabase_client.enabled:
+        return 'local', local_match()
+    
+    dog_profile = supabase_client.build_dog_profile(form_data)
+    
+    if GENERATION_MODE == 'sequential':
+        result = supabase_client.discover_activities_cached(dog_profile, max_activities=4)
+        activities = _supabase_activities(result)
+        return ('supabase', activities) if activities else ('local', local_match())
+    
+    # A fresh cached answer needs no race
+    cached = supabase_client.discover_cache.get(supabase_client.discover_cache_key(dog_profile, 4))
+    if cached is not None and cached['success'] and cached['activities']:
+        return 'supabase', supabase_client.convert_activities_to_flask_format(cached['activities'])
+    
+    budget = GENERATION_LATENCY_BUDGET if budget is None else budget
+    started = time.monotonic()
+    future = None
+    if supabase_client.is_available() and _slots.acquire(blocking=False):
+        try:
+            future = _get_executor().submit(_discover, dog_profile)
+        except RuntimeError:
+            _slots.release()
+    
+    local_activities = local_match()
+    
+    if future is not None:
+        remaining = budget - (time.monotonic() - started)
+        try:
+            activities = _supabase_activities(future.result(timeout=max(0.0, remaining)))
+            if activities:
+                log_event(logger, logging.DEBUG, 'generation_race', winner='supabase',
+                          elapsed_ms=int((time.monotonic() - started) * 1000))
+                return 'supabase', activities
+        except FutureTimeout:
+            # Left running: a successful answer lands in the discover cache
+            log_event(logger, logging.INFO, 'generation_race', winner='local', budget_s=budget)
+        except Exception as e:
+            log_event(logger, logging.WARNING, 'supabase_failed', error=str(e))
+    
+    return 'local', local_activities
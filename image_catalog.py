@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Dog Image Catalog
+
+The one list of dog images, kept in image_catalog.json: each image with its
+enrichment categories, breed groups, breeds and dog size, plus what pages
+need before the image arrives (dimensions, dominant colour and a tiny blurred
+placeholder). The indexes are built once when the manifest loads and never
+change afterwards, so every lookup is a dict access and needs no lock.
+
+DogImageManager (dog_images.py) and DogOnlyImageManager (verified_dog_images.py)
+are thin wrappers around it.
+
+    python image_catalog.py [--offline]   # fill in dimensions, colours and placeholders
+
+The metadata comes from the originals the image pipeline fetched (each image
+is fetched once); --offline draws stand-ins, for trying it without network.
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+IMAGE_CATALOG_PATH = os.environ.get('IMAGE_CATALOG_PATH', str(Path(__file__).resolve().parent / 'image_catalog.json'))
+
+# Breed-info keywords -> breed group, highest priority first (the first rule
+# with a matching word wins), as get_breed_appropriate_image has always done
+BREED_GROUP_KEYWORDS = [
+    ('small_dogs', ['small', 'chihuahua', 'chihuahuas', 'yorkie', 'yorkshire', 'pug', 'pugs']),
+    ('puppies', ['puppy', 'puppies', 'young', 'months']),
+    ('golden_retrievers', ['golden', 'retriever', 'retrievers', 'lab', 'labs', 'labrador']),
+    ('border_collies', ['border', 'collie', 'collies', 'shepherd', 'shepherds']),
+    ('working_dogs', ['german', 'working', 'large'])
+]
+DEFAULT_BREED_GROUP = 'mixed_breeds'
+
+# Width of the blurred placeholder inlined in pages
+PLACEHOLDER_WIDTH = 16
+
+def stable_hash(text: str) -> int:
+    """Same value in every process, unlike hash() under PYTHONHASHSEED randomization"""
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class ImageRecord(NamedTuple):
+    url: str
+    description: str
+    enrichment: Tuple[str, ...]
+    groups: Tuple[str, ...]
+    breeds: Tuple[str, ...]
+    size: str
+    hero: bool = False
+    width: Optional[int] = None
+    height: Optional[int] = None
+    dominant_color: Optional[str] = None
+    placeholder: Optional[str] = None
+    
+    @classmethod
+    def from_manifest(cls, entry: Dict) -> 'ImageRecord':
+        return cls(**{
+            field: tuple(entry[field]) if field in ('enrichment', 'groups', 'breeds') else entry[field]
+            for field in cls._fields if field in entry
+        })
+    
+    def to_manifest(self) -> Dict:
+        entry = {field: list(value) if isinstance(value, tuple) else value for field, value in self._asdict().items()}
+        if not self.hero:
+            del entry['hero']
+        return entry
+
+def _index(records: Iterable[ImageRecord], keys) -> MappingProxyType:
+    index: Dict[str, List[str]] = {}
+    for record in records:
+        for key in keys(record):
+            index.setdefault(key, []).append(record.url)
+    return MappingProxyType({key: tuple(urls) for key, urls in index.items()})
+
+class ImageCatalog:
+    def __init__(self, records: Sequence[ImageRecord]):
+        self.records = tuple(records)
+        self.by_url = MappingProxyType({record.url: record for record in self.records})
+        heroes = [record.url for record in self.records if record.hero]
+        self.hero = heroes[0] if heroes else self.records[0].url
+        # Every image but the hero, in manifest order
+        self.urls = tuple(record.url for record in self.records if record.url != self.hero)
+        
+        self.by_enrichment = _index(self.records, lambda record: record.enrichment)
+        self.by_group = _index(self.records, lambda record: record.groups)
+        self.by_breed = _index(self.records, lambda record: [breed.lower() for breed in record.breeds])
+        self.by_size = _index(self.records, lambda record: [record.size])
+        # word -> (priority, group), so a breed query is one lookup per word
+        self.breed_keywords = MappingProxyType({
+            word: (priority, group)
+            for priority, (group, words) in enumerate(BREED_GROUP_KEYWORDS)
+            for word in words
+        })
+    
+    @classmethod
+    def load(cls, path: str = IMAGE_CATALOG_PATH) -> 'ImageCatalog':
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        return cls([ImageRecord.from_manifest(entry) for entry in manifest['images']])
+    
+    def save(self, path: str = IMAGE_CATALOG_PATH):
+        manifest = {'images': [record.to_manifest() for record in self.records]}
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        os.replace(temp_path, path)
+    
+    def get(self, url: str) -> Optional[ImageRecord]:
+        return self.by_url.get(url)
+    
+    def pick(self, urls: Sequence[str], key: str, seed: str = '') -> str:
+        """One of urls, always the same one for the same key"""
+        return urls[stable_hash(f"{seed}:{key}") % len(urls)]
+    
+    def breed_group(self, breed_info: str) -> str:
+        """The breed group for free-text breed info ('6 month old Golden Retriever' -> golden_retrievers)"""
+        matches = [self.breed_keywords[word] for word in re.findall(r'[a-z]+', breed_info.lower())
+                   if word in self.breed_keywords]
+        return min(matches)[1] if matches else DEFAULT_BREED_GROUP
+    
+    def breed_image(self, breed_info: str, key: str = '') -> str:
+        """An image suiting the breed info; the same one for the same info and key"""
+        urls = self.by_group.get(self.breed_group(breed_info)) or self.urls
+        return self.pick(urls, f"{breed_info.lower()}:{key}")
+    
+    def with_metadata(self, metadata: Dict[str, Dict]) -> 'ImageCatalog':
+        """A copy with each url's metadata fields (width, height, ...) replaced"""
+        return ImageCatalog([record._replace(**metadata.get(record.url, {})) for record in self.records])
+
+def image_metadata(data: bytes) -> Dict:
+    """Dimensions, dominant colour (#rrggbb) and a blurred data-URI placeholder of an image"""
+    from PIL import Image, ImageFilter
+    
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert('RGB')
+    # The most common of a few representative colours, on a small copy
+    sample = image.copy()
+    sample.thumbnail((64, 64))
+    palette = sample.quantize(colors=4)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    
+    height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.resize((PLACEHOLDER_WIDTH, height), Image.BOX).filter(ImageFilter.GaussianBlur(1))
+    output = io.BytesIO()
+    tiny.save(output, 'JPEG', quality=60)
+    return {
+        'width': image.width,
+        'height': image.height,
+        'dominant_color': f"#{red:02x}{green:02x}{blue:02x}",
+        'placeholder': 'data:image/jpeg;base64,' + base64.b64encode(output.getvalue()).decode('ascii')
+    }
+
+def refresh_metadata(catalog: ImageCatalog, pipeline) -> Tuple[ImageCatalog, List[str]]:
+    """The catalog with metadata from each original; also returns the urls that couldn't be read"""
+    metadata, missing = {}, []
+    for record in catalog.records:
+        data = pipeline.original(record.url)
+        if data is None:
+            missing.append(record.url)
+        else:
+            metadata[record.url] = image_metadata(data)
+    return catalog.with_metadata(metadata), missing
+
+# Loaded on first use rather than at import
+_image_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_image_catalog() -> ImageCatalog:
+    global _image_catalog
+    if _image_catalog is None:
+        with _catalog_lock:
+            if _image_catalog is None:
+                _image_catalog = ImageCatalog.load()
+    return _image_catalog
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in image_catalog.json metadata from the images")
+    parser.add_argument('--offline', action='store_true', help="use stand-in images instead of fetching")
+    parser.add_argument('--manifest', default=IMAGE_CATALOG_PATH)
+    args = parser.parse_args()
+    
+    from image_pipeline import ImagePipeline, StandInSource
+    pipeline = ImagePipeline(source=StandInSource() if args.offline else None)
+    catalog, missing = refresh_metadata(ImageCatalog.load(args.manifest), pipeline)
+    catalog.save(args.manifest)
+    print(f"🖼️ Metadata for {len(catalog.records) - len(missing)}/{len(catalog.records)} images in {args.manifest}")
+    for url in missing:
+        print(f"   ⚠️ unavailable: {url}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Responsive image variants, served locally
+
+Pages used to send every browser to the remote Unsplash URL at w=800&q=80,
+whatever size the image was shown at. Each referenced image is now fetched
+once (or read from static/images), and WebP and JPEG variants are written at
+IMAGE_WIDTHS into a content-addressed cache under IMAGE_CACHE_DIR:
+
+    originals/<sha256>         the fetched bytes
+    sources/<sha256(url)>.json which original a URL resolved to, its size and variants
+    variants/<name>            <digest>-<width>q<quality>.webp / .jpg
+
+A variant's name changes whenever its content could, so /img/<name> is served
+with a year-long immutable Cache-Control, and pages get <picture> markup with
+srcset (see templates/responsive_image.html). Writes go through a temporary
+file and os.replace, so workers sharing the cache never see half a file.
+
+Rendering never waits for an image: variants() only returns what is in
+memory or on disk, and queues anything else for a background builder thread
+(one per process; builds of different URLs don't wait for each other, two
+builds of the same URL share one fetch). Until an image is built, and for
+IMAGE_RETRY_INTERVAL seconds after it couldn't be fetched, pages fall back to
+the original URL. With build_in_background off, misses are only noted as
+pending and left for another process: the gunicorn master renders its
+snapshot that way, so it neither fetches nor forks with a builder thread
+running, and the workers build the images (sharing them through the disk
+cache) once they render the page themselves.
+IMAGE_SOURCE=offline (or StandInSource) draws a placeholder per URL instead of
+fetching, for tests and machines without network access.
+
+    python image_pipeline.py [--offline]   # build every variant ahead of time
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from app_logging import get_logger, log_event
+
+logger = get_logger('images')
+
+IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_WIDTHS = tuple(int(width) for width in os.environ.get('IMAGE_WIDTHS', '320,480,800').split(','))
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 80))
+IMAGE_FETCH_TIMEOUT = float(os.environ.get('IMAGE_FETCH_TIMEOUT', 10.0))
+IMAGE_RETRY_INTERVAL = float(os.environ.get('IMAGE_RETRY_INTERVAL', 300.0))
+IMAGE_SOURCE = os.environ.get('IMAGE_SOURCE', 'remote')
+
+STATIC_FOLDER = Path(__file__).resolve().parent / 'static'
+# Variant file extension -> Pillow format
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+VARIANT_NAME = re.compile(r'^[0-9a-f]{24}-\d+q\d+\.(webp|jpg)$')
+
+class ImageVariants(NamedTuple):
+    url: str
+    width: int
+    height: int
+    # (name, width) pairs, narrowest first
+    webp: Tuple[Tuple[str, int], ...]
+    jpeg: Tuple[Tuple[str, int], ...]
+    
+    def srcset(self, kind: str) -> str:
+        return ', '.join(f"/img/{name} {width}w" for name, width in getattr(self, kind))
+    
+    @property
+    def src(self) -> str:
+        """Widest JPEG, for browsers that ignore srcset"""
+        return f"/img/{self.jpeg[-1][0]}"
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def fetch_source(url: str) -> bytes:
+    """The image bytes: read from static/ for /static/ URLs, fetched otherwise"""
+    if url.startswith('/static/'):
+        path = (STATIC_FOLDER / url[len('/static/'):]).resolve()
+        if STATIC_FOLDER not in path.parents:
+            raise ValueError(f"{url} is outside the static folder")
+        return path.read_bytes()
+    import requests
+    response = requests.get(url, timeout=IMAGE_FETCH_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+class StandInSource:
+    """Offline source: a gradient JPEG per URL, its colours derived from the URL"""
+    
+    def __init__(self, size: Tuple[int, int] = (800, 533)):
+        self.size = size
+        self.fetched: List[str] = []
+    
+    def __call__(self, url: str) -> bytes:
+        from PIL import Image
+        
+        self.fetched.append(url)
+        digest = hashlib.sha256(url.encode('utf-8')).digest()
+        start, end = digest[:3], digest[3:6]
+        # Build a 256-step ramp, then stretch it to the full size
+        ramp = Image.new('RGB', (256, 1))
+        ramp.putdata([tuple(a + (b - a) * step // 255 for a, b in zip(start, end)) for step in range(256)])
+        output = io.BytesIO()
+        ramp.resize(self.size).save(output, 'JPEG', quality=90)
+        return output.getvalue()
+
+class _BuildState:
+    """The build queue and per-URL locks of one process (a forked worker starts its own)"""
+    
+    def __init__(self):
+        self.pid = os.getpid()
+        self.queue = queue.Queue()
+        self.pending: Set[str] = set()
+        # Misses seen while background builds were off, left for another process
+        self.deferred: Set[str] = set()
+        self.locks: Dict[str, threading.Lock] = {}
+        self.guard = threading.Lock()
+        self.thread = None
+
+class ImagePipeline:
+    def __init__(self, cache_dir: str = IMAGE_CACHE_DIR, source: Optional[Callable[[str], bytes]] = None,
+                 widths: Tuple[int, ...] = IMAGE_WIDTHS, quality: int = IMAGE_QUALITY):
+        self.cache_dir = Path(cache_dir)
+        if source is None:
+            source = StandInSource() if IMAGE_SOURCE == 'offline' else fetch_source
+        self.source = source
+        self.widths = tuple(sorted(set(widths)))
+        self.quality = quality
+        self._variants: Dict[str, ImageVariants] = {}
+        self._failed: Dict[str, float] = {}
+        self._build_state = _BuildState()
+        # Off: variants() never starts a build or thread (see preload.build_snapshot)
+        self.build_in_background = True
+    
+    def _state(self) -> _BuildState:
+        state = self._build_state
+        if state.pid != os.getpid():
+            # Forked: the parent's builder thread isn't here, and its locks may be held forever
+            state = self._build_state = _BuildState()
+        return state
+    
+    def _manifest_path(self, url: str) -> Path:
+        return self.cache_dir / 'sources' / f"{_sha256(url.encode('utf-8'))}.json"
+    
+    def variant_path(self, name: str) -> Optional[Path]:
+        """Cached file for a variant name from /img/<name>, or None"""
+        if not VARIANT_NAME.match(name):
+            return None
+        path = self.cache_dir / 'variants' / name
+        return path if path.is_file() else None
+    
+    def _recently_failed(self, url: str) -> bool:
+        failed_at = self._failed.get(url)
+        return failed_at is not None and time.monotonic() - failed_at < IMAGE_RETRY_INTERVAL
+    
+    def variants(self, url: str) -> Optional[ImageVariants]:
+        """
+        The variants of url if they are already built, here or on disk. Never
+        waits: otherwise the build is queued and None returned.
+        """
+        variants = self._variants.get(url)
+        if variants is not None:
+            return variants
+        if self._recently_failed(url):
+            return None
+        variants = self._load(url)
+        if variants is not None:
+            self._variants[url] = variants
+            return variants
+        self._enqueue(url)
+        return None
+    
+    def build(self, url: str) -> Optional[ImageVariants]:
+        """The variants of url, fetched and built now if needed; None while it can't be fetched"""
+        variants = self._variants.get(url)
+        if variants is not None:
+            return variants
+        
+        with self._url_lock(url):
+            variants = self._variants.get(url)
+            if variants is not None or self._recently_failed(url):
+                return variants
+            try:
+                variants = self._load(url) or self._build(url)
+            except Exception as e:
+                self._failed[url] = time.monotonic()
+                log_event(logger, logging.WARNING, 'image_unavailable', url=url, error=str(e))
+                return None
+            self._failed.pop(url, None)
+            self._variants[url] = variants
+            return variants
+    
+    def building(self, url: str) -> bool:
+        """Whether url is queued for (or in the middle of) a background build, or left to another process"""
+        state = self._state()
+        return url in state.pending or url in state.deferred
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the queued builds to finish (for tools and tests); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        state = self._state()
+        while state.pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+    
+    def _url_lock(self, url: str) -> threading.Lock:
+        state = self._state()
+        with state.guard:
+            return state.locks.setdefault(url, threading.Lock())
+    
+    def _enqueue(self, url: str):
+        state = self._state()
+        with state.guard:
+            if not self.build_in_background:
+                state.deferred.add(url)
+                return
+            if url in state.pending:
+                return
+            state.pending.add(url)
+            if state.thread is None:
+                state.thread = threading.Thread(target=self._build_queued, args=(state,),
+                                                name='image-builder', daemon=True)
+                state.thread.start()
+        state.queue.put(url)
+    
+    def _build_queued(self, state: _BuildState):
+        while True:
+            url = state.queue.get()
+            try:
+                self.build(url)
+            finally:
+                with state.guard:
+                    state.pending.discard(url)
+    
+    def original(self, url: str) -> Optional[bytes]:
+        """The fetched bytes of url (fetching it if it never was), or None"""
+        if self.build(url) is None:
+            return None
+        manifest = json.loads(self._manifest_path(url).read_text(encoding='utf-8'))
+        return (self.cache_dir / 'originals' / manifest['digest']).read_bytes()
+    
+    def _load(self, url: str) -> Optional[ImageVariants]:
+        """Variants another process (or an earlier run) already built"""
+        try:
+            manifest = json.loads(self._manifest_path(url).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        variants = ImageVariants(url, manifest['width'], manifest['height'],
+                                 tuple(map(tuple, manifest['webp'])), tuple(map(tuple, manifest['jpeg'])))
+        if manifest['widths'] != list(self.widths) or manifest['quality'] != self.quality:
+            return None
+        if not all(self.variant_path(name) for name, _ in variants.webp + variants.jpeg):
+            return None
+        return variants
+    
+    def _build(self, url: str) -> ImageVariants:
+        from PIL import Image
+        
+        started = time.perf_counter()
+        data = self.source(url)
+        digest = _sha256(data)
+        original_path = self.cache_dir / 'originals' / digest
+        if not original_path.exists():
+            _write_atomic(original_path, data)
+        
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert('RGB')
+        # Never upscale: widths past the original collapse into the original width
+        widths = sorted({min(width, image.width) for width in self.widths})
+        built = {'webp': [], 'jpg': []}
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for extension, image_format in FORMATS.items():
+                name = f"{digest[:24]}-{width}q{self.quality}.{extension}"
+                path = self.cache_dir / 'variants' / name
+                if not path.exists():
+                    output = io.BytesIO()
+                    resized.save(output, image_format, quality=self.quality, optimize=True)
+                    _write_atomic(path, output.getvalue())
+                built[extension].append((name, width))
+        
+        variants = ImageVariants(url, image.width, image.height, tuple(built['webp']), tuple(built['jpg']))
+        manifest = {'url': url, 'digest': digest, 'width': image.width, 'height': image.height,
+                    'widths': list(self.widths), 'quality': self.quality,
+                    'webp': built['webp'], 'jpeg': built['jpg']}
+        _write_atomic(self._manifest_path(url), json.dumps(manifest).encode('utf-8'))
+        log_event(logger, logging.INFO, 'image_variants_built', url=url, variants=len(widths) * len(FORMATS),
+                  original_bytes=len(data), seconds=round(time.perf_counter() - started, 3))
+        return variants
+
+def build_all(pipeline: ImagePipeline, urls: List[str]) -> int:
+    """Build the variants of every URL; returns how many are available"""
+    return sum(pipeline.build(url) is not None for url in urls)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the responsive variants of every dog image")
+    parser.add_argument('--offline', action='store_true', help="draw stand-in images instead of fetching")
+    args = parser.parse_args()
+    
+    from image_catalog import get_image_catalog
+    urls = [record.url for record in get_image_catalog().records]
+    pipeline = ImagePipeline(source=StandInSource() if args.offline else None)
+    available = build_all(pipeline, urls)
+    print(f"🖼️ {available}/{len(urls)} images have variants in {pipeline.cache_dir}/")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Drop-folder import pipeline
+
+Reading and parsing the .txt files is CPU-bound regex work, so with more
+than one worker it runs in a process pool, one file per task. Parsed files
+come back in the order they were submitted (later files keep parsing in the
+meantime) and feed a single writer in this process, which stores them with
+one add_activities transaction per group of files (about IMPORT_BATCH_SIZE
+activities) and only then moves each file to processed_activities/ with
+os.replace. A file that fails to read or parse is reported and left in the
+drop folder; if a group's transaction fails, its files are retried one by one
+so a single bad file cannot hold back the others.
+
+Files are handed over in parts of at most IMPORT_BATCH_SIZE activities. With
+one worker they are parsed as the writer consumes them, so a file of any size
+is held one part at a time; a pool worker sends all of its file's parts back
+together. The parts of a large file are committed as they come and the file
+is moved after its last one, so if it fails halfway the committed parts are
+skipped as duplicates when it is imported again.
+
+Importers provide parse_file(path) -> (category, activities), which must not
+touch the database (workers build their own importer with db left unopened),
+plus the lazily opened db and dedup used by the writer. activities may be a
+generator, which keeps the file open until it is exhausted.
+"""
+
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 1))
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+
+class ParsedFile(NamedTuple):
+    """One part of a parsed file; last is set on its final part (or its error)"""
+    path: Path
+    category: Optional[str]
+    activities: List[Dict[str, Any]]
+    error: Optional[str]
+    size: int
+    parse_seconds: float
+    last: bool = True
+
+def iter_batches(items: Iterable, size: int) -> Iterator[list]:
+    """Lists of up to size consecutive items"""
+    items = iter(items)
+    batch = list(itertools.islice(items, size))
+    while batch:
+        yield batch
+        batch = list(itertools.islice(items, size))
+
+# One parse-only importer per worker process and importer class
+_worker_importers = {}
+
+def parse_one(importer, path: Path, batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[ParsedFile]:
+    """Read and parse a file in parts, turning any failure into a final ParsedFile.error"""
+    started = time.perf_counter()
+    category, part, error = None, None, None
+    try:
+        size = path.stat().st_size
+        category, activities = importer.parse_file(path)
+        # Each part waits until the next one has parsed, to know which is the last
+        for batch in iter_batches(activities, batch_size):
+            seconds = time.perf_counter() - started
+            if part is not None:
+                yield part._replace(last=False)
+            part = ParsedFile(path, category, batch, None, size, seconds)
+            started = time.perf_counter()
+        if part is None:
+            # No activities in it, but it still counts as imported (and is moved)
+            part = ParsedFile(path, category, [], None, size, time.perf_counter() - started)
+    except Exception as e:
+        error = str(e)
+    if error is None:
+        yield part
+        return
+    if part is not None:
+        yield part._replace(last=False)
+    yield ParsedFile(path, category, [], error, 0, time.perf_counter() - started)
+
+def _parse_in_worker(importer_class, drop_folder: str, processed_folder: str, path: Path,
+                     batch_size: int) -> List[ParsedFile]:
+    importer = _worker_importers.get(importer_class)
+    if importer is None:
+        importer = _worker_importers[importer_class] = importer_class(drop_folder, processed_folder)
+    return list(parse_one(importer, path, batch_size))
+
+def iter_parsed(importer, files: Sequence[Path], workers: int,
+                batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[ParsedFile]:
+    """Parts of the parsed files in input order; parsed in a process pool when workers > 1"""
+    if workers <= 1 or len(files) <= 1:
+        for path in files:
+            yield from parse_one(importer, path, batch_size)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_parse_in_worker, type(importer), str(importer.drop_folder),
+                            str(importer.processed_folder), path, batch_size)
+            for path in files
+        ]
+        for path, future in zip(files, futures):
+            try:
+                parts = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed); the file stays for the next run
+                parts = [ParsedFile(path, None, [], f"worker failed: {e}", 0, 0.0)]
+            yield from parts
+
+def run_import(importer, files: Sequence[Path], workers: int = IMPORT_WORKERS,
+               batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, Any]:
+    """Import files in order and return the throughput report (see print_report)"""
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    report = {
+        'files': len(files), 'imported_files': 0, 'failed_files': [], 'bytes': 0,
+        'parsed': 0, 'added': 0, 'skipped': 0, 'invalid': 0,
+        'parse_seconds': 0.0, 'write_seconds': 0.0, 'workers': workers
+    }
+    started = time.perf_counter()
+    
+    group = []
+    current, file_activities = None, 0
+    for parsed in iter_parsed(importer, files, workers, batch_size):
+        report['parse_seconds'] += parsed.parse_seconds
+        if parsed.path != current:
+            current, file_activities = parsed.path, 0
+            print(f"\n📄 Processing {parsed.path.name}...")
+            report['bytes'] += parsed.size
+        if parsed.path.name in report['failed_files']:
+            # An earlier part of it failed to store; the rest waits for the next run
+            continue
+        if parsed.error is not None:
+            print(f"  ❌ Error processing {parsed.path.name}: {parsed.error}")
+            report['failed_files'].append(parsed.path.name)
+            continue
+        report['parsed'] += len(parsed.activities)
+        file_activities += len(parsed.activities)
+        if parsed.last:
+            print(f"  📝 Parsed {file_activities} activities ({parsed.category})")
+        group.append(parsed)
+        if sum(len(item.activities) for item in group) >= batch_size:
+            _write_group(importer, group, report)
+            group = []
+    if group:
+        _write_group(importer, group, report)
+    
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+def _write_group(importer, group: List[ParsedFile], report: Dict[str, Any]):
+    """Store a group of file parts in one transaction, then move the finished files out of the drop folder"""
+    started = time.perf_counter()
+    try:
+        result = importer.dedup.store(importer.db, [activity for parsed in group for activity in parsed.activities])
+    except Exception as e:
+        report['write_seconds'] += time.perf_counter() - started
+        if len(group) > 1:
+            for parsed in group:
+                if parsed.path.name not in report['failed_files']:
+                    _write_group(importer, [parsed], report)
+        else:
+            print(f"  ❌ Error processing {group[0].path.name}: {e}")
+            report['failed_files'].append(group[0].path.name)
+        return
+    report['write_seconds'] += time.perf_counter() - started
+    
+    # Report under the file each activity came from (names are unique once stored)
+    owner = {}
+    for parsed in group:
+        for activity in parsed.activities:
+            owner.setdefault(activity.get('name'), parsed)
+    for name in result['added']:
+        print(f"  ✅ Added: {name} ({owner[name].category}) from {owner[name].path.name}")
+    for name, match in result['duplicates']:
+        print(f"  ⏭️  Skipped: {name} ({match})")
+    for name, error in result['invalid']:
+        print(f"  ❌ Error adding {name}: {error}")
+    report['added'] += len(result['added'])
+    report['skipped'] += len(result['duplicates'])
+    report['invalid'] += len(result['invalid'])
+    
+    for parsed in group:
+        if not parsed.last or parsed.path.name in report['failed_files']:
+            continue
+        try:
+            # Same filesystem, so the move is a single atomic rename
+            os.replace(parsed.path, importer.processed_folder / parsed.path.name)
+            report['imported_files'] += 1
+            print(f"  📦 Moved {parsed.path.name} to {importer.processed_folder.name}/")
+        except OSError as e:
+            print(f"  ❌ Could not move {parsed.path.name}: {e}")
+            report['failed_files'].append(parsed.path.name)
+
+def print_report(report: Dict[str, Any]):
+    seconds = max(report['seconds'], 1e-9)
+    print(f"\n🎉 Processing complete! Added {report['added']} total activities")
+    print(f"\n⏱️  Throughput ({report['workers']} worker{'s' if report['workers'] != 1 else ''}):")
+    print(f"  Files: {report['imported_files']}/{report['files']} imported"
+          + (f", failed: {', '.join(report['failed_files'])}" if report['failed_files'] else ''))
+    print(f"  Activities: {report['parsed']} parsed, {report['added']} added, "
+          f"{report['skipped']} skipped, {report['invalid']} invalid")
+    print(f"  Time: {seconds:.2f}s total, {report['parse_seconds']:.2f}s parsing (summed over workers), "
+          f"{report['write_seconds']:.2f}s writing")
+    print(f"  Rate: {report['files'] / seconds:.1f} files/s, {report['parsed'] / seconds:.0f} activities/s, "
+          f"{report['bytes'] / seconds / 1e6:.2f} MB/s")
@@ -5,25 +5,57 @@ Improved Drop Folder Importer
 Better parsing for activities that may be concatenated or poorly formatted.
 """
 
+import argparse
+import io
 import os
 import re
-import json
 from pathlib import Path
+from typing import Iterator, Optional
 from enrichment_database import EnrichmentDatabase
+from activity_dedup import ActivityDeduplicator
+from activity_stream_parser import find_words, parse_simple_activity, stream_simple_activities
+from import_pipeline import IMPORT_WORKERS, print_report, run_import
 
 class ImprovedDropFolderImporter:
-    def __init__(self):
-        self.db = EnrichmentDatabase()
-        self.drop_folder = Path("new_activities")
-        self.processed_folder = Path("processed_activities")
+    # Content words that decide the category when the filename doesn't, checked in order
+    CONTENT_CATEGORIES = [
+        ('Social', ['training', 'bonding', 'social', 'interaction']),
+        ('Mental', ['puzzle', 'brain', 'cognitive', 'thinking', 'mental']),
+        ('Physical', ['chase', 'running', 'jumping', 'physical', 'walk', 'tug', 'play']),
+        ('Environmental', ['environment', 'outdoor', 'exploration']),
+        ('Instinctual', ['instinct', 'natural', 'digging', 'hunting']),
+        ('Passive', ['calm', 'passive', 'relaxing', 'lick'])
+    ]
+    # Both appear in files of the simple **Activity Name** format
+    SIMPLE_FORMAT_MARKERS = ('**', 'Materials Needed')
+    
+    def __init__(self, drop_folder: str = "new_activities", processed_folder: str = "processed_activities",
+                 db: Optional[EnrichmentDatabase] = None):
+        self._db = db
+        self._dedup = None
+        self.drop_folder = Path(drop_folder)
+        self.processed_folder = Path(processed_folder)
         
         # Create folders if they don't exist
         self.drop_folder.mkdir(exist_ok=True)
         self.processed_folder.mkdir(exist_ok=True)
     
-    def process_all_files(self):
-        """Process all .txt files in the drop folder"""
-        txt_files = list(self.drop_folder.glob("*.txt"))
+    @property
+    def db(self) -> EnrichmentDatabase:
+        """Opened on first use, so parse-only copies in pipeline workers never touch SQLite"""
+        if self._db is None:
+            self._db = EnrichmentDatabase()
+        return self._db
+    
+    @property
+    def dedup(self) -> ActivityDeduplicator:
+        if self._dedup is None:
+            self._dedup = ActivityDeduplicator.from_database(self.db)
+        return self._dedup
+    
+    def process_all_files(self, workers: int = IMPORT_WORKERS):
+        """Process all .txt files in the drop folder, parsing in a process pool when workers > 1"""
+        txt_files = sorted(self.drop_folder.glob("*.txt"))
         
         if not txt_files:
             print("📂 No .txt files found in the new_activities folder")
@@ -34,74 +66,43 @@ class ImprovedDropFolderImporter:
         for file in txt_files:
             print(f"  - {file.name}")
         
-        total_added = 0
-        
-        for file_path in txt_files:
-            print(f"\n📄 Processing {file_path.name}...")
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Check if it's the simple format or the problematic concatenated format
-                if self.is_simple_format(content):
-                    activities = self.parse_simple_format(content)
-                else:
-                    activities = self.parse_concatenated_format(content)
-                
-                print(f"  📝 Found {len(activities)} activities")
-                
-                added_count = 0
-                for activity in activities:
-                    if activity and activity.get('name'):
-                        # Auto-detect category from filename or content
-                        category = self.detect_category(file_path.name, content)
-                        activity['category'] = category
-                        
-                        if not self.activity_exists(activity['name']):
-                            try:
-                                self.db.add_activity(activity)
-                                print(f"  ✅ Added: {activity['name']} ({category})")
-                                added_count += 1
-                            except Exception as e:
-                                print(f"  ❌ Error adding {activity['name']}: {e}")
-                        else:
-                            print(f"  ⏭️  Skipped: {activity['name']} (already exists)")
-                
-                total_added += added_count
-                
-                # Move processed file
-                processed_path = self.processed_folder / file_path.name
-                file_path.rename(processed_path)
-                print(f"  📦 Moved {file_path.name} to processed_activities/")
-                
-            except Exception as e:
-                print(f"  ❌ Error processing {file_path.name}: {e}")
-        
-        print(f"\n🎉 Processing complete! Added {total_added} total activities")
+        # See import_pipeline: files are stored in order and moved once committed
+        print_report(run_import(self, txt_files, workers))
         self.show_summary()
     
+    def parse_file(self, file_path: Path) -> tuple:
+        """
+        (category, activities) of a drop-folder file, activities being parsed
+        as they are consumed; never touches the database
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            markers, content_words = find_words(f, self.SIMPLE_FORMAT_MARKERS, self.category_words())
+        
+        # Auto-detect category from filename or content
+        category = self.detect_category_from_words(file_path.name, content_words)
+        simple = len(markers) == len(self.SIMPLE_FORMAT_MARKERS)
+        return category, self.iter_file_activities(file_path, category, simple)
+    
+    def iter_file_activities(self, file_path: Path, category: str, simple: bool) -> Iterator[dict]:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            # Check if it's the simple format or the problematic concatenated format
+            if simple:
+                # Parsed line by line, so file size doesn't matter
+                activities = stream_simple_activities(f, 'Physical')
+            else:
+                activities = self.parse_concatenated_format(f.read())
+            for activity in activities:
+                if activity and activity.get('name'):
+                    activity['category'] = category
+                    yield activity
+    
     def is_simple_format(self, content: str) -> bool:
         """Check if content is in the simple **Activity Name** format"""
-        return '**' in content and 'Materials Needed' in content
+        return all(marker in content for marker in self.SIMPLE_FORMAT_MARKERS)
     
     def parse_simple_format(self, content: str) -> list:
-        """Parse the simple **Activity Name** format"""
-        activities = []
-        
-        # Split by activity headers (lines starting with **)
-        activity_sections = re.split(r'\n(?=\*\*[^*]+\*\*\s*$)', content)
-        
-        for section in activity_sections:
-            section = section.strip()
-            if len(section) < 50:  # Skip very short sections
-                continue
-            
-            activity = self.parse_single_simple_activity(section)
-            if activity:
-                activities.append(activity)
-        
-        return activities
+        """Parse the simple **Activity Name** format (see activity_stream_parser)"""
+        return list(stream_simple_activities(io.StringIO(content), 'Physical'))
     
     def parse_concatenated_format(self, content: str) -> list:
         """Parse concatenated format where activities are mashed together"""
@@ -224,94 +225,20 @@ class ImprovedDropFolderImporter:
     
     def parse_single_simple_activity(self, text: str) -> dict:
         """Parse a single activity from the simple format"""
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        if not lines:
-            return {}
-        
-        # Extract activity name (first line with **name**)
-        name_match = re.match(r'\*\*(.+?)\*\*', lines[0])
-        if not name_match:
-            return {}
-        
-        name = name_match.group(1).strip()
-        
-        # Initialize activity with defaults
-        activity = {
-            'name': name,
-            'category': 'Physical',  # Will be updated by detect_category
-            'subcategory': '',
-            'description': f"A {name.lower()} enrichment activity",
-            'materials': [],
-            'instructions': [],
-            'safety_notes': '',
-            'estimated_time': '',
-            'difficulty_level': 'Medium',
-            'energy_required': 'Medium',
-            'weather_suitable': 'Any',
-            'breed_sizes': ['All'],
-            'age_groups': ['All'],
-            'tags': []
-        }
-        
-        # Parse sections
-        current_section = None
-        
-        for line in lines[1:]:  # Skip the name line
-            line = line.strip()
-            
-            # Identify sections
-            if line.startswith('**•Materials Needed**'):
-                current_section = 'materials'
-                continue
-            elif line.startswith('**•Step-by-Step Instructions**'):
-                current_section = 'instructions'
-                continue
-            elif line.startswith('**•Safety Notes**'):
-                current_section = 'safety'
-                continue
-            elif line.startswith('**•Estimated Time**'):
-                current_section = 'time'
-                continue
-            elif line.startswith('**•Description**'):
-                current_section = 'description'
-                continue
-            
-            # Process content based on current section
-            if current_section == 'materials':
-                if line.startswith('*'):
-                    material = line.replace('*', '').strip()
-                    if material:
-                        activity['materials'].append(material)
-            
-            elif current_section == 'instructions':
-                # Look for numbered steps
-                step_match = re.match(r'^(\d+)\.\s*(.+)$', line)
-                if step_match:
-                    step_text = step_match.group(2)
-                    activity['instructions'].append(step_text)
-            
-            elif current_section == 'safety':
-                if line and not line.startswith('**'):
-                    if activity['safety_notes']:
-                        activity['safety_notes'] += ' ' + line
-                    else:
-                        activity['safety_notes'] = line
-            
-            elif current_section == 'time':
-                if line and not line.startswith('**'):
-                    activity['estimated_time'] = line
-            
-            elif current_section == 'description':
-                if line and not line.startswith('**'):
-                    activity['description'] = line
-        
-        return activity
+        return parse_simple_activity(io.StringIO(text), 'Physical')
+    
+    def category_words(self) -> list:
+        return [word for _, words in self.CONTENT_CATEGORIES for word in words]
     
     def detect_category(self, filename: str, content: str) -> str:
         """Auto-detect category from filename or content"""
-        filename_lower = filename.lower()
         content_lower = content.lower()
+        content_words = {word for word in self.category_words() if word in content_lower}
+        return self.detect_category_from_words(filename, content_words)
+    
+    def detect_category_from_words(self, filename: str, content_words: set) -> str:
+        """detect_category, given which category_words() the lowercased content contains"""
+        filename_lower = filename.lower()
         
         # Check filename first
         if 'mental' in filename_lower or 'brain' in filename_lower:
@@ -328,37 +255,16 @@ class ImprovedDropFolderImporter:
             return 'Passive'
         
         # Check content
-        if any(word in content_lower for word in ['training', 'bonding', 'social', 'interaction']):
-            return 'Social'
-        elif any(word in content_lower for word in ['puzzle', 'brain', 'cognitive', 'thinking', 'mental']):
-            return 'Mental'
-        elif any(word in content_lower for word in ['chase', 'running', 'jumping', 'physical', 'walk', 'tug', 'play']):
-            return 'Physical'
-        elif any(word in content_lower for word in ['environment', 'outdoor', 'exploration']):
-            return 'Environmental'
-        elif any(word in content_lower for word in ['instinct', 'natural', 'digging', 'hunting']):
-            return 'Instinctual'
-        elif any(word in content_lower for word in ['calm', 'passive', 'relaxing', 'lick']):
-            return 'Passive'
+        for category, words in self.CONTENT_CATEGORIES:
+            if any(word in content_words for word in words):
+                return category
         
         # Default to Physical for movement activities
         return 'Physical'
     
-    def activity_exists(self, name: str) -> bool:
-        """Check if activity already exists"""
-        import sqlite3
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (name,))
-        exists = cursor.fetchone()[0] > 0
-        conn.close()
-        return exists
-    
     def show_summary(self):
         """Show database summary"""
-        import sqlite3
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.get_connection().cursor()
         
         cursor.execute("SELECT COUNT(*) FROM activities")
         total = cursor.fetchone()[0]
@@ -366,15 +272,13 @@ class ImprovedDropFolderImporter:
         cursor.execute("SELECT category, COUNT(*) FROM activities GROUP BY category")
         by_category = cursor.fetchall()
         
-        conn.close()
-        
         print(f"\n📊 Database Summary:")
         print(f"Total activities: {total}")
         print("By category:")
         for category, count in by_category:
             print(f"  {category}: {count}")
 
-def main():
+def main(workers: int = IMPORT_WORKERS):
     print("🐕 Improved Drop Folder Activity Importer")
     print("=" * 45)
     print("Place .txt files with activities in the 'new_activities' folder")
@@ -382,7 +286,10 @@ def main():
     print()
     
     importer = ImprovedDropFolderImporter()
-    importer.process_all_files()
+    importer.process_all_files(workers)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=IMPORT_WORKERS,
+                        help="parser processes (0 = one per CPU; default IMPORT_WORKERS)")
+    main(parser.parse_args().workers)
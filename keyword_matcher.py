@@ -0,0 +1,70 @@
+"""
+Table-driven keyword extraction for chat queries
+
+Every rule is (intent, keyword, trigger phrases): when any trigger occurs in
+the lowercased query (plain substring, as before), the keyword is emitted for
+the search and the intent is recorded. Adding a phrase or a rule means adding
+a row to KEYWORD_RULES, not another if-block.
+
+The table is frozen into tuples once at import and scanned with plain loops
+that stop at a rule's first hit. A single compiled regex alternation was
+measured too (benchmark_keyword_matcher.py): on chat-length text CPython's
+substring search beats the regex engine, and the loop avoids the generator
+that each any() call used to build.
+"""
+
+from typing import Iterable, List, Sequence, Tuple
+
+# (intent, keyword, triggers), in the order keywords are reported. The same
+# keyword may come from several rules and is then reported once per rule.
+KEYWORD_RULES = [
+    ('age', 'puppy', ['puppy', 'young', '4 month', 'months old']),
+    ('age', 'senior', ['senior', 'old', 'elderly']),
+    ('behavior', 'safe', ['swallow', 'eats everything', 'gulps']),
+    ('behavior', 'chew', ['destructive', 'chews everything']),
+    ('behavior', 'calming', ['anxious', 'stressed', 'calm']),
+    ('activity', 'mental', ['mental', 'brain', 'puzzle']),
+    ('activity', 'physical', ['physical', 'exercise', 'active']),
+    ('activity', 'social', ['social', 'bonding']),
+    ('activity', 'passive', ['passive', 'quiet', 'calm']),
+    ('safety', 'safe', ['safe', 'no bones', 'cant have']),
+]
+
+class KeywordMatcher:
+    def __init__(self, rules: Sequence[Tuple[str, str, Iterable[str]]] = KEYWORD_RULES):
+        self.rules = tuple(
+            (intent, keyword, tuple(trigger.lower() for trigger in triggers))
+            for intent, keyword, triggers in rules
+        )
+    
+    def match(self, query: str) -> List[Tuple[str, str]]:
+        """(intent, keyword) for every rule triggered in the query, in rule order"""
+        query_lower = query.lower()
+        matches = []
+        for intent, keyword, triggers in self.rules:
+            for trigger in triggers:
+                if trigger in query_lower:
+                    matches.append((intent, keyword))
+                    break
+        return matches
+    
+    def keywords(self, query: str) -> List[str]:
+        query_lower = query.lower()
+        keywords = []
+        for _, keyword, triggers in self.rules:
+            for trigger in triggers:
+                if trigger in query_lower:
+                    keywords.append(keyword)
+                    break
+        return keywords
+    
+    def intents(self, query: str) -> List[str]:
+        """Distinct intents in the query, in rule order"""
+        intents = []
+        for intent, _ in self.match(query):
+            if intent not in intents:
+                intents.append(intent)
+        return intents
+
+# Built once at import and shared; the rule table is read-only
+keyword_matcher = KeywordMatcher()
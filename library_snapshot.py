@@ -0,0 +1,124 @@
+"""
+Versioned snapshot of the activity library page
+
+The /library page only changes when activities are imported, so it is built
+once per library data version: activities are grouped from the in-memory index
+(already JSON-decoded), the page is rendered, and the HTML is kept together
+with an ETag and Last-Modified for conditional requests. Any write to the
+activities table bumps the data version (see EnrichmentDatabase), and the next
+request renders a fresh page.
+
+A page rendered while some of its images were still being built (so it points
+at their original URLs) is only kept for LIBRARY_PROVISIONAL_TTL seconds,
+then rendered again.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+from app_logging import get_logger, log_event
+import logging
+
+logger = get_logger('library')
+
+LIBRARY_CATEGORIES = ['Mental', 'Physical', 'Social', 'Environmental', 'Instinctual', 'Passive']
+LIBRARY_PROVISIONAL_TTL = float(os.environ.get('LIBRARY_PROVISIONAL_TTL', 10))
+
+class LibrarySnapshot:
+    def __init__(self, version: int, updated_at: Optional[datetime],
+                 activities_by_category: Dict[str, List[Dict[str, Any]]], featured: List[Dict[str, Any]]):
+        self.version = version
+        self.updated_at = updated_at
+        self.activities_by_category = activities_by_category
+        self.featured = featured
+
+class RenderedPage:
+    def __init__(self, version: int, html: str, last_modified: Optional[datetime],
+                 expires_at: Optional[float] = None):
+        self.version = version
+        self.html = html
+        self.etag = f"library-{version}-{hashlib.sha1(html.encode('utf-8')).hexdigest()[:16]}"
+        self.last_modified = last_modified
+        # time.monotonic() after which a provisional page is rendered again
+        self.expires_at = expires_at
+    
+    def is_current(self, version: int) -> bool:
+        return self.version == version and (self.expires_at is None or time.monotonic() < self.expires_at)
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """SQLite CURRENT_TIMESTAMP text (UTC) to an aware datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def build_library_snapshot(db) -> LibrarySnapshot:
+    """Group every activity by category, sorted by name, for the library page"""
+    version, updated_at = db.get_library_version()
+    index = db.get_activity_index()
+    
+    activities_by_category = {category: [] for category in LIBRARY_CATEGORIES}
+    for record in sorted(index.activities, key=lambda record: (record['category'], record['name'], record['id'])):
+        if record['category'] not in activities_by_category:
+            continue
+        activities_by_category[record['category']].append({
+            'name': record['name'],
+            'category': record['category'],
+            'description': record['description'] or f"A {record['category'].lower()} enrichment activity for your dog",
+            'materials': record['materials'],
+            'instructions': record['instructions'],
+            'safety_notes': record['safety_notes'],
+            'estimated_time': record['estimated_time'],
+            'difficulty_level': record['difficulty_level'] or 'Medium',
+            'energy_required': record['energy_required'] or 'Medium'
+        })
+    
+    # Featured activities: the first one from each of the first four non-empty categories
+    featured = []
+    for category in activities_by_category:
+        if activities_by_category[category] and len(featured) < 4:
+            featured.append(activities_by_category[category][0])
+    
+    return LibrarySnapshot(version, _parse_timestamp(updated_at), activities_by_category, featured)
+
+class LibraryPageCache:
+    def __init__(self, db, render: Callable[[LibrarySnapshot], Tuple[str, bool]],
+                 provisional_ttl: float = LIBRARY_PROVISIONAL_TTL):
+        """
+        render turns a snapshot into (page HTML, complete), called inside a
+        request; complete is False while some of the page's images are pending
+        """
+        self.db = db
+        self.render = render
+        self.provisional_ttl = provisional_ttl
+        self._page = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> RenderedPage:
+        """The rendered page for the current data version, rendering it if needed"""
+        version = self.db.get_data_version()
+        page = self._page
+        if page is not None and page.is_current(version):
+            return page
+        
+        with self._lock:
+            page = self._page
+            if page is None or not page.is_current(version):
+                snapshot = build_library_snapshot(self.db)
+                html, complete = self.render(snapshot)
+                expires_at = None if complete else time.monotonic() + self.provisional_ttl
+                page = RenderedPage(version, html, snapshot.updated_at, expires_at)
+                self._page = page
+                log_event(logger, logging.INFO, 'library_rendered',
+                          version=page.version, bytes=len(page.html), complete=complete)
+        return page
+    
+    def invalidate(self):
+        """Forget the rendered page so the next request renders it again"""
+        self._page = None
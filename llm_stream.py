@@ -0,0 +1,66 @@
+"""
+Streaming chat completions and Server-Sent Events
+
+stream_chat_tokens() wraps ChatCompletion.create(stream=True) and yields the
+text deltas as they arrive. FakeLLMClient has the same ChatCompletion.create
+interface and chunk format as the openai module, but composes its reply
+locally, so the streaming chat can be run and tested without an API key
+(set CHAT_FAKE_LLM=1, or pass it to EnrichmentChatAssistant).
+"""
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, Iterator, List
+
+CHAT_FAKE_LLM = os.environ.get('CHAT_FAKE_LLM', '').lower() in ('1', 'true', 'yes')
+CHAT_FAKE_LLM_DELAY = float(os.environ.get('CHAT_FAKE_LLM_DELAY', 0.02))
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat_tokens(client, **kwargs) -> Iterator[str]:
+    """Yield the reply's text deltas from a streaming ChatCompletion"""
+    for chunk in client.ChatCompletion.create(stream=True, **kwargs):
+        delta = chunk['choices'][0].get('delta', {})
+        text = delta.get('content')
+        if text:
+            yield text
+
+class FakeChatCompletion:
+    def __init__(self, reply: str = None, token_delay: float = CHAT_FAKE_LLM_DELAY):
+        """reply fixes the answer; by default one is composed from the prompt"""
+        self.reply = reply
+        self.token_delay = token_delay
+    
+    def compose(self, messages: List[Dict[str, str]]) -> str:
+        question = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), '')
+        system = next((m['content'] for m in messages if m['role'] == 'system'), '')
+        ideas = re.findall(r"^\s*- (.+?) \(", system, re.MULTILINE)
+        reply = f"Great question! You asked: \"{question}\". "
+        if ideas:
+            reply += "From our library, try " + ", ".join(ideas) + ". "
+        reply += "Start with short, easy sessions, always supervise, and build up once your dog is succeeding."
+        return reply
+    
+    def create(self, model: str = None, messages: List[Dict[str, str]] = None, stream: bool = False, **kwargs):
+        text = self.reply if self.reply is not None else self.compose(messages or [])
+        if not stream:
+            return {'choices': [{'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}]}
+        return self._chunks(text)
+    
+    def _chunks(self, text: str) -> Iterator[Dict[str, Any]]:
+        yield {'choices': [{'delta': {'role': 'assistant'}, 'finish_reason': None}]}
+        for token in re.findall(r"\S+\s*", text):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield {'choices': [{'delta': {'content': token}, 'finish_reason': None}]}
+        yield {'choices': [{'delta': {}, 'finish_reason': 'stop'}]}
+
+class FakeLLMClient:
+    """Drop-in for the openai module in EnrichmentChatAssistant (client.ChatCompletion.create)"""
+    
+    def __init__(self, reply: str = None, token_delay: float = CHAT_FAKE_LLM_DELAY):
+        self.ChatCompletion = FakeChatCompletion(reply, token_delay)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+One-shot schema migration for existing enrichment_activities.db files
+
+Opening the database through EnrichmentDatabase applies any pending
+migrations (tracked in PRAGMA user_version). Run this once after deploying
+to migrate ahead of the first request and see what changed.
+
+Schema v2 makes activity names unique and refuses to run while names are
+repeated. --merge-duplicates keeps the oldest row of each name and deletes the
+others, after writing them to <database>.duplicates-<timestamp>.json.
+
+Usage: python migrate_database.py [path/to/enrichment_activities.db] [--merge-duplicates]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+from database_config import ensure_database_directory
+from enrichment_database import EnrichmentDatabase, DuplicateNamesError, ATTRIBUTE_TABLES, SCHEMA_MIGRATIONS
+
+def merge_duplicates(db_path, export_path=None):
+    """Delete every repeated-name row but the oldest, exporting them first; returns the export path or None"""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        rows = conn.execute(
+            "SELECT * FROM activities WHERE id NOT IN (SELECT MIN(id) FROM activities GROUP BY name) ORDER BY name, id"
+        ).fetchall()
+        if not rows:
+            return None
+        export_path = export_path or f"{db_path}.duplicates-{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(export_path, 'w', encoding='utf-8') as f:
+            json.dump([dict(row) for row in rows], f, indent=2, ensure_ascii=False)
+        with conn:
+            conn.executemany("DELETE FROM activities WHERE id = ?", [(row['id'],) for row in rows])
+        print(f"🧹 Removed {len(rows)} repeated activities; they are saved in {export_path}")
+        return export_path
+    finally:
+        conn.close()
+
+def migrate(db_path=None, merge=False):
+    if db_path and not os.path.exists(db_path):
+        print(f"❌ Database {db_path} does not exist!")
+        return False
+    
+    if merge:
+        merge_duplicates(db_path or ensure_database_directory())
+    
+    if db_path:
+        conn = sqlite3.connect(db_path)
+        before = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.close()
+    else:
+        before = None
+    
+    try:
+        db = EnrichmentDatabase(db_path)
+    except DuplicateNamesError as e:
+        print(f"❌ {e}")
+        return False
+    cursor = db.get_connection().cursor()
+    
+    cursor.execute("PRAGMA user_version")
+    after = cursor.fetchone()[0]
+    
+    print(f"🗄️  Database: {db.db_path}")
+    if before is not None:
+        print(f"📐 Schema version: {before} -> {after} (latest {SCHEMA_MIGRATIONS[-1][0]})")
+    else:
+        print(f"📐 Schema version: {after} (latest {SCHEMA_MIGRATIONS[-1][0]})")
+    
+    cursor.execute("SELECT COUNT(*) FROM activities")
+    print(f"📊 Activities: {cursor.fetchone()[0]}")
+    for table in ATTRIBUTE_TABLES:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        print(f"  {table}: {cursor.fetchone()[0]} rows")
+    if db.search_enabled:
+        cursor.execute("SELECT COUNT(*) FROM activities_fts")
+        print(f"🔎 Full-text index: {cursor.fetchone()[0]} rows")
+    else:
+        print("⚠️  Full-text search unavailable (SQLite built without FTS5); chat search uses LIKE")
+    
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bring an enrichment database up to the latest schema")
+    parser.add_argument('db_path', nargs='?', help="database file (default: the app's database)")
+    parser.add_argument('--merge-duplicates', action='store_true',
+                        help="delete repeated-name rows (keeping the oldest), exporting them to JSON first")
+    args = parser.parse_args()
+    migrate(args.db_path, args.merge_duplicates)
@@ -0,0 +1,134 @@
+"""
+Gunicorn preload: build the read-only snapshot once, share it with every worker
+
+With preload_app (see gunicorn.conf.py) the master imports app.py and, before
+forking any worker, builds everything requests read: the decoded activity
+index and its embeddings, the library page with its category groupings and
+image picks, and the compiled templates. gc.freeze() then puts all of it out
+of the collector's reach, so workers share those memory pages copy-on-write
+instead of each building, and then dirtying, its own copy. The master does no
+network I/O and runs no threads: image variants the library page needs but
+the cache doesn't have yet are only noted (see image_pipeline.py), the page
+is provisional, and each worker renders it again shortly and builds them.
+
+Each freeze is preceded by a full collection, and a reload unfreezes first,
+so garbage left by an earlier snapshot is collected instead of being frozen
+again with every SIGHUP.
+
+After an import, `kill -HUP <master pid>` (or drop_folder_watcher.py
+--reload-pidfile) makes the master rebuild the snapshot and gracefully replace
+the workers with ones forked from it. Workers keep refreshing themselves from
+the library data version in between, as before; the signal only saves each of
+them from rebuilding separately.
+
+Every worker logs its time-to-ready and memory when it starts and exits:
+RSS, and how much of it is still shared with the master.
+"""
+
+import gc
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict
+
+from app_logging import get_logger, log_event
+
+logger = get_logger('server')
+
+# Pages rendered in the master, so their templates and data are in the snapshot
+SNAPSHOT_PAGES = ('/', '/library')
+
+def memory_usage() -> Dict[str, int]:
+    """This process's memory in kB: rss, plus pss/shared/private where /proc has them"""
+    usage = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty'):
+                    usage[key.lower()] = int(value.split()[0])
+    except OSError:
+        import resource
+        # Peak rather than current RSS, in kB on Linux and bytes on macOS
+        return {'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        'rss': usage.get('rss', 0),
+        'pss': usage.get('pss', 0),
+        'shared': usage.get('shared_clean', 0) + usage.get('shared_dirty', 0),
+        'private': usage.get('private_clean', 0) + usage.get('private_dirty', 0)
+    }
+
+def build_snapshot(flask_app) -> Dict[str, Any]:
+    """Build (or refresh) what requests read, then close the database connections before forking"""
+    from app_services import get_db, get_image_pipeline, warm_up
+    
+    started = time.perf_counter()
+    db = get_db()
+    # Re-read the data version now rather than after the check interval
+    db.invalidate_activity_index()
+    warm_up()
+    # Missing images are left for the workers: no fetches or builder thread in the master
+    pipeline = get_image_pipeline()
+    pipeline.build_in_background = False
+    try:
+        client = flask_app.test_client()
+        for path in SNAPSHOT_PAGES:
+            client.get(path)
+    finally:
+        pipeline.build_in_background = True
+    snapshot = {
+        'activities': len(db.get_activity_index()),
+        'data_version': db.get_data_version(),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    # Workers open their own connections; none should inherit the master's
+    db.connections.close_all()
+    return snapshot
+
+def request_reload(pidfile: str) -> bool:
+    """Ask the gunicorn master in pidfile to rebuild the snapshot and replace its workers"""
+    try:
+        with open(pidfile) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, signal.SIGHUP)
+    except (OSError, ValueError) as e:
+        log_event(logger, logging.WARNING, 'reload_not_sent', pidfile=pidfile, error=str(e))
+        return False
+    return True
+
+# Gunicorn server hooks (wired up in gunicorn.conf.py)
+
+def when_ready(server):
+    """Master, before the first fork"""
+    _prepare_fork(server, 'snapshot_ready')
+
+def on_reload(server):
+    """Master, on SIGHUP, before the replacement workers are forked"""
+    # Let the previous snapshot be collected once the new one replaces it
+    gc.unfreeze()
+    _prepare_fork(server, 'snapshot_reloaded')
+
+def _prepare_fork(server, event: str):
+    snapshot = build_snapshot(server.app.wsgi())
+    # Collect what the build (and any earlier snapshot) left behind first, so
+    # only live objects are frozen
+    gc.collect()
+    # Objects alive now are never collected, so the GC won't write to their pages
+    gc.freeze()
+    log_event(logger, logging.INFO, event, pid=os.getpid(), frozen_objects=gc.get_freeze_count(),
+              builder_threads=sum(thread.name == 'image-builder' for thread in threading.enumerate()),
+              **snapshot, **{f'{key}_kb': value for key, value in memory_usage().items()})
+
+def post_fork(server, worker):
+    worker.forked_at = time.monotonic()
+
+def post_worker_init(worker):
+    log_event(logger, logging.INFO, 'worker_ready', pid=os.getpid(),
+              seconds=round(time.monotonic() - worker.forked_at, 4),
+              **{f'{key}_kb': value for key, value in memory_usage().items()})
+
+def worker_exit(server, worker):
+    log_event(logger, logging.INFO, 'worker_exit', pid=os.getpid(),
+              **{f'{key}_kb': value for key, value in memory_usage().items()})
@@ -0,0 +1,288 @@
+"""
+TTL + LRU cache for slow upstream responses, with stale-while-revalidate
+
+An entry is fresh for `ttl` seconds. After that, for another `stale_ttl`
+seconds, it is still served immediately while one background thread fetches a
+replacement; only a missing or fully expired entry makes the caller wait.
+Concurrent misses for the same key in one process share a single fetch.
+
+Backends:
+    memory  - an in-process LRU dict (one gunicorn worker, or tests)
+    sqlite  - a shared SQLite file, so every worker on the host sees the
+              entries any of them stored
+
+RESPONSE_CACHE_BACKEND picks the default backend for caches built with
+create_response_cache(); RESPONSE_CACHE_PATH sets the SQLite file. Values must
+be JSON-serializable. Counters are per process and exposed by cache_stats().
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from database_config import ConnectionManager, ensure_database_directory
+from app_logging import get_logger, log_event
+
+logger = get_logger('cache')
+
+RESPONSE_CACHE_BACKEND = os.environ.get('RESPONSE_CACHE_BACKEND', 'memory').lower()
+RESPONSE_CACHE_PATH = os.environ.get('RESPONSE_CACHE_PATH')
+
+def cache_key(data: Any) -> str:
+    """Stable key for any JSON-serializable value (dict key order ignored)"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+class MemoryBackend:
+    """Process-local LRU of key -> (stored_at, value)"""
+    
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def set(self, key: str, value: Any, stored_at: float):
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def size(self) -> int:
+        return len(self._entries)
+
+_connection_managers = {}
+_managers_lock = threading.Lock()
+
+class SQLiteBackend:
+    """LRU table in a SQLite file shared by every worker process"""
+    
+    def __init__(self, db_path: str, namespace: str, max_entries: int = 512):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        # Caches on the same file share one connection per thread
+        with _managers_lock:
+            self.connections = _connection_managers.setdefault(db_path, ConnectionManager(db_path))
+        with self.connections.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL, -- JSON
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_lru ON response_cache (namespace, accessed_at)")
+    
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        conn = self.connections.get_connection()
+        row = conn.execute(
+            "SELECT stored_at, value FROM response_cache WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE response_cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (time.time(), self.namespace, key)
+            )
+        return row[0], json.loads(row[1])
+    
+    def set(self, key: str, value: Any, stored_at: float):
+        with self.connections.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO response_cache (namespace, key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), stored_at, time.time())
+            )
+            # Evict the least recently used entries beyond the limit
+            conn.execute('''
+                DELETE FROM response_cache WHERE namespace = ? AND key IN (
+                    SELECT key FROM response_cache WHERE namespace = ?
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            ''', (self.namespace, self.namespace, self.max_entries))
+    
+    def delete(self, key: str):
+        with self.connections.transaction() as conn:
+            conn.execute("DELETE FROM response_cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+    
+    def clear(self):
+        with self.connections.transaction() as conn:
+            conn.execute("DELETE FROM response_cache WHERE namespace = ?", (self.namespace,))
+    
+    def size(self) -> int:
+        row = self.connections.get_connection().execute(
+            "SELECT COUNT(*) FROM response_cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return row[0]
+
+class ResponseCache:
+    def __init__(self, name: str, backend, ttl: float, stale_ttl: float = 0):
+        """Entries are fresh for ttl seconds and served stale for stale_ttl more"""
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'stores': 0,
+                      'refreshes': 0, 'refresh_failures': 0, 'backend_errors': 0}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._refreshing = set()
+    
+    def _count(self, counter: str):
+        with self._lock:
+            self.stats[counter] += 1
+    
+    def _read(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never break the request it is meant to speed up
+            self._count('backend_errors')
+            log_event(logger, logging.WARNING, 'cache_read_failed', cache=self.name, error=str(e))
+            return None
+    
+    def _store(self, key: str, value: Any):
+        try:
+            self.backend.set(key, value, time.time())
+            self._count('stores')
+        except Exception as e:
+            self._count('backend_errors')
+            log_event(logger, logging.WARNING, 'cache_write_failed', cache=self.name, error=str(e))
+    
+    def get(self, key: str) -> Optional[Any]:
+        """The cached value if it is still fresh (counted as a hit), else None without fetching"""
+        entry = self._read(key)
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            self._count('hits')
+            return entry[1]
+        return None
+    
+    def set(self, key: str, value: Any):
+        self._store(key, value)
+    
+    def get_or_compute(self, key: str, compute: Callable[[], Any],
+                       should_cache: Callable[[Any], bool] = lambda value: True) -> Any:
+        """
+        Return the cached value for key, calling compute() on a miss.
+        Results for which should_cache() is false (e.g. upstream errors) are
+        returned but not stored.
+        """
+        entry = self._read(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                self._count('hits')
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                self._count('stale_hits')
+                self._refresh_in_background(key, compute, should_cache)
+                return entry[1]
+        
+        # Single flight: concurrent misses for one key wait for the first fetch
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._read(key)
+            if entry is not None and time.time() - entry[0] < self.ttl:
+                self._count('hits')
+                return entry[1]
+            
+            self._count('misses')
+            try:
+                value = compute()
+                if should_cache(value):
+                    self._store(key, value)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+    
+    def _refresh_in_background(self, key: str, compute: Callable[[], Any], should_cache: Callable[[Any], bool]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        
+        def refresh():
+            try:
+                value = compute()
+                if should_cache(value):
+                    self._store(key, value)
+                    self._count('refreshes')
+                else:
+                    self._count('refresh_failures')
+            except Exception as e:
+                self._count('refresh_failures')
+                log_event(logger, logging.WARNING, 'cache_refresh_failed', cache=self.name, error=str(e))
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        
+        threading.Thread(target=refresh, name=f"cache-refresh-{self.name}", daemon=True).start()
+    
+    def invalidate(self, key: str):
+        self.backend.delete(key)
+    
+    def clear(self):
+        self.backend.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Counters for this process plus the current entry count"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else None
+        try:
+            stats['entries'] = self.backend.size()
+        except Exception:
+            stats['entries'] = None
+        stats['backend'] = type(self.backend).__name__
+        stats['ttl'] = self.ttl
+        stats['stale_ttl'] = self.stale_ttl
+        return stats
+
+_caches = {}
+
+def create_response_cache(name: str, ttl: float, stale_ttl: float = 0, max_entries: int = 512,
+                          backend: Optional[str] = None) -> ResponseCache:
+    """Create (or return the existing) named cache; backend defaults to RESPONSE_CACHE_BACKEND"""
+    cache = _caches.get(name)
+    if cache is None:
+        if (backend or RESPONSE_CACHE_BACKEND) == 'sqlite':
+            path = RESPONSE_CACHE_PATH or os.path.join(os.path.dirname(ensure_database_directory()), 'response_cache.db')
+            store = SQLiteBackend(path, name, max_entries=max_entries)
+        else:
+            store = MemoryBackend(max_entries=max_entries)
+        cache = _caches.setdefault(name, ResponseCache(name, store, ttl, stale_ttl))
+    return cache
+
+def cache_stats() -> Dict[str, Any]:
+    """Counters for every cache created in this process"""
+    return {
+        'pid': os.getpid(),
+        'caches': {name: cache.get_stats() for name, cache in _caches.items()}
+    }
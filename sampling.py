@@ -0,0 +1,69 @@
+"""
+Random sampling of activities without sorting the candidates
+
+`ORDER BY RANDOM() LIMIT k` draws a random key for every matching row and
+sorts them all. Here the candidate ids are already in memory (the activity
+index caches them per profile), so picking k of n is k random offsets into
+that list: random.sample over a range never materializes the range and, for
+small k, does O(k) work. For streams of unknown length there is reservoir
+sampling.
+
+Set SAMPLING_SEED (or pass a seed) for reproducible picks in tests and
+benchmarks; unseeded samplers draw from fresh OS entropy.
+"""
+
+import itertools
+import math
+import os
+import random
+from typing import Iterable, List, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+
+def _env_seed() -> Optional[int]:
+    value = os.environ.get('SAMPLING_SEED')
+    return int(value) if value not in (None, '') else None
+
+class Sampler:
+    def __init__(self, seed: Optional[int] = None):
+        """seed None falls back to SAMPLING_SEED, then to an unseeded generator"""
+        self.rng = random.Random()
+        self.seed(seed)
+    
+    def seed(self, seed: Optional[int] = None):
+        """Reseed; the same seed replays the same sequence of picks"""
+        self.rng.seed(seed if seed is not None else _env_seed())
+    
+    def sample_indices(self, population_size: int, k: int) -> List[int]:
+        """k distinct offsets into a population, in random order"""
+        return self.rng.sample(range(population_size), min(k, population_size))
+    
+    def sample(self, items: Sequence[T], k: int) -> List[T]:
+        """k distinct items picked by random offset"""
+        return [items[offset] for offset in self.sample_indices(len(items), k)]
+    
+    def reservoir(self, items: Iterable[T], k: int) -> List[T]:
+        """k items from a stream of unknown length in one pass (Algorithm L)"""
+        iterator = iter(items)
+        reservoir = list(itertools.islice(iterator, k))
+        if len(reservoir) == k and k > 0:
+            # Skip ahead geometrically instead of drawing a number per item
+            weight = math.exp(math.log(self._open_unit()) / k)
+            while True:
+                skip = math.floor(math.log(self._open_unit()) / math.log(1 - weight))
+                item = next(itertools.islice(iterator, skip, None), _END)
+                if item is _END:
+                    break
+                reservoir[self.rng.randrange(k)] = item
+                weight *= math.exp(math.log(self._open_unit()) / k)
+        self.rng.shuffle(reservoir)
+        return reservoir
+    
+    def _open_unit(self) -> float:
+        """Uniform float in (0, 1), safe to take the log of"""
+        value = 0.0
+        while value == 0.0:
+            value = self.rng.random()
+        return value
+
+_END = object()
@@ -8,10 +8,12 @@ A more robust parser for your specific activity format.
 import re
 import json
 from enrichment_database import EnrichmentDatabase
+from activity_dedup import ActivityDeduplicator
 
 class SimpleTextImporter:
     def __init__(self):
         self.db = EnrichmentDatabase()
+        self.dedup = ActivityDeduplicator.from_database(self.db)
     
     def import_activities_from_file(self, filename: str):
         """Import activities from text file"""
@@ -25,21 +27,19 @@ class SimpleTextImporter:
             
             print(f"📝 Found {len(activities)} activities to import")
             
-            added_count = 0
-            for activity_text in activities:
-                activity = self.parse_single_activity(activity_text)
-                if activity and activity.get('name'):
-                    if not self.activity_exists(activity['name']):
-                        try:
-                            self.db.add_activity(activity)
-                            print(f"  ✅ Added: {activity['name']}")
-                            added_count += 1
-                        except Exception as e:
-                            print(f"  ❌ Error adding {activity['name']}: {e}")
-                    else:
-                        print(f"  ⏭️  Skipped: {activity['name']} (already exists)")
+            parsed = (self.parse_single_activity(activity_text) for activity_text in activities)
+            batch = [activity for activity in parsed if activity and activity.get('name')]
             
-            print(f"\n🎉 Import complete! Added {added_count} activities")
+            # One transaction for the whole file; duplicates of known activities are skipped
+            result = self.dedup.store(self.db, batch)
+            for name in result['added']:
+                print(f"  ✅ Added: {name}")
+            for name, match in result['duplicates']:
+                print(f"  ⏭️  Skipped: {name} ({match})")
+            for name, error in result['invalid']:
+                print(f"  ❌ Error adding {name}: {error}")
+            
+            print(f"\n🎉 Import complete! Added {len(result['added'])} activities")
             self.show_summary()
             
         except FileNotFoundError:
@@ -186,16 +186,6 @@ class SimpleTextImporter:
         elif 'Moderate' in info_line:
             activity['energy_required'] = 'Medium'
     
-    def activity_exists(self, name: str) -> bool:
-        """Check if activity exists"""
-        import sqlite3
-        conn = sqlite3.connect(self.db.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (name,))
-        exists = cursor.fetchone()[0] > 0
-        conn.close()
-        return exists
-    
     def show_summary(self):
         """Show database summary"""
         import sqlite3
@@ -3,10 +3,60 @@ Supabase integration for the Flask dog enrichment app
 """
 
 import os
-import requests
+import random
+import time
 import json
+import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from app_logging import get_logger, log_event
+from app_services import LazyService
+from response_cache import create_response_cache, cache_key
+from circuit_breaker import CircuitBreaker
+
+logger = get_logger('supabase')
+
+# discover-activities answers depend only on the profile, and the form has a
+# handful of options, so identical profiles are served from the cache
+DISCOVER_CACHE_TTL = float(os.environ.get('DISCOVER_CACHE_TTL', 3600))
+DISCOVER_CACHE_STALE_TTL = float(os.environ.get('DISCOVER_CACHE_STALE_TTL', 86400))
+DISCOVER_CACHE_MAX_ENTRIES = int(os.environ.get('DISCOVER_CACHE_MAX_ENTRIES', 512))
+
+# Cached discover answers are shared between users, so the request behind them
+# carries this placeholder instead of the user's dog name
+DEFAULT_DOG_NAME = 'My Dog'
+
+# Connection handling for the edge functions: a fast connect timeout, a bounded
+# read timeout, a few jittered retries for failures that are safe to repeat, and
+# a breaker that skips Supabase for a while after repeated failures
+SUPABASE_CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 3.05))
+SUPABASE_READ_TIMEOUT = float(os.environ.get('SUPABASE_READ_TIMEOUT', 20))
+SUPABASE_RETRIES = int(os.environ.get('SUPABASE_RETRIES', 2))
+SUPABASE_RETRY_BACKOFF = float(os.environ.get('SUPABASE_RETRY_BACKOFF', 0.5))
+SUPABASE_POOL_SIZE = int(os.environ.get('SUPABASE_POOL_SIZE', 10))
+SUPABASE_BREAKER_THRESHOLD = int(os.environ.get('SUPABASE_BREAKER_THRESHOLD', 3))
+SUPABASE_BREAKER_COOLDOWN = float(os.environ.get('SUPABASE_BREAKER_COOLDOWN', 60))
+
+# The edge functions are POSTs that are not idempotent, so only failures where
+# the function cannot have run are repeated: 502/503 come from the gateway
+# before the call reaches a function. A 504 means the gateway stopped waiting
+# on a function that may still finish, so it is not retried.
+RETRYABLE_STATUSES = {502, 503}
+
+def _never_sent(error: Exception) -> bool:
+    """True if a requests ConnectionError was raised before any bytes were sent"""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+    
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # urllib3 wraps the failure in MaxRetryError(reason=...)
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, NewConnectionError)
+
+class SupabaseUnavailable(Exception):
+    """Raised instead of calling Supabase while the circuit breaker is open"""
 
 class SupabaseClient:
     def __init__(self):
@@ -17,7 +67,7 @@ class SupabaseClient:
         self.generate_content_url = os.environ.get('SUPABASE_GENERATE_CONTENT_URL')
         
         if not all([self.supabase_url, self.supabase_anon_key]):
-            print("⚠️  Supabase credentials not found - falling back to local mode")
+            log_event(logger, logging.WARNING, 'supabase_disabled', reason='credentials not found, using local mode')
             self.enabled = False
         else:
             self.enabled = True
@@ -26,6 +76,86 @@ class SupabaseClient:
             'Authorization': f'Bearer {self.supabase_anon_key}',
             'Content-Type': 'application/json'
         }
+        
+        # The session (and requests with it) and the cache are built on first
+        # use, so importing this module stays cheap
+        self._session = LazyService(self._build_session)
+        self.breaker = CircuitBreaker('supabase', SUPABASE_BREAKER_THRESHOLD, SUPABASE_BREAKER_COOLDOWN)
+        
+        self._discover_cache = LazyService(lambda: create_response_cache(
+            'discover_activities', DISCOVER_CACHE_TTL, DISCOVER_CACHE_STALE_TTL, DISCOVER_CACHE_MAX_ENTRIES
+        ))
+    
+    def _build_session(self):
+        """One pooled keep-alive session per process, shared by every request thread"""
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=SUPABASE_POOL_SIZE, pool_maxsize=SUPABASE_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers)
+        return session
+    
+    @property
+    def session(self):
+        return self._session()
+    
+    @property
+    def discover_cache(self):
+        return self._discover_cache()
+    
+    def is_available(self) -> bool:
+        """Configured, and not cooling down after repeated failures"""
+        return self.enabled and self.breaker.is_available()
+    
+    def _post(self, endpoint: str, url: str, payload: Dict[str, Any]) -> 'requests.Response':
+        """
+        POST through the pooled session. Failures before the request is sent
+        (connect timeouts, refused or unresolvable connections) and gateway
+        errors 502/503 are retried with jittered exponential backoff. Resets
+        after sending, read timeouts and 504s are not, since the function may
+        already have run.
+        """
+        import requests
+        
+        if not self.breaker.allow_request():
+            raise SupabaseUnavailable(f"{endpoint} skipped: circuit open after repeated failures")
+        
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(url, json=payload, timeout=(SUPABASE_CONNECT_TIMEOUT, SUPABASE_READ_TIMEOUT))
+                retryable = response.status_code in RETRYABLE_STATUSES
+                error = None
+            except requests.exceptions.ConnectionError as e:
+                if not _never_sent(e):
+                    self.breaker.record_failure()
+                    raise
+                retryable, error = True, e
+            except requests.exceptions.RequestException:
+                self.breaker.record_failure()
+                raise
+            
+            if not retryable:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                return response
+            
+            if attempt >= SUPABASE_RETRIES:
+                self.breaker.record_failure()
+                if error is not None:
+                    raise error
+                return response
+            
+            delay = SUPABASE_RETRY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5)
+            attempt += 1
+            log_event(logger, logging.DEBUG, 'supabase_retry', endpoint=endpoint, attempt=attempt,
+                      delay_ms=int(delay * 1000), reason=str(error) if error else response.status_code)
+            time.sleep(delay)
     
     def build_dog_profile(self, form_data: Dict[str, str]) -> Dict[str, Any]:
         """Convert Flask form data to Supabase dog profile format"""
@@ -80,7 +210,7 @@ class SupabaseClient:
             living_situation = 'House'
             
         return {
-            'name': form_data.get('dog_name', 'My Dog'),
+            'name': form_data.get('dog_name', DEFAULT_DOG_NAME),
             'breed': breed,
             'size': size,
             'age': age,
@@ -94,6 +224,8 @@ class SupabaseClient:
     
     def discover_activities(self, dog_profile: Dict[str, Any], existing_activities: List[Dict] = None, max_activities: int = 4) -> Dict[str, Any]:
         """Call Supabase discover-activities function"""
+        import requests
+        
         if not self.enabled:
             raise Exception("Supabase not configured")
             
@@ -105,12 +237,10 @@ class SupabaseClient:
         }
         
         try:
-            response = requests.post(
-                self.discover_activities_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            response = self._post('discover-activities', self.discover_activities_url, payload)
+            
+            log_event(logger, logging.DEBUG, 'supabase_response', endpoint='discover-activities',
+                      status=response.status_code, elapsed_ms=int(response.elapsed.total_seconds() * 1000))
             
             if response.status_code == 200:
                 data = response.json()
@@ -126,15 +256,42 @@ class SupabaseClient:
                     'activities': []
                 }
                 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, SupabaseUnavailable) as e:
+            # An open circuit was already reported when it opened
+            level = logging.DEBUG if isinstance(e, SupabaseUnavailable) else logging.WARNING
+            log_event(logger, level, 'supabase_request_failed', endpoint='discover-activities', error=str(e))
             return {
                 'success': False,
                 'error': f"Request failed: {str(e)}",
                 'activities': []
             }
     
+    @staticmethod
+    def shared_profile(dog_profile: Dict[str, Any]) -> Dict[str, Any]:
+        """The profile with the dog's name replaced by the placeholder, safe to answer for any user"""
+        return {**dog_profile, 'name': DEFAULT_DOG_NAME}
+    
+    def discover_cache_key(self, dog_profile: Dict[str, Any], max_activities: int = 4) -> str:
+        """Cache key for a profile from build_dog_profile, matching what discover_activities_cached sends"""
+        return cache_key({'profile': self.shared_profile(dog_profile), 'max_activities': max_activities})
+    
+    def discover_activities_cached(self, dog_profile: Dict[str, Any], max_activities: int = 4) -> Dict[str, Any]:
+        """
+        discover_activities through the response cache; failed or empty answers
+        are not cached. The request goes out with the shared profile, so a
+        cached answer never mentions another user's dog.
+        """
+        profile = self.shared_profile(dog_profile)
+        return self.discover_cache.get_or_compute(
+            self.discover_cache_key(profile, max_activities),
+            lambda: self.discover_activities(profile, max_activities=max_activities),
+            should_cache=lambda result: result['success'] and bool(result['activities'])
+        )
+    
     def get_enrichment_coach_advice(self, message: str, dog_profile: Dict[str, Any], activity_context: Dict = None) -> Dict[str, Any]:
         """Get advice from the enrichment coach"""
+        import requests
+        
         if not self.enabled:
             raise Exception("Supabase not configured")
             
@@ -147,12 +304,10 @@ class SupabaseClient:
         }
         
         try:
-            response = requests.post(
-                self.enrichment_coach_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            response = self._post('enrichment-coach', self.enrichment_coach_url, payload)
+            
+            log_event(logger, logging.DEBUG, 'supabase_response', endpoint='enrichment-coach',
+                      status=response.status_code, elapsed_ms=int(response.elapsed.total_seconds() * 1000))
             
             if response.status_code == 200:
                 data = response.json()
@@ -168,7 +323,10 @@ class SupabaseClient:
                     'reply': 'Sorry, I had trouble connecting to the enrichment coach.'
                 }
                 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, SupabaseUnavailable) as e:
+            # An open circuit was already reported when it opened
+            level = logging.DEBUG if isinstance(e, SupabaseUnavailable) else logging.WARNING
+            log_event(logger, level, 'supabase_request_failed', endpoint='enrichment-coach', error=str(e))
             return {
                 'success': False,
                 'error': f"Request failed: {str(e)}",
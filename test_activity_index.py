@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Check that the in-memory activity index returns exactly the candidates
+the original LIKE-based SQL matched, for every combination of form answers.
+"""
+
+import os
+from itertools import product
+from sampling import Sampler
+from testing_utils import temp_database
+
+BREEDS = ['Small breed (under 25 lbs)', 'Medium breed (25-60 lbs)', 'Large breed (60-90 lbs)', 'Giant breed (over 90 lbs)', 'Any dog']
+AGES = ['Puppy (under 1 year)', 'Young adult (1-3 years)', 'Adult (3-7 years)', 'Senior (7+ years)', 'Any age']
+WEATHER = ['Nice weather - outdoor activities preferred', 'Indoor weather - need indoor activities', 'Mixed - indoor and outdoor options']
+ENRICHMENT_TYPES = ['Mental', 'Physical', 'Social', 'Environmental', 'Instinctual', 'Passive', 'Mixed', 'Something else']
+
+def sql_candidates(db, profile):
+    """The matching query find_matching_activities used to run, without the random limit"""
+    breed_pattern = f"%{db.extract_breed_size(profile['breed'])}%"
+    age_pattern = f"%{db.extract_age_group(profile['age'])}%"
+    weather_pattern = f"%{db.extract_weather_preference(profile['weather'])}%"
+    category = db.extract_category(profile['enrichment_type'])
+    
+    query = '''
+        SELECT name FROM activities
+        WHERE (breed_sizes LIKE ? OR breed_sizes LIKE ?)
+        AND (age_groups LIKE ? OR age_groups LIKE ?)
+        AND (weather_suitable LIKE ? OR weather_suitable LIKE ?)
+    '''
+    params = [breed_pattern, '%All%', age_pattern, '%All%', weather_pattern, '%Any%']
+    if category is not None:
+        query += ' AND category = ?'
+        params.append(category)
+    
+    cursor = db.get_connection().cursor()
+    cursor.execute(query, params)
+    return sorted(row[0] for row in cursor.fetchall())
+
+def test_activity_index():
+    print("🔍 Comparing activity index with SQL matching...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        index = db.get_activity_index()
+        
+        checked = 0
+        for breed, age, weather, enrichment_type in product(BREEDS, AGES, WEATHER, ENRICHMENT_TYPES):
+            profile = {'breed': breed, 'age': age, 'weather': weather, 'enrichment_type': enrichment_type}
+            matched = index.match(
+                db.extract_category(enrichment_type),
+                db.extract_breed_size(breed),
+                db.extract_age_group(age),
+                db.extract_weather_preference(weather)
+            )
+            assert sorted(a['name'] for a in matched) == sql_candidates(db, profile), profile
+            checked += 1
+        
+        print(f"✅ {checked} profiles matched identically")
+        
+        # Writes must show up in the next lookup
+        before = len(db.get_activity_index())
+        activity = dict(db.get_initial_activities()[0], name='Index Refresh Check')
+        db.add_activity(activity)
+        assert len(db.get_activity_index()) == before + 1
+        print("✅ Index refreshed after add_activity")
+        
+        # Seeded samplers replay the same picks, and only ever pick candidates
+        profile = {'breed': BREEDS[0], 'age': AGES[0], 'weather': WEATHER[0], 'enrichment_type': 'Mixed'}
+        picks = []
+        for _ in range(2):
+            db.sampler = Sampler(42)
+            picks.append([a['name'] for a in db.find_matching_activities(profile, limit=4)])
+        assert picks[0] == picks[1], picks
+        assert len(set(picks[0])) == len(picks[0])
+        assert set(picks[0]) <= set(sql_candidates(db, profile))
+        print(f"✅ Seeded sampling is reproducible: {picks[0]}")
+
+def test_search_index():
+    print("🔍 Checking full-text activity search...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        assert db.search_enabled, "SQLite build without FTS5"
+        
+        def names(terms, limit=5):
+            return [a['name'] for a in db.search_activities(terms, ('name',), limit)]
+        
+        # Prefix match ('chew' -> 'chewing'), name hits ranked first
+        assert names(['chew'])[0] == 'Benebone or Chew Toy Session', names(['chew'])
+        # Phrase match only where the words are adjacent
+        assert names(['lick mat']) == ['Lick Mat Meditation'], names(['lick mat'])
+        print("✅ Prefix and phrase queries ranked by BM25")
+        
+        # Triggers keep the index in step with inserts, edits and deletes
+        activity = dict(db.get_initial_activities()[0], name='Zebra Stripe Search')
+        db.add_activity(activity)
+        assert names(['zebra']) == ['Zebra Stripe Search']
+        with db.connections.transaction() as conn:
+            conn.execute("UPDATE activities SET name = 'Okapi Search' WHERE name = 'Zebra Stripe Search'")
+        assert names(['zebra']) == [] and names(['okapi']) == ['Okapi Search']
+        with db.connections.transaction() as conn:
+            conn.execute("DELETE FROM activities WHERE name = 'Okapi Search'")
+        assert names(['okapi']) == []
+        print("✅ Index follows inserts, updates and deletes")
+
+def test_embeddings():
+    print("🔍 Checking embedding retrieval...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        index = db.get_activity_index()
+        embeddings = db.get_activity_embeddings(index)
+        if embeddings is None:
+            print("⚠️ numpy not installed, skipping")
+            return
+        
+        assert embeddings.matrix.shape[0] == len(index) and embeddings.matrix.flags['C_CONTIGUOUS']
+        assert os.path.exists(db.embeddings_path)
+        best = [index.activities[p]['name'] for p in embeddings.top_k('a lick mat to settle down', 3)]
+        assert best[0] == 'Lick Mat Meditation', best
+        assert embeddings.top_k('zzzz qqqq', 3) == []
+        print(f"✅ Nearest activities: {best}")
+        
+        # Only the new row is embedded after an insert, and a fresh process reuses the saved file
+        activity = dict(db.get_initial_activities()[0], name='Zebra Stripe Search')
+        db.add_activity(activity)
+        index = db.get_activity_index()
+        embeddings = db.get_activity_embeddings(index)
+        assert embeddings.reembedded == 1 and len(embeddings) == len(index), embeddings.reembedded
+        assert index.activities[embeddings.top_k('zebra stripe', 1)[0]]['name'] == 'Zebra Stripe Search'
+        reopened = temp.open()
+        assert reopened.get_activity_embeddings().reembedded == 0
+        print("✅ Embeddings updated incrementally and reloaded from disk")
+        
+        # Profile matching still only returns candidates, reproducibly
+        profile = {'breed': BREEDS[0], 'age': AGES[0], 'weather': WEATHER[1], 'enrichment_type': 'Mental'}
+        picks = []
+        for _ in range(2):
+            db.sampler = Sampler(42)
+            picks.append([a['name'] for a in db.find_matching_activities(profile, limit=4)])
+        assert picks[0] == picks[1] and set(picks[0]) <= set(sql_candidates(db, profile)), picks
+
+if __name__ == "__main__":
+    test_activity_index()
+    test_search_index()
+    test_embeddings()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+App startup stays cheap: importing app.py opens no database, creates no
+files and imports no OpenAI, scraping, HTTP or numpy libraries, the first
+requests build what they need, and
+the pages and chat routes share one database object. Under gunicorn the
+master builds the snapshot once and rebuilds it on SIGHUP.
+"""
+
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from benchmark_startup import measure_startup
+from preload import memory_usage, request_reload
+from testing_utils import temp_database
+
+def test_lazy_startup():
+    print("🚀 Testing lazy app startup...")
+    
+    result = measure_startup(runs=1)[0]
+    assert not result['built_on_import'], result
+    assert result['heavy_modules'] == [], result
+    # Not even the SQLite response cache file
+    assert result['created_on_import'] == [], result
+    print(f"✅ Fresh import in {result['import'] * 1000:.0f} ms, ready in {result['ready'] * 1000:.0f} ms, "
+          f"nothing built, imported or created on import")
+    
+    import app
+    try:
+        with temp_database() as temp:
+            db = temp.open()
+            assert db.schema_is_current() and db.search_enabled
+            
+            flask_app = app.create_app(db)
+            client = flask_app.test_client()
+            assert client.get('/library').status_code == 200
+            assert client.post('/api/chat', json={'message': 'ideas for my puppy'}).status_code == 200
+            assert app.get_db() is db and flask_app.extensions['chat_assistant'].db is db
+            print("✅ Pages and chat routes share the one database object")
+    finally:
+        app.get_db.reset()
+        app.get_library_cache.reset()
+
+def _wait_for(lines, pattern, count, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        matches = [line for line in list(lines) if re.search(pattern, line)]
+        if len(matches) >= count:
+            return matches
+        time.sleep(0.1)
+    raise AssertionError(f"no {count} x {pattern!r} in:\n" + ''.join(lines))
+
+def test_preforked_workers():
+    print("🍴 Testing gunicorn preload, shared snapshot and reload...")
+    
+    assert memory_usage()['rss'] > 0
+    
+    repo = os.path.dirname(os.path.abspath(__file__))
+    with temp_database() as temp:
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            port = s.getsockname()[1]
+        pidfile = os.path.join(temp.dir, 'gunicorn.pid')
+        # Workers never re-check the data version themselves, so only the reload can show new activities
+        env = dict(os.environ, PYTHONPATH=repo, PORT=str(port), WEB_CONCURRENCY='2',
+                   GUNICORN_PIDFILE=pidfile, DATA_VERSION_CHECK_INTERVAL='3600')
+        server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(repo, 'gunicorn.conf.py'), 'app:app'],
+                                  cwd=temp.dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        lines = []
+        reader = threading.Thread(target=lambda: lines.extend(server.stdout), daemon=True)
+        reader.start()
+        try:
+            snapshot = _wait_for(lines, 'event=snapshot_ready', 1)[0]
+            workers = _wait_for(lines, 'event=worker_ready', 2)
+            assert 'activities=' in snapshot and 'frozen_objects=' in snapshot
+            # The master only notes missing images; no builder thread is forked along
+            assert 'builder_threads=0 ' in snapshot, snapshot
+            assert all('rss_kb=' in line and 'seconds=' in line for line in workers)
+            print(f"✅ Snapshot built in the master before forking: {snapshot.strip()}")
+            for line in workers:
+                print(f"   {line.strip()}")
+            
+            library = f"http://127.0.0.1:{port}/library"
+            assert urllib.request.urlopen(library).status == 200
+            
+            db = temp.open()
+            db.add_activity({'name': 'Preload Reload Scent Trail', 'category': 'Mental',
+                             'description': 'Added while the server runs', 'materials': ['Treats'],
+                             'instructions': ['Lay a trail'], 'safety_notes': 'Supervise', 'estimated_time': '10 minutes'})
+            db.connections.close_all()
+            assert 'Preload Reload Scent Trail' not in urllib.request.urlopen(library).read().decode()
+            
+            assert request_reload(pidfile)
+            reloaded = _wait_for(lines, 'event=snapshot_reloaded', 1)[0]
+            assert 'builder_threads=0 ' in reloaded, reloaded
+            # The old snapshot is unfrozen and collected, not frozen again next to the new one
+            frozen = [int(re.search(r'frozen_objects=(\d+)', line).group(1)) for line in (snapshot, reloaded)]
+            assert frozen[1] < frozen[0] * 1.5, frozen
+            _wait_for(lines, 'event=worker_ready', 4)
+            _wait_for(lines, 'event=worker_exit', 2)
+            assert 'Preload Reload Scent Trail' in urllib.request.urlopen(library).read().decode()
+            print("✅ SIGHUP rebuilt the snapshot and the new workers serve the imported activity")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            reader.join(timeout=5)
+
+if __name__ == "__main__":
+    test_lazy_startup()
+    test_preforked_workers()
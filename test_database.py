@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 
 # Test script to verify the database system works
-from enrichment_database import EnrichmentDatabase
+import json
+import os
+import sqlite3
+import time
+from enrichment_database import EnrichmentDatabase, DuplicateActivityError, DuplicateNamesError
+from migrate_database import merge_duplicates
+from activity_dedup import ActivityDeduplicator, normalize_name
+from testing_utils import temp_database
 
 def test_database():
     print("🐕 Testing Enrichment Database System...\n")
     
-    # Initialize database
-    db = EnrichmentDatabase()
-    
     # Test profiles for different scenarios
     test_profiles = [
         {
@@ -51,20 +55,24 @@ def test_database():
         }
     ]
     
-    # Test each profile
-    for test in test_profiles:
-        print(f"🔍 Testing: {test['name']}")
-        print(f"Profile: {test['profile']}")
-        
-        activities = db.find_matching_activities(test['profile'], limit=4)
+    # Initialize database: a copy, so the tracked file is never migrated
+    with temp_database() as temp:
+        db = temp.open()
         
-        print(f"✅ Found {len(activities)} activities:")
-        for i, activity in enumerate(activities, 1):
-            print(f"  {i}. {activity['name']} ({activity['category']})")
-            print(f"     Time: {activity['estimated_time']}")
-            print(f"     Materials: {', '.join(activity['materials'][:3])}{'...' if len(activity['materials']) > 3 else ''}")
-        
-        print("-" * 60)
+        # Test each profile
+        for test in test_profiles:
+            print(f"🔍 Testing: {test['name']}")
+            print(f"Profile: {test['profile']}")
+            
+            activities = db.find_matching_activities(test['profile'], limit=4)
+            
+            print(f"✅ Found {len(activities)} activities:")
+            for i, activity in enumerate(activities, 1):
+                print(f"  {i}. {activity['name']} ({activity['category']})")
+                print(f"     Time: {activity['estimated_time']}")
+                print(f"     Materials: {', '.join(activity['materials'][:3])}{'...' if len(activity['materials']) > 3 else ''}")
+            
+            print("-" * 60)
     
     print("🎉 Database system test completed!")
     print("\n💡 Benefits of the new system:")
@@ -74,5 +82,113 @@ def test_database():
     print("   ✅ Smart profile matching")
     print("   ✅ Easy to expand with more activities")
 
+def test_add_activities():
+    print("\n📦 Testing bulk activity import...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        cursor = db.get_connection().cursor()
+        
+        def count(name=None):
+            if name is None:
+                return cursor.execute("SELECT COUNT(*) FROM activities").fetchone()[0]
+            return cursor.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (name,)).fetchone()[0]
+        
+        template = db.get_initial_activities()[0]
+        batch = [dict(template, name=f"Bulk Activity {i}") for i in range(2000)]
+        before = count()
+        started = time.perf_counter()
+        result = db.add_activities(batch, chunk_size=300)
+        elapsed = time.perf_counter() - started
+        assert len(result['added']) == 2000 and count() == before + 2000
+        assert db.search_activities(['bulk'], ('name',), 1), "search index missed bulk rows"
+        print(f"✅ 2000 activities in one transaction ({elapsed * 1000:.0f} ms)")
+        
+        # Upsert by name: existing rows are skipped or updated in place
+        edited = dict(template, name='Bulk Activity 7', estimated_time='99 minutes')
+        result = db.add_activities([edited, dict(template, name='Bulk Fresh')], on_conflict='skip')
+        assert result['skipped'] == ['Bulk Activity 7'] and result['added'] == ['Bulk Fresh']
+        (old_id,) = cursor.execute("SELECT id FROM activities WHERE name = 'Bulk Activity 7'").fetchone()
+        result = db.add_activities([edited, dict(edited, name='Bulk New'), dict(edited, name='Bulk New')],
+                                   on_conflict='replace', chunk_size=1)
+        assert result['updated'] == ['Bulk Activity 7', 'Bulk New'] and result['added'] == ['Bulk New']
+        assert count('Bulk Activity 7') == 1 and count('Bulk New') == 1
+        row = cursor.execute("SELECT id, estimated_time FROM activities WHERE name = 'Bulk Activity 7'").fetchone()
+        assert row == (old_id, '99 minutes'), row
+        print("✅ Skip and replace by name")
+        
+        # Names are unique: plain inserts of a known name are refused
+        try:
+            db.add_activity(dict(template, name='Bulk Fresh'))
+            assert False, "expected DuplicateActivityError"
+        except DuplicateActivityError:
+            pass
+        
+        # A malformed activity rolls the whole batch back unless it is skipped
+        broken = {'name': 'Bulk Broken', 'category': 'Mental'}
+        total = count()
+        try:
+            db.add_activities([dict(template, name='Bulk Rollback'), broken])
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        assert count() == total
+        result = db.add_activities([dict(template, name='Bulk Rollback'), broken], skip_invalid=True)
+        assert result['added'] == ['Bulk Rollback'] and result['invalid'][0][0] == 'Bulk Broken'
+        print("✅ Invalid activities roll back or are reported")
+
+def test_activity_dedup():
+    print("\n🔁 Testing duplicate detection...")
+    
+    with temp_database() as temp:
+        
+        # Older databases may hold repeated names: opening refuses to migrate,
+        # and migrate_database.py --merge-duplicates keeps the oldest, exporting the rest
+        conn = sqlite3.connect(temp.path)
+        conn.execute("PRAGMA user_version = 1")
+        conn.execute("DROP INDEX IF EXISTS idx_activities_name")
+        (first_name,) = conn.execute("SELECT name FROM activities ORDER BY id LIMIT 1").fetchone()
+        conn.execute("INSERT INTO activities (name, category) SELECT name, category FROM activities ORDER BY id LIMIT 1")
+        conn.commit()
+        conn.close()
+        try:
+            EnrichmentDatabase(temp.path)
+            raise AssertionError("migration ran with repeated names")
+        except DuplicateNamesError as e:
+            assert e.duplicates == [(first_name, 2)] and first_name in str(e)
+        conn = sqlite3.connect(temp.path)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        assert conn.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (first_name,)).fetchone()[0] == 2
+        conn.close()
+        print("✅ Migration refused to start, nothing deleted")
+        
+        export_path = merge_duplicates(temp.path)
+        with open(export_path, encoding='utf-8') as f:
+            exported = json.load(f)
+        assert [row['name'] for row in exported] == [first_name]
+        db = temp.open()
+        cursor = db.get_connection().cursor()
+        assert cursor.execute("SELECT COUNT(*) FROM activities WHERE name = ?", (first_name,)).fetchone()[0] == 1
+        print(f"✅ --merge-duplicates removed the repeated row (exported to {os.path.basename(export_path)})")
+        
+        dedup = ActivityDeduplicator.from_database(db)
+        template = db.get_initial_activities()[0]
+        assert normalize_name("The Snuffle-Mat Games!") == normalize_name("snuffle mat game") == 'snuffle mat'
+        candidates = [
+            dict(template),                                                  # same name
+            dict(template, name=template['name'].upper() + 's'),             # similar name
+            dict(template, name='Renamed Copy'),                             # same instructions
+            dict(template, name='Brand New Idea', instructions=['Hide kibble under three cups and let your dog choose']),
+            dict(template, name='brand new ideas', instructions=['Something else entirely for the batch check']),
+        ]
+        result = dedup.store(db, candidates)
+        reasons = [match.reason for _, match in result['duplicates']]
+        assert result['added'] == ['Brand New Idea'], result
+        assert reasons == ['name', 'similar name', 'same content', 'similar name'], reasons
+        assert dedup.find({'name': 'Brand New Idea'}).reason == 'name'
+        print(f"✅ Skipped {len(reasons)} duplicates: {', '.join(str(m) for _, m in result['duplicates'])}")
+
 if __name__ == "__main__":
     test_database()
+    test_add_activities()
+    test_activity_dedup()
@@ -11,6 +11,8 @@ sys.path.append('/Users/cherilynwood-game/Desktop/dog-enrichment-app')
 from dotenv import load_dotenv
 load_dotenv()
 
+from testing_utils import temp_database
+
 def test_enhanced_chat():
     """Test the enhanced chat with Supabase integration"""
     print("🤖 Testing Enhanced Chat with Supabase Integration")
@@ -22,58 +24,60 @@ def test_enhanced_chat():
         
         # Initialize chat assistant
         openai_key = os.getenv('OPENAI_API_KEY')
-        chat_assistant = EnrichmentChatAssistant(openai_key)
-        
-        print(f"✅ Chat assistant initialized")
-        print(f"✅ Supabase enabled: {'YES' if supabase_client.enabled else 'NO'}")
-        
-        # Test 1: Basic chat question
-        print("\n🧪 Test 1: Basic enrichment question")
-        test_message = "I have a 4 month old puppy who swallows everything. What safe enrichment activities can I do?"
-        
-        response = chat_assistant.generate_chat_response(test_message)
-        
-        if response['success']:
-            source = response.get('source', 'unknown')
-            print(f"✅ Chat response generated using: {source.upper()}")
-            print(f"📝 Response preview: {response['response'][:100]}...")
-            
-            if 'activities' in response and response['activities']:
-                print(f"🎯 Generated {len(response['activities'])} additional activities")
-        else:
-            print(f"❌ Chat failed: {response.get('error')}")
-        
-        # Test 2: Activity breakdown
-        print("\n🧪 Test 2: Activity breakdown")
-        activity_name = "Frozen Kong Challenge"
-        
-        breakdown_response = chat_assistant.generate_activity_breakdown(activity_name)
-        
-        if breakdown_response['success']:
-            source = breakdown_response.get('source', 'unknown')
-            print(f"✅ Activity breakdown generated using: {source.upper()}")
-            print(f"📋 Activity: {breakdown_response['activity']['name']}")
-            print(f"📝 Breakdown preview: {breakdown_response['breakdown'][:100]}...")
-        else:
-            print(f"❌ Breakdown failed: {breakdown_response.get('error')}")
-        
-        # Test 3: Session profile integration
-        print("\n🧪 Test 3: Session profile integration")
-        
-        # Simulate session data
-        import flask
-        with flask.Flask(__name__).test_request_context():
-            flask.session['dog_profile'] = {
-                'dog_name': 'Buddy',
-                'breed': 'Medium breed (25-60 lbs)',
-                'age': 'Adult (3-7 years)',
-                'energy_level': 'High energy - needs lots of stimulation'
-            }
-            
-            profile = chat_assistant.build_dog_profile_from_session()
-            print(f"✅ Session profile built: {profile['name']} - {profile['breed']} - {profile['energyLevel']} energy")
+        with temp_database() as temp:
+            chat_assistant = EnrichmentChatAssistant(openai_key, get_db=temp.open)
+            
+            print(f"✅ Chat assistant initialized")
+            print(f"✅ Supabase enabled: {'YES' if supabase_client.enabled else 'NO'}")
+            
+            # Test 1: Basic chat question
+            print("\n🧪 Test 1: Basic enrichment question")
+            test_message = "I have a 4 month old puppy who swallows everything. What safe enrichment activities can I do?"
+            
+            response = chat_assistant.generate_chat_response(test_message)
+            
+            if response['success']:
+                source = response.get('source', 'unknown')
+                print(f"✅ Chat response generated using: {source.upper()}")
+                print(f"📝 Response preview: {response['response'][:100]}...")
+                
+                if 'activities' in response and response['activities']:
+                    print(f"🎯 Generated {len(response['activities'])} additional activities")
+            else:
+                print(f"❌ Chat failed: {response.get('error')}")
+            
+            # Test 2: Activity breakdown
+            print("\n🧪 Test 2: Activity breakdown")
+            activity_name = "Frozen Kong Challenge"
+            
+            breakdown_response = chat_assistant.generate_activity_breakdown(activity_name)
+            
+            if breakdown_response['success']:
+                source = breakdown_response.get('source', 'unknown')
+                print(f"✅ Activity breakdown generated using: {source.upper()}")
+                print(f"📋 Activity: {breakdown_response['activity']['name']}")
+                print(f"📝 Breakdown preview: {breakdown_response['breakdown'][:100]}...")
+            else:
+                print(f"❌ Breakdown failed: {breakdown_response.get('error')}")
+            
+            # Test 3: Session profile integration
+            print("\n🧪 Test 3: Session profile integration")
+            
+            # Simulate session data
+            import flask
+            with flask.Flask(__name__).test_request_context():
+                flask.session['dog_profile'] = {
+                    'dog_name': 'Buddy',
+                    'breed': 'Medium breed (25-60 lbs)',
+                    'age': 'Adult (3-7 years)',
+                    'energy_level': 'High energy - needs lots of stimulation'
+                }
+                
+                profile = chat_assistant.build_dog_profile_from_session()
+                print(f"✅ Session profile built: {profile['name']} - {profile['breed']} - {profile['energyLevel']} energy")
+            
+            print("\n🎉 All chat tests completed!")
         
-        print("\n🎉 All chat tests completed!")
         return True
         
     except Exception as e:
@@ -116,9 +120,130 @@ def test_chat_endpoints():
     except ImportError:
         print("⚠️ Requests library not available for endpoint testing")
 
+def test_chat_stream():
+    """Stream a chat reply through /api/chat/stream with the offline fake model"""
+    print("\n📡 Testing streamed chat (fake LLM)")
+    print("=" * 40)
+    
+    import json
+    import flask
+    from chat_assistant import add_chat_routes
+    from llm_stream import FakeLLMClient
+    from supabase_client import supabase_client
+    
+    original_enabled = supabase_client.enabled
+    supabase_client.enabled = False
+    try:
+        with temp_database() as temp:
+            app = flask.Flask(__name__)
+            app.secret_key = 'test'
+            assistant = add_chat_routes(app, None, get_db=temp.open)
+            assistant.client = FakeLLMClient(reply="Try a snuffle mat with soft food.", token_delay=0)
+            
+            response = app.test_client().post('/api/chat/stream', json={'message': 'My puppy swallows everything'})
+            assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+            
+            events = []
+            for frame in response.get_data(as_text=True).strip().split('\n\n'):
+                event_line, data_line = frame.split('\n')
+                events.append((event_line[len('event: '):], json.loads(data_line[len('data: '):])))
+            
+            names = [name for name, _ in events]
+            assert names[0] == 'context' and names[-1] == 'done' and names.count('token') > 1, names
+            reply = ''.join(data['text'] for name, data in events if name == 'token')
+            assert reply == "Try a snuffle mat with soft food.", reply
+            print(f"✅ {names.count('token')} token events, context first, done last")
+    finally:
+        supabase_client.enabled = original_enabled
+
+def test_chat_cache():
+    """Repeated breakdowns and near-identical questions are answered from the cache"""
+    print("\n🗄️ Testing chat and breakdown caches (fake LLM)")
+    print("=" * 40)
+    
+    import chat_cache
+    from chat_assistant import EnrichmentChatAssistant
+    from llm_stream import FakeLLMClient
+    from response_cache import MemoryBackend, ResponseCache
+    from supabase_client import supabase_client
+    
+    class CountingClient(FakeLLMClient):
+        def __init__(self):
+            super().__init__(token_delay=0)
+            self.calls = 0
+            create = self.ChatCompletion.create
+            def counted(**kwargs):
+                self.calls += 1
+                return create(**kwargs)
+            self.ChatCompletion.create = counted
+    
+    original_enabled = supabase_client.enabled
+    supabase_client.enabled = False
+    # Keep the test away from any real cache file
+    chat_cache.get_breakdown_cache.set(ResponseCache('activity_breakdown', MemoryBackend(), 3600))
+    chat_cache.get_chat_cache.set(ResponseCache('chat_replies', MemoryBackend(), 3600))
+    try:
+        with temp_database() as temp:
+            client = CountingClient()
+            assistant = EnrichmentChatAssistant(None, llm_client=client, get_db=temp.open)
+            
+            first = assistant.generate_activity_breakdown("Frozen Kong Challenge")
+            second = assistant.generate_activity_breakdown("Frozen Kong Challenge")
+            assert first['success'] and first['breakdown'] == second['breakdown']
+            assert client.calls == 1, client.calls
+            print("✅ Second breakdown served from cache")
+            
+            # Editing the activity changes its content hash, so the old answer isn't reused
+            activity = assistant.get_activity_from_database("Frozen Kong Challenge")
+            assert chat_cache.breakdown_key(activity, 'local') != chat_cache.breakdown_key(dict(activity, safety_notes='New notes'), 'local')
+            print("✅ Breakdown key follows the activity content")
+            
+            # Coach replies are shared across a profile bucket, so only the bucket is sent upstream
+            profile = supabase_client.build_dog_profile({'dog_name': 'Bella', 'breed': 'Beagle (under 25 lbs)'})
+            shared = chat_cache.bucket_profile(profile)
+            assert set(shared) == set(chat_cache.PROFILE_BUCKET_FIELDS) and 'Bella' not in shared.values()
+            assert chat_cache.profile_bucket(profile) == chat_cache.profile_bucket(dict(profile, name='Rex', breed='Pug'))
+            print("✅ Coach requests carry only the cached profile bucket")
+            
+            assert chat_cache.normalize_query("How do I keep my PUPPY busy?") == chat_cache.normalize_query("how do i keep my puppy busy")
+            # Word order and repeats change the question, so they stay in the key
+            assert chat_cache.normalize_query("walk before feeding") != chat_cache.normalize_query("feeding before walk")
+            assert chat_cache.normalize_query("dog chasing cat") != chat_cache.normalize_query("cat chasing dog")
+            assert chat_cache.normalize_query("very very tired") != chat_cache.normalize_query("very tired")
+            client.calls = 0
+            first = assistant.generate_chat_response("How do I keep my PUPPY busy?")
+            second = assistant.generate_chat_response("how do i keep my puppy busy")
+            assert first['response'] == second['response'] and client.calls == 1, client.calls
+            assert first['conversation_id'] and second['conversation_id']
+            
+            # Follow-ups depend on the conversation, so they always go to the model
+            assistant.generate_chat_response("how do i keep my puppy busy", [{'role': 'user', 'content': 'hi'}])
+            assert client.calls == 2, client.calls
+            print("✅ Near-identical opening questions share one answer")
+    finally:
+        supabase_client.enabled = original_enabled
+        chat_cache.get_breakdown_cache.reset()
+        chat_cache.get_chat_cache.reset()
+
+def test_keyword_matcher():
+    """The rule table extracts exactly what the old if-chain did"""
+    from benchmark_keyword_matcher import SAMPLE_QUERIES, check_equivalence, random_queries
+    from keyword_matcher import keyword_matcher
+    
+    print("\n🔑 Testing Keyword Matcher")
+    print("=" * 50)
+    
+    checked = check_equivalence(SAMPLE_QUERIES + random_queries(500))
+    assert keyword_matcher.keywords("My 4 month old is anxious") == ['puppy', 'senior', 'calming']
+    assert keyword_matcher.intents("quiet puzzle games, no bones please") == ['activity', 'safety']
+    print(f"✅ Same keywords as before for {checked} queries")
+
 if __name__ == "__main__":
     success = test_enhanced_chat()
     test_chat_endpoints()
+    test_chat_stream()
+    test_chat_cache()
+    test_keyword_matcher()
     
     print("\n" + "=" * 60)
     if success:
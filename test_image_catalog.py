@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Image catalog: one manifest, indexes built at load, the same answers the two
+image managers gave, and metadata for placeholders on the pages.
+"""
+
+import os
+import shutil
+import tempfile
+import dog_images
+import image_catalog
+from dog_images import DogImageManager
+from image_catalog import ImageCatalog, get_image_catalog, refresh_metadata
+from image_pipeline import ImagePipeline, StandInSource
+from verified_dog_images import DogOnlyImageManager
+
+def test_image_catalog():
+    print("📚 Testing the image catalog...")
+    
+    catalog = ImageCatalog.load()
+    assert catalog.hero == '/static/images/Morning Diggin.jpg' and catalog.hero not in catalog.urls
+    assert len(catalog.urls) == len(set(catalog.urls)) == len(catalog.records) - 1
+    for index in (catalog.by_enrichment, catalog.by_group, catalog.by_breed, catalog.by_size):
+        assert all(catalog.get(url) for urls in index.values() for url in urls)
+    assert set(catalog.by_size) == {'small', 'medium', 'large'}
+    print(f"✅ {len(catalog.records)} images; groups: {', '.join(sorted(catalog.by_group))}")
+    
+    # The keyword rules get_breed_appropriate_image always used, first match wins
+    for breed_info, group in [('Chihuahua', 'small_dogs'), ('small 4 months puppy', 'small_dogs'),
+                              ('6 months Labrador', 'puppies'), ('Golden Retriever', 'golden_retrievers'),
+                              ('German Shepherd', 'border_collies'), ('large working mix', 'working_dogs'),
+                              ('Beagle', 'mixed_breeds')]:
+        assert catalog.breed_group(breed_info) == group, breed_info
+    image = catalog.breed_image('Golden Retriever')
+    assert image in catalog.by_group['golden_retrievers'] and catalog.breed_image('golden retriever') == image
+    print("✅ Breed queries resolve to the same groups as before")
+    
+    # Both managers are views of the one catalog
+    only = DogOnlyImageManager(catalog=catalog)
+    assert only.verified_dog_images == [catalog.hero, *catalog.urls]
+    manager = DogImageManager(catalog=catalog)
+    assert manager.dog_images['border_collies'] == list(catalog.by_group['border_collies'])
+    assert manager.get_breed_appropriate_image('Golden Retriever') in catalog.by_group['golden_retrievers']
+    assert len({manager.get_random_unused_image() for _ in catalog.urls}) == len(catalog.urls)
+    assert len(set(manager.page_assignments.values())) == len(manager.page_assignments)
+    puppies = catalog.by_group['puppies']
+    assert manager.get_images_by_category('puppies', len(puppies)) == list(puppies)
+    # The shared instance is built on first use, not at import
+    assert dog_images.get_dog_image_manager() is dog_images.get_dog_image_manager()
+    assert dog_images.get_dog_image('hero') == get_image_catalog().hero
+    print("✅ DogImageManager and DogOnlyImageManager share the catalog")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        pipeline = ImagePipeline(temp_dir, StandInSource(size=(600, 400)))
+        refreshed, missing = refresh_metadata(catalog, pipeline)
+        assert missing == []
+        record = refreshed.get(catalog.hero)
+        assert (record.width, record.height) == (600, 400)
+        assert len(record.dominant_color) == 7 and record.dominant_color.startswith('#')
+        assert record.placeholder.startswith('data:image/jpeg;base64,') and len(record.placeholder) < 2000
+        
+        manifest_path = os.path.join(temp_dir, 'image_catalog.json')
+        refreshed.save(manifest_path)
+        assert ImageCatalog.load(manifest_path).records == refreshed.records
+        print(f"✅ Metadata saved in the manifest: {record.dominant_color}, {len(record.placeholder)}-char placeholder")
+        
+        import app
+        flask_app = app.create_app()
+        image_catalog._image_catalog = refreshed
+        html = flask_app.test_client().get('/').get_data(as_text=True)
+        assert 'width="600" height="400"' in html and f"background: {record.dominant_color} url(" in html
+        print("✅ Landing page reserves the hero's size and shows its placeholder")
+    finally:
+        image_catalog._image_catalog = None
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    test_image_catalog()
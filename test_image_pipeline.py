@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Image pipeline: each image is fetched once, its WebP/JPEG variants are
+content-addressed on disk, served from /img with immutable caching, and the
+pages reference them through srcset. Rendering never waits for a build.
+"""
+
+import io
+import os
+import threading
+import time
+from PIL import Image
+from image_pipeline import ImagePipeline, StandInSource
+from library_snapshot import LibraryPageCache
+from testing_utils import temp_database
+
+def test_image_pipeline():
+    print("🖼️ Testing the image pipeline...")
+    import app
+    
+    try:
+        with temp_database() as temp:
+            source = StandInSource(size=(600, 400))
+            pipeline = ImagePipeline(temp.dir, source, widths=(320, 480, 800), quality=75)
+            url = 'https://images.unsplash.com/photo-1551717743-49959800b1f6?w=800&q=80'
+            
+            variants = pipeline.build(url)
+            assert (variants.width, variants.height) == (600, 400)
+            # 800 is wider than the original, so it becomes the original width
+            assert [width for _, width in variants.webp] == [width for _, width in variants.jpeg] == [320, 480, 600]
+            for name, width in variants.webp + variants.jpeg:
+                with Image.open(pipeline.variant_path(name)) as image:
+                    assert image.width == width and image.format == ('WEBP' if name.endswith('.webp') else 'JPEG')
+            assert variants.srcset('webp').startswith('/img/') and variants.srcset('webp').endswith(' 600w')
+            print(f"✅ {len(variants.webp) + len(variants.jpeg)} variants: {variants.srcset('jpeg')}")
+            
+            # Fetched once: a new process (new pipeline) reads the manifest instead
+            assert pipeline.variants(url) is variants
+            reloaded = ImagePipeline(temp.dir, source, widths=(320, 480, 800), quality=75)
+            assert reloaded.variants(url) == variants
+            assert source.fetched == [url]
+            
+            # Same content under another URL shares the same files
+            assert ImagePipeline(temp.dir, lambda _: source(url), widths=(320, 480, 800), quality=75) \
+                .build('/static/images/copy.jpg').jpeg == variants.jpeg
+            assert pipeline.variant_path('../originals/x.jpg') is None
+            print("✅ Fetched once, reused across pipelines, content-addressed")
+            
+            def unavailable(url):
+                raise OSError("offline")
+            failing = ImagePipeline(temp.dir, unavailable)
+            assert failing.build('https://example.com/missing.jpg') is None
+            assert 'https://example.com/missing.jpg' in failing._failed
+            
+            # A miss is queued for the background builder instead of fetched in line,
+            # and a slow image doesn't hold up the build of another one
+            release = threading.Event()
+            slow_source = StandInSource()
+            def gated(url):
+                if 'slow' in url:
+                    release.wait(10)
+                return slow_source(url)
+            gated_pipeline = ImagePipeline(temp.dir, gated)
+            started = time.monotonic()
+            assert gated_pipeline.variants('https://example.com/slow.jpg') is None
+            assert time.monotonic() - started < 0.5 and gated_pipeline.building('https://example.com/slow.jpg')
+            assert gated_pipeline.build('https://example.com/quick.jpg') is not None
+            release.set()
+            assert gated_pipeline.wait(10) and gated_pipeline.variants('https://example.com/slow.jpg') is not None
+            print("✅ Misses are built in the background; different images don't wait for each other")
+            
+            flask_app = app.create_app(temp.open())
+            landing_pipeline = ImagePipeline(temp.dir, StandInSource(), widths=(320, 480, 800))
+            app.get_image_pipeline.set(landing_pipeline)
+            client = flask_app.test_client()
+            assert '<picture>' not in client.get('/').get_data(as_text=True)
+            assert landing_pipeline.wait(30)
+            html = client.get('/').get_data(as_text=True)
+            assert '<picture>' in html and 'type="image/webp"' in html and ' 800w' in html
+            name = html.split('srcset="/img/', 1)[1].split(' ', 1)[0]
+            
+            response = client.get(f'/img/{name}')
+            assert response.status_code == 200 and response.mimetype == 'image/webp'
+            assert 'immutable' in response.headers['Cache-Control'] and 'max-age=31536000' in response.headers['Cache-Control']
+            assert Image.open(io.BytesIO(response.data)).width == 320
+            assert client.get('/img/0123456789abcdef01234567-320q80.jpg').status_code == 404
+            print(f"✅ Landing page uses srcset; /img/{name} served with {response.headers['Cache-Control']}")
+            
+            # A library page rendered with images still pending is only kept briefly
+            library_pipeline = ImagePipeline(os.path.join(temp.dir, 'library'), StandInSource(), widths=(320,))
+            app.get_image_pipeline.set(library_pipeline)
+            library_cache = LibraryPageCache(app.get_db(), app.render_library, provisional_ttl=0.2)
+            app.get_library_cache.set(library_cache)
+            with flask_app.test_request_context('/library'):
+                first = library_cache.get()
+            assert first.expires_at is not None and '/img/' not in first.html
+            assert library_pipeline.wait(30)
+            time.sleep(0.2)
+            assert '/img/' in client.get('/library').get_data(as_text=True)
+            with flask_app.test_request_context('/library'):
+                complete = library_cache.get()
+                assert complete is not first and complete.expires_at is None
+                assert library_cache.get() is complete
+            print("✅ Library page rendered with fallbacks is re-rendered once its images are built")
+    finally:
+        app.get_image_pipeline.reset()
+        app.get_library_cache.reset()
+        app.get_db.reset()
+
+if __name__ == "__main__":
+    test_image_pipeline()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Drop-folder import pipeline: parallel parsing, ordered single-writer inserts,
+per-file failure isolation and the move to processed_activities/, plus the
+streaming parsers the importers read files with.
+"""
+
+import contextlib
+import io
+import mmap
+import os
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from drop_folder_importer import DropFolderImporter
+from improved_importer import ImprovedDropFolderImporter
+from text_importer import TextActivityImporter
+from activity_stream_parser import parse_info_line, stream_simple_activities, stream_text_activities
+from import_pipeline import run_import
+from drop_folder_watcher import watch
+from testing_utils import temp_database
+
+ACTIVITY_FILE = """**{name}**
+**•Materials Needed**
+* Muffin tin
+* Tennis balls
+**•Step-by-Step Instructions**
+1. Put a treat in each cup of the tin
+2. Cover every cup with a tennis ball
+3. Let your dog work out how to uncover the treats ({name} version)
+**•Safety Notes**
+Supervise so the balls are not chewed apart.
+**•Estimated Time**
+10-15 minutes
+"""
+
+# Lines of both formats, plus the edge cases of their section splitting
+PARSER_FRAGMENTS = [
+    '**Sniff Walk Deluxe Edition For Curious Noses**', '**•Materials Needed**', '* treats', '** rope **',
+    '**•Step-by-Step Instructions**', '1. Step one here', '2.  second', '**•Safety Notes**',
+    'Watch your dog closely during play.', '**•Estimated Time**', '10 min', '**•Description**',
+    'A lovely thing to do together', '**x**', '**', '*', '**Name', 'wrap**', '', '   ', '\t',
+    'Chase Me', 'lower case name', '🏃 Physical | ⏱ 5–7 minutes | 🌿 Outdoor | 🔋 Moderate Energy',
+    ' 🏃 Mental', 'Emotional Goal:', "You'll Need:", '• thing', 'Steps:', 'continuation of the step',
+    'A' * 60, '**' + 'B' * 60 + '**  '
+]
+
+# A text-format activity whose name isn't capitalized, so files of it have no headers
+HEADERLESS_ACTIVITY = """sniff-and-find walk
+🏃 Physical | ⏱ 10 minutes | 🌿 Outdoor | 🔋 Moderate Energy
+A slow walk where your dog leads with their nose.
+Emotional Goal:
+Calm, confident exploring.
+You'll Need:
+• A handful of treats
+Steps:
+1. Scatter the treats along the path.
+2. Let your dog sniff them out at their own pace.
+"""
+
+SIMPLE_HEADINGS = [('**•Materials Needed**', 'materials'), ('**•Step-by-Step Instructions**', 'instructions'),
+                   ('**•Safety Notes**', 'safety'), ('**•Estimated Time**', 'time'), ('**•Description**', 'description')]
+
+def reference_simple_activities(content: str, default_category: str, finish=None) -> list:
+    """The importers' original re.split parser of the **Activity Name** format"""
+    activities = []
+    for section in re.split(r'\n(?=\*\*[^*]+\*\*\s*$)', content):
+        section = section.strip()
+        if len(section) < 50:
+            continue
+        lines = [line.strip() for line in section.split('\n') if line.strip()]
+        name_match = re.match(r'\*\*(.+?)\*\*', lines[0])
+        if not name_match:
+            continue
+        name = name_match.group(1).strip()
+        activity = {
+            'name': name, 'category': default_category, 'subcategory': '',
+            'description': f"A {name.lower()} enrichment activity", 'materials': [], 'instructions': [],
+            'safety_notes': '', 'estimated_time': '', 'difficulty_level': 'Medium', 'energy_required': 'Medium',
+            'weather_suitable': 'Any', 'breed_sizes': ['All'], 'age_groups': ['All'], 'tags': []
+        }
+        current_section = None
+        for line in lines[1:]:
+            heading = next((name for prefix, name in SIMPLE_HEADINGS if line.startswith(prefix)), None)
+            if heading:
+                current_section = heading
+            elif current_section == 'materials':
+                if line.startswith('*') and line.replace('*', '').strip():
+                    activity['materials'].append(line.replace('*', '').strip())
+            elif current_section == 'instructions':
+                step_match = re.match(r'^(\d+)\.\s*(.+)$', line)
+                if step_match:
+                    activity['instructions'].append(step_match.group(2))
+            elif current_section == 'safety':
+                if not line.startswith('**'):
+                    activity['safety_notes'] = f"{activity['safety_notes']} {line}" if activity['safety_notes'] else line
+            elif current_section == 'time':
+                if not line.startswith('**'):
+                    activity['estimated_time'] = line
+            elif current_section == 'description':
+                if not line.startswith('**'):
+                    activity['description'] = line
+        activities.append(finish(activity) if finish else activity)
+    return activities
+
+def reference_text_activities(content: str) -> list:
+    """TextActivityImporter's original re.split parser of the "Name / 🏃 info line" format"""
+    activities = []
+    sections = re.split(r'\n(?=[A-Z][^\n]*\n🏃)', content)
+    if len(sections) <= 1:
+        sections = content.split('\n\n')
+    for section in sections:
+        section = section.strip()
+        lines = section.split('\n')
+        if len(section) < 100 or len(lines) < 2 or '🏃' not in lines[1]:
+            continue
+        activity = {
+            'name': lines[0].strip(), 'category': 'Physical', 'subcategory': '', 'description': '',
+            'materials': [], 'instructions': [], 'safety_notes': '', 'estimated_time': '',
+            'difficulty_level': 'Medium', 'energy_required': 'Medium', 'weather_suitable': 'Any',
+            'breed_sizes': ['All'], 'age_groups': ['All'], 'tags': []
+        }
+        activity.update(parse_info_line(lines[1]))
+        if len(lines) > 2:
+            activity['description'] = lines[2].strip()
+        current_section = None
+        for line in lines[3:]:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('Emotional Goal:'):
+                current_section = 'emotional_goal'
+            elif line.startswith("You'll Need:"):
+                current_section = 'materials'
+            elif line.startswith('Steps:'):
+                current_section = 'instructions'
+            elif current_section == 'emotional_goal':
+                activity['description'] = f"{activity['description']} {line}" if activity['description'] else line
+            elif current_section == 'materials':
+                if line.startswith('•') and line.replace('•', '').strip():
+                    activity['materials'].append(line.replace('•', '').strip())
+            elif current_section == 'instructions':
+                if re.match(r'^\d+\.', line):
+                    if re.sub(r'^\d+\.\s*', '', line):
+                        activity['instructions'].append(re.sub(r'^\d+\.\s*', '', line))
+                elif not line.startswith('•') and activity['instructions']:
+                    activity['instructions'][-1] += ' ' + line
+        if activity['name']:
+            activities.append(activity)
+    return activities
+
+def test_import_pipeline():
+    print("🚚 Testing the drop-folder import pipeline...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        drop = os.path.join(temp.dir, 'new_activities')
+        processed = os.path.join(temp.dir, 'processed_activities')
+        importer = DropFolderImporter(drop, processed, db=db)
+        
+        names = [f"Pipeline Puzzle {letter}" for letter in 'ABCDEF']
+        for i, name in enumerate(names):
+            with open(os.path.join(drop, f"{i:02d}_mental.txt"), 'w', encoding='utf-8') as f:
+                f.write(ACTIVITY_FILE.format(name=name))
+        # Unreadable as UTF-8: reported and left in the drop folder
+        with open(os.path.join(drop, '03b_broken.txt'), 'wb') as f:
+            f.write(b'\xff\xfe\xfa not text')
+        # The same activity again is skipped, not an error
+        with open(os.path.join(drop, '99_repeat.txt'), 'w', encoding='utf-8') as f:
+            f.write(ACTIVITY_FILE.format(name=names[0]))
+        
+        files = sorted(importer.drop_folder.glob('*.txt'))
+        report = run_import(importer, files, workers=2, batch_size=2)
+        
+        assert report['added'] == len(names) and report['skipped'] == 1, report
+        assert report['failed_files'] == ['03b_broken.txt'], report['failed_files']
+        assert sorted(os.listdir(drop)) == ['03b_broken.txt']
+        assert len(os.listdir(processed)) == len(names) + 1
+        
+        # Stored in file order, filed under the detected category
+        cursor = db.get_connection().cursor()
+        cursor.execute("SELECT name, category FROM activities WHERE name LIKE 'Pipeline Puzzle %' ORDER BY id")
+        rows = cursor.fetchall()
+        assert [name for name, _ in rows] == names, rows
+        assert {category for _, category in rows} == {'Mental'}
+        print(f"✅ {report['added']} activities from {report['imported_files']} files, broken file isolated")
+
+def test_drop_folder_watcher():
+    print("👀 Testing the drop-folder watcher...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        cursor = db.get_connection().cursor()
+        
+        for poll in (False, True):
+            label = 'polling' if poll else 'inotify'
+            drop = os.path.join(temp.dir, f'new_{label}')
+            importer = DropFolderImporter(drop, os.path.join(temp.dir, f'processed_{label}'), db=db)
+            # Already waiting when the watcher starts
+            with open(os.path.join(drop, 'early.txt'), 'w', encoding='utf-8') as f:
+                f.write(ACTIVITY_FILE.format(name=f'Watched Early {label}'))
+            
+            stop = threading.Event()
+            thread = threading.Thread(target=watch, args=(importer, poll, 1, 0.2, stop))
+            thread.start()
+            try:
+                time.sleep(0.3)
+                with open(os.path.join(drop, 'late.txt'), 'w', encoding='utf-8') as f:
+                    f.write(ACTIVITY_FILE.format(name=f'Watched Late {label}'))
+                
+                deadline = time.monotonic() + 10
+                while os.listdir(drop) and time.monotonic() < deadline:
+                    time.sleep(0.1)
+            finally:
+                stop.set()
+                thread.join()
+            
+            cursor.execute("SELECT COUNT(*) FROM activities WHERE name LIKE ?", (f'Watched % {label}',))
+            assert cursor.fetchone()[0] == 2 and not os.listdir(drop), label
+            print(f"✅ {label}: waiting and newly written files imported")
+
+def test_streaming_import():
+    print("📦 Testing imports that stream files in parts...")
+    
+    with temp_database() as temp:
+        db = temp.open()
+        cursor = db.get_connection().cursor()
+        
+        # Headerless text exports: split on blank lines and stored a batch at a
+        # time, so the peak is one batch whatever the file size
+        importer = TextActivityImporter(db)
+        importer.dedup  # loaded before measuring
+        peaks = {}
+        for copies in (3000, 15000):
+            path = os.path.join(temp.dir, f'export_{copies}.txt')
+            with open(path, 'w', encoding='utf-8') as f:
+                for _ in range(copies):
+                    f.write(HEADERLESS_ACTIVITY + '\n')
+            output_path = os.path.join(temp.dir, 'output.txt')
+            with open(output_path, 'w', encoding='utf-8') as output, contextlib.redirect_stdout(output):
+                tracemalloc.start()
+                importer.import_text_file(path)
+                _, peaks[copies] = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            with open(output_path, encoding='utf-8') as f:
+                output = f.read()
+            assert f"Found {copies} activities" in output, output[-500:]
+        cursor.execute("SELECT COUNT(*) FROM activities WHERE name = 'sniff-and-find walk'")
+        assert cursor.fetchone()[0] == 1
+        size = os.path.getsize(path)
+        assert peaks[15000] < peaks[3000] * 1.2 and peaks[15000] < size / 2, (peaks, size)
+        print(f"✅ {size / 1e6:.1f} MB headerless file imported with a {peaks[15000] / 1e3:.0f} KB peak "
+              f"({peaks[3000] / 1e3:.0f} KB for a fifth of it)")
+        
+        # Drop-folder files are stored a part at a time and moved after their last part
+        class GeneratedImporter(DropFolderImporter):
+            fail_after = None
+            
+            def parse_file(self, file_path):
+                def activities():
+                    for i in range(12):
+                        if i == self.fail_after:
+                            raise ValueError("truncated file")
+                        yield dict(reference_simple_activities(ACTIVITY_FILE.format(name=f"Part {i}"), 'Mental')[0],
+                                   category='Mental')
+                return 'Mental', activities()
+        
+        drop = os.path.join(temp.dir, 'new_activities')
+        generated = GeneratedImporter(drop, os.path.join(temp.dir, 'processed_activities'), db=db)
+        with open(os.path.join(drop, 'parts.txt'), 'w', encoding='utf-8') as f:
+            f.write('generated')
+        generated.fail_after = 7
+        report = run_import(generated, [generated.drop_folder / 'parts.txt'], workers=1, batch_size=5)
+        # The first part was committed; the file stays until it parses through
+        assert report['added'] == 5 and report['failed_files'] == ['parts.txt'], report
+        assert os.listdir(drop) == ['parts.txt']
+        generated.fail_after = None
+        report = run_import(generated, [generated.drop_folder / 'parts.txt'], workers=1, batch_size=5)
+        assert (report['added'], report['skipped'], report['parsed']) == (7, 5, 12), report
+        assert os.listdir(drop) == [] and report['imported_files'] == 1
+        cursor.execute("SELECT COUNT(*) FROM activities WHERE name LIKE 'Part %'")
+        assert cursor.fetchone()[0] == 12
+        print("✅ 12 activities in parts of 5; a file failing halfway is resumed by the next run")
+
+def test_stream_parsers():
+    print("🌊 Testing the streaming parsers against the original string parsers...")
+    
+    drop, improved, text = DropFolderImporter.__new__(DropFolderImporter), \
+        ImprovedDropFolderImporter.__new__(ImprovedDropFolderImporter), TextActivityImporter()
+    rng = random.Random(20)
+    parsed = 0
+    for _ in range(3000):
+        content = (rng.choice(['', '\n', '  \n']) + '\n'.join(rng.choice(PARSER_FRAGMENTS) for _ in range(rng.randint(0, 25)))
+                   + rng.choice(['', '\n', '\n\n', ' ', '\n  \n']))
+        # The importers' string parsers run the streaming ones over io.StringIO
+        assert drop.parse_activities_from_content(content) \
+            == reference_simple_activities(content, 'Mental', drop.set_intelligent_defaults), content
+        assert improved.parse_simple_format(content) == reference_simple_activities(content, 'Physical'), content
+        expected = reference_text_activities(content)
+        assert text.parse_activity_text(content) == expected, content
+        parsed += len(expected)
+    print(f"✅ Identical results for 3000 generated files ({parsed} text-format activities)")
+    
+    with open('paste.txt', encoding='utf-8') as f:
+        paste = f.read()
+    expected = reference_text_activities(paste)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        # Windows line endings through an mmap
+        path = os.path.join(temp_dir, 'paste.txt')
+        with open(path, 'wb') as f:
+            f.write(paste.replace('\n', '\r\n').encode('utf-8'))
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            assert list(stream_text_activities(mapped)) == expected
+        print(f"✅ paste.txt via mmap: {len(expected)} activities")
+        
+        # A large export: parser memory stays flat while activities stream out
+        with open(path, 'w', encoding='utf-8') as f:
+            for copy in range(300):
+                f.write(paste.replace('\n\n', f' ({copy})\n\n'))
+        size = os.path.getsize(path)
+        tracemalloc.start()
+        with open(path, encoding='utf-8') as f:
+            count = sum(1 for _ in stream_text_activities(f))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert count == 300 * len(expected) and peak < size / 20, (count, peak, size)
+        print(f"✅ {size / 1e6:.1f} MB file: {count} activities, {peak / 1e3:.0f} KB peak")
+    finally:
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    test_import_pipeline()
+    test_drop_folder_watcher()
+    test_streaming_import()
+    test_stream_parsers()
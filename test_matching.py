@@ -4,15 +4,12 @@ import sys
 import os
 sys.path.append('/Users/cherilynwood-game/Desktop/dog-enrichment-app')
 
-from enrichment_database import EnrichmentDatabase
+from testing_utils import temp_database
 
 def test_activity_matching():
     """Test the improved activity matching"""
     print("Testing improved activity matching...")
     
-    # Initialize database
-    db = EnrichmentDatabase()
-    
     # Test different scenarios
     test_scenarios = [
         {
@@ -50,32 +47,36 @@ def test_activity_matching():
         }
     ]
     
-    for scenario in test_scenarios:
-        print(f"\n{'='*60}")
-        print(f"Testing: {scenario['name']}")
-        print(f"Expected category: {scenario['expected_category']}")
-        print(f"Profile: {scenario['profile']['breed']}, {scenario['profile']['age']}")
-        print(f"Weather: {scenario['profile']['weather']}")
-        print(f"Type: {scenario['profile']['enrichment_type']}")
-        
-        # Test the matching
-        activities = db.find_matching_activities(scenario['profile'], limit=4)
-        
-        print(f"\nFound {len(activities)} activities:")
-        correct_category = 0
-        for activity in activities:
-            category_match = "✅" if activity['category'] == scenario['expected_category'] else "❌"
-            print(f"  {category_match} {activity['name']} ({activity['category']})")
-            if activity['category'] == scenario['expected_category']:
-                correct_category += 1
-        
-        success_rate = (correct_category / len(activities) * 100) if activities else 0
-        print(f"\nSuccess rate: {success_rate:.0f}% ({correct_category}/{len(activities)} correct category)")
+    # Initialize database (a copy, so the tracked file is left alone)
+    with temp_database() as temp:
+        db = temp.open()
         
-        if success_rate >= 75:
-            print("✅ PASS - Good category matching")
-        else:
-            print("❌ FAIL - Poor category matching")
+        for scenario in test_scenarios:
+            print(f"\n{'='*60}")
+            print(f"Testing: {scenario['name']}")
+            print(f"Expected category: {scenario['expected_category']}")
+            print(f"Profile: {scenario['profile']['breed']}, {scenario['profile']['age']}")
+            print(f"Weather: {scenario['profile']['weather']}")
+            print(f"Type: {scenario['profile']['enrichment_type']}")
+            
+            # Test the matching
+            activities = db.find_matching_activities(scenario['profile'], limit=4)
+            
+            print(f"\nFound {len(activities)} activities:")
+            correct_category = 0
+            for activity in activities:
+                category_match = "✅" if activity['category'] == scenario['expected_category'] else "❌"
+                print(f"  {category_match} {activity['name']} ({activity['category']})")
+                if activity['category'] == scenario['expected_category']:
+                    correct_category += 1
+            
+            success_rate = (correct_category / len(activities) * 100) if activities else 0
+            print(f"\nSuccess rate: {success_rate:.0f}% ({correct_category}/{len(activities)} correct category)")
+            
+            if success_rate >= 75:
+                print("✅ PASS - Good category matching")
+            else:
+                print("❌ FAIL - Poor category matching")
 
 if __name__ == "__main__":
     test_activity_matching()
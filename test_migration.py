@@ -66,22 +66,23 @@ def test_fallback_system():
     supabase_client.enabled = False
     
     try:
-        from enrichment_database import EnrichmentDatabase
-        db = EnrichmentDatabase()
-        
-        test_profile = {
-            'breed': 'Medium breed (25-60 lbs)',
-            'age': 'Adult (3-7 years)',
-            'energy_level': 'High energy - needs lots of stimulation',
-            'weather': 'Nice weather - outdoor activities preferred',
-            'enrichment_type': 'Physical Enrichment - Exercise and movement activities'
-        }
-        
-        activities = db.find_matching_activities(test_profile, limit=2)
-        print(f"   ✅ Local database returned {len(activities)} activities")
-        
-        if activities:
-            print(f"   Sample activity: '{activities[0]['name']}' ({activities[0]['category']})")
+        from testing_utils import temp_database
+        with temp_database() as temp:
+            db = temp.open()
+            
+            test_profile = {
+                'breed': 'Medium breed (25-60 lbs)',
+                'age': 'Adult (3-7 years)',
+                'energy_level': 'High energy - needs lots of stimulation',
+                'weather': 'Nice weather - outdoor activities preferred',
+                'enrichment_type': 'Physical Enrichment - Exercise and movement activities'
+            }
+            
+            activities = db.find_matching_activities(test_profile, limit=2)
+            print(f"   ✅ Local database returned {len(activities)} activities")
+            
+            if activities:
+                print(f"   Sample activity: '{activities[0]['name']}' ({activities[0]['category']})")
         
     except Exception as e:
         print(f"   ❌ Local fallback failed: {str(e)}")
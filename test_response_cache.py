@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Check the response cache: hits and misses, LRU eviction, stale-while-revalidate
+and the shared SQLite backend.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+from response_cache import ResponseCache, MemoryBackend, SQLiteBackend, cache_key
+
+def check_backend(make_backend, label):
+    print(f"\n🔍 {label} backend")
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        return {'success': True, 'activities': [f"answer {len(calls)}"]}
+    
+    cache = ResponseCache('discover_test', make_backend(), ttl=60)
+    key = cache_key({'size': 'Small', 'ageGroup': 'Puppy'})
+    assert key == cache_key({'ageGroup': 'Puppy', 'size': 'Small'})
+    
+    first = cache.get_or_compute(key, compute)
+    second = cache.get_or_compute(key, compute)
+    assert first == second and len(calls) == 1
+    assert cache.stats['misses'] == 1 and cache.stats['hits'] == 1
+    print("✅ Second lookup served from cache")
+    
+    # Failed answers are returned but never stored
+    failure = cache.get_or_compute('other', lambda: {'success': False}, should_cache=lambda r: r['success'])
+    assert failure == {'success': False} and cache.get('other') is None
+    print("✅ Failures not cached")
+    
+    # Expired entries are served stale while one background refresh runs
+    cache.ttl, cache.stale_ttl = 0, 60
+    refreshed = threading.Event()
+    
+    def slow_compute():
+        time.sleep(0.05)
+        result = compute()
+        refreshed.set()
+        return result
+    
+    stale = cache.get_or_compute(key, slow_compute)
+    assert stale == first, stale
+    assert cache.stats['stale_hits'] == 1
+    assert refreshed.wait(2)
+    time.sleep(0.05)
+    cache.ttl = 60
+    assert cache.get(key)['activities'] == ['answer 2'], cache.get(key)
+    print("✅ Stale entry served, then refreshed in the background")
+    
+    stats = cache.get_stats()
+    print(f"📊 {stats}")
+    assert stats['entries'] == 1
+
+def test_response_cache():
+    check_backend(lambda: MemoryBackend(max_entries=8), 'Memory')
+    
+    # LRU eviction keeps the most recently used entries
+    backend = MemoryBackend(max_entries=2)
+    backend.set('a', 1, time.time())
+    backend.set('b', 2, time.time())
+    backend.get('a')
+    backend.set('c', 3, time.time())
+    assert backend.get('b') is None and backend.get('a') is not None
+    print("✅ Memory LRU evicts the least recently used entry")
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'response_cache.db')
+        check_backend(lambda: SQLiteBackend(path, 'discover_test', max_entries=8), 'SQLite')
+        
+        # Another backend on the same file (as in a second worker) sees the entries
+        other = SQLiteBackend(path, 'discover_test')
+        assert other.size() == 1
+        print("✅ SQLite entries shared across backends on one file")
+        
+        small = SQLiteBackend(path, 'lru_test', max_entries=2)
+        for key in ('a', 'b', 'c'):
+            small.set(key, key, time.time())
+            time.sleep(0.01)
+        assert small.size() == 2 and small.get('a') is None
+        print("✅ SQLite LRU evicts beyond max_entries")
+        
+        small.connections.close_all()
+    finally:
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    test_response_cache()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Image assignment is a fixed function of the context: the same in every
+process, distinct within a page, and free of per-request state.
+"""
+
+import os
+import subprocess
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from image_catalog import ImageCatalog
+from verified_dog_images import PAGE_CONTEXTS, DogOnlyImageManager
+
+def test_image_assignment():
+    print("🐕 Testing deterministic dog image assignment...")
+    
+    manager = DogOnlyImageManager()
+    assert manager.get_unique_dog_image('hero') == '/static/images/Morning Diggin.jpg'
+    assert manager.hero_image not in manager.pool
+    
+    for page, contexts in PAGE_CONTEXTS.items():
+        images = [manager.get_unique_dog_image(context) for context in contexts]
+        assert len(set(images)) == min(len(contexts), len(manager.pool)), page
+        print(f"✅ {page}: {len(set(images))} distinct images for {len(contexts)} slots")
+    assert manager.get_multiple_unique_images(6, 'library_mental') == [
+        manager.get_unique_dog_image(f'library_mental_{i}') for i in range(6)
+    ]
+    
+    # A page with more slots than images repeats none before using them all
+    library = Counter(manager.get_unique_dog_image(context) for context in PAGE_CONTEXTS['library'])
+    assert len(library) == min(len(manager.pool), len(PAGE_CONTEXTS['library']))
+    assert max(library.values()) - min(library.values()) <= 1, library
+    
+    # Unbounded contexts are hashed, never stored
+    state = dict(vars(manager))
+    breeds = [f'results_breed_{i}' for i in range(5000)]
+    images = [manager.get_unique_dog_image(context) for context in breeds]
+    assert vars(manager) == state and len(manager.assignments) == len(state['assignments'])
+    assert set(images) <= set(manager.pool)
+    print(f"✅ {len(breeds)} result contexts looked up, {len(manager.assignments)} assignments kept")
+    
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert list(executor.map(manager.get_unique_dog_image, breeds)) == images
+    assert DogOnlyImageManager().assignments == manager.assignments
+    assert DogOnlyImageManager(seed='other').assignments != manager.assignments
+    
+    # Separate processes (different hash randomization) agree
+    script = ("from verified_dog_images import DogOnlyImageManager; m = DogOnlyImageManager(); "
+              "print(m.get_unique_dog_image('results_Beagle'), m.get_unique_dog_image('library_social_2'))")
+    repo = os.path.dirname(os.path.abspath(__file__))
+    outputs = {
+        subprocess.run([sys.executable, '-c', script], cwd=repo, capture_output=True, text=True, check=True,
+                       env=dict(os.environ, PYTHONHASHSEED=str(seed))).stdout
+        for seed in (1, 2)
+    }
+    assert outputs == {f"{manager.get_unique_dog_image('results_Beagle')} "
+                       f"{manager.get_unique_dog_image('library_social_2')}\n"}
+    print("✅ Same images from threads, new instances and other processes")
+    
+    # Adding an image to the catalog leaves most assignments where they were
+    added = manager.catalog.records[-1]._replace(url='/static/images/added.jpg', hero=False)
+    grown = DogOnlyImageManager(catalog=ImageCatalog([*manager.catalog.records, added]))
+    moved = [context for context in breeds if grown.get_unique_dog_image(context) != manager.get_unique_dog_image(context)]
+    assert all(grown.get_unique_dog_image(context) == added.url for context in moved)
+    assert len(moved) < len(breeds) / 10, len(moved)
+    moved_slots = [context for context in manager.assignments if grown.assignments[context] != manager.assignments[context]]
+    assert len(moved_slots) < len(manager.assignments) / 2, moved_slots
+    print(f"✅ One more image moves {len(moved)}/{len(breeds)} result contexts and "
+          f"{len(moved_slots)}/{len(manager.assignments)} page slots")
+
+if __name__ == "__main__":
+    test_image_assignment()
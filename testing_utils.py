@@ -0,0 +1,52 @@
+"""
+Shared helpers for the test scripts
+
+Tests never open the tracked enrichment_activities.db: opening it migrates
+the schema and switches it to WAL, which would leave the worktree dirty.
+temp_database() hands out a copy in a temporary directory instead.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from enrichment_database import EnrichmentDatabase
+
+SOURCE_DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'enrichment_activities.db')
+
+class TempDatabase:
+    """A copy of enrichment_activities.db in its own temporary directory"""
+    
+    def __init__(self, directory: str):
+        self.dir = directory
+        self.path = os.path.join(directory, 'enrichment_activities.db')
+        shutil.copy(SOURCE_DATABASE, self.path)
+        self._opened: List[EnrichmentDatabase] = []
+    
+    def open(self) -> EnrichmentDatabase:
+        """An EnrichmentDatabase on the copy; its connections are closed when the block ends"""
+        db = EnrichmentDatabase(self.path)
+        self._opened.append(db)
+        return db
+    
+    def close(self):
+        for db in self._opened:
+            db.connections.close_all()
+
+@contextmanager
+def temp_database() -> Iterator[TempDatabase]:
+    """
+    with temp_database() as temp:
+        db = temp.open()   # temp.path is the copy, temp.dir is free for other files
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        temp = TempDatabase(directory)
+        try:
+            yield temp
+        finally:
+            temp.close()
+    finally:
+        shutil.rmtree(directory)
@@ -3,111 +3,90 @@ HIGH-QUALITY DOG-ONLY IMAGE COLLECTION
 Every image verified to contain ONLY dogs, no humans, no cats, high quality.
 """
 
-import random
-from typing import List, Dict
+import threading
+from types import MappingProxyType
+from typing import List, Optional
+
+from image_catalog import ImageCatalog, get_image_catalog, stable_hash
+
+CATEGORIES = ['mental', 'physical', 'social', 'environmental', 'instinctual', 'passive']
+
+# Contexts rendered together on one page (see app.py)
+PAGE_CONTEXTS = {
+    'landing': [f'{category}_landing' for category in CATEGORIES],
+    'library': [f'library_{category}_{i}' for category in CATEGORIES for i in range(6)]
+}
 
 class DogOnlyImageManager:
-    def __init__(self):
-        # VERIFIED DOG-ONLY IMAGES - Each URL manually checked
-        self.verified_dog_images = [
-            # HERO IMAGE - Your custom digging dog (Instinctual Enrichment)
-            '/static/images/Morning Diggin.jpg',  # Your custom digging dog image
-            
-            # Border Collies & Smart Dogs (Mental Enrichment)
-            'https://images.unsplash.com/photo-1551717743-49959800b1f6?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Border Collie with puzzle
-            'https://images.unsplash.com/photo-1605568427561-40dd23c2acea?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Border Collie thinking
-            'https://images.unsplash.com/photo-1587300003388-59208cc962cb?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Smart dog focused
-            
-            # Golden Retrievers & Active Dogs (Physical Enrichment)
-            'https://images.unsplash.com/photo-1552053831-71594a27632d?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Golden running
-            'https://images.unsplash.com/photo-1517849845537-4d257902454a?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Happy Golden
-            'https://images.unsplash.com/photo-1518717758536-85ae29035b6d?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Golden outdoors
-            'https://images.unsplash.com/photo-1593134257782-e89567b7718a?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Golden portrait
-            
-            # Friendly Dogs (Social Enrichment)
-            'https://images.unsplash.com/photo-1477884213360-7e9d7dcc1e48?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Friendly dog close-up
-            'https://images.unsplash.com/photo-1544717297-fa95b6ee9643?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Social dog playing
-            'https://images.unsplash.com/photo-1583511655857-d19b40a7a54e?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Happy social dog
-            
-            # Working Dogs (Environmental Enrichment)
-            'https://images.unsplash.com/photo-1589941013453-ec89f33b5e95?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # German Shepherd
-            'https://images.unsplash.com/photo-1623387641168-d9803ddd3f35?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Working dog outdoors
-            'https://images.unsplash.com/photo-1601758228041-f3b2795255f1?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Dog exploring
-            
-            # Small Dogs (Passive Enrichment)
-            'https://images.unsplash.com/photo-1534361960057-19889db9621e?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Small calm dog
-            'https://images.unsplash.com/photo-1543466835-00a7907e9de1?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Small dog peaceful
-            'https://images.unsplash.com/photo-1558618666-fcd25c85cd64?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Small dog relaxed
-            
-            # Additional Diverse Dogs 
-            'https://images.unsplash.com/photo-1548199973-03cce0bbc87b?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Dog portrait
-            'https://images.unsplash.com/photo-1561037404-61cd46aa615b?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Beautiful dog
-            'https://images.unsplash.com/photo-1583512603805-3cc6b41f3edb?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Cute dog
-            'https://images.unsplash.com/photo-1537151625747-768eb6cf92b2?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Happy dog
-            'https://images.unsplash.com/photo-1588943211346-0908a1fb0b01?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Dog with toy
-            'https://images.unsplash.com/photo-1574144611937-0df059b5ef3e?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Playful dog
-            'https://images.unsplash.com/photo-1583337130417-3346a1be7dee?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Active dog
-            'https://images.unsplash.com/photo-1586671267731-da2cf3ceeb80?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Beautiful dog portrait
-            'https://images.unsplash.com/photo-1551698618-1dfe5d97d256?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Dog in nature
-            'https://images.unsplash.com/photo-1592754862816-1a21a4ea2281?ixlib=rb-4.0.3&auto=format&fit=crop&w=800&q=80',  # Energetic dog
-        ]
-        
-        # Shuffle to randomize
-        random.shuffle(self.verified_dog_images)
+    def __init__(self, seed: str = '', catalog: Optional[ImageCatalog] = None):
+        # VERIFIED DOG-ONLY IMAGES - the hero (custom digging dog) first; see image_catalog.json
+        self.catalog = catalog or get_image_catalog()
+        self.verified_dog_images = [self.catalog.hero, *self.catalog.urls]
         
-        # Track used images globally
-        self.used_images = set()
+        self.hero_image = self.verified_dog_images[0]
+        self.seed = seed
         
-        # Page assignments to ensure no repeats
-        self.page_assignments = {}
+        # Every image but the hero. Contexts pick from it by rendezvous
+        # (highest-random-weight) hashing: each context ranks the images by a
+        # hash of (seed, context, image), which every worker and restart
+        # agrees on. Adding an image only moves the contexts that now rank it
+        # highest (and, on a page, the few later contexts they displace);
+        # removing one only moves the contexts that had it.
+        self.pool = tuple(self.verified_dog_images[1:])
         
+        # Contexts on the same page take, in order, their best-ranked image not
+        # yet used on the page. A page with more contexts than the pool has
+        # images (the library has 36 slots) starts over once every image is
+        # used, so no image repeats before all have appeared, and repeats stay
+        # a whole pool apart. Computed once; nothing is written after this, so
+        # lookups need no lock.
+        assignments = {'hero': self.hero_image}
+        for contexts in PAGE_CONTEXTS.values():
+            used = set()
+            for context in contexts:
+                if len(used) == len(self.pool):
+                    used.clear()
+                assignments[context] = next(image for image in self._ranked(context) if image not in used)
+                used.add(assignments[context])
+        self.assignments = MappingProxyType(assignments)
+    
+    def _ranked(self, context: str) -> List[str]:
+        """The pool, best image for context first"""
+        return sorted(self.pool, key=lambda image: stable_hash(f"{self.seed}:{context}:{image}"), reverse=True)
+    
     def get_unique_dog_image(self, context: str = "") -> str:
-        """Get a unique dog image that hasn't been used yet"""
-        
-        # If we already assigned an image for this context, return it
-        if context in self.page_assignments:
-            return self.page_assignments[context]
-        
-        # Special case: Always use your custom digging dog for hero
-        if context == 'hero':
-            hero_image = '/static/images/Morning Diggin.jpg'
-            self.page_assignments[context] = hero_image
-            self.used_images.add(hero_image)
-            return hero_image
-        
-        # Find an unused image (excluding the hero image for other contexts)
-        available_images = [img for img in self.verified_dog_images[1:] if img not in self.used_images]  # Skip hero image
-        
-        # If all images used, reset but keep existing assignments
-        if not available_images:
-            self.used_images = set(self.page_assignments.values())
-            available_images = [img for img in self.verified_dog_images[1:] if img not in self.used_images]
-        
-        # Select and assign image
-        if available_images:
-            selected_image = available_images[0]  # Take first unused
-            self.used_images.add(selected_image)
-            self.page_assignments[context] = selected_image
-            return selected_image
-        
-        # Fallback (should never happen)
-        return self.verified_dog_images[1]  # Skip hero image
+        """
+        The image for context: always the same one. Distinct from the rest of
+        its page while the pool lasts; the catalog's 26 non-hero images don't
+        cover the library's 36 slots, so there the last ten repeat images
+        from the top of the page.
+        """
+        image = self.assignments.get(context)
+        if image is not None:
+            return image
+        # Any other context (e.g. results_{breed}) is hashed, not remembered
+        return max(self.pool, key=lambda image: stable_hash(f"{self.seed}:{context}:{image}"))
     
     def get_multiple_unique_images(self, count: int, prefix: str = "") -> List[str]:
-        """Get multiple unique dog images"""
-        images = []
-        for i in range(count):
-            context = f"{prefix}_{i}"
-            images.append(self.get_unique_dog_image(context))
-        return images
+        """Images for contexts prefix_0 .. prefix_{count - 1}"""
+        return [self.get_unique_dog_image(f"{prefix}_{i}") for i in range(count)]
+
+# Global instance, created on first use rather than at import
+_dog_only_manager = None
+_manager_lock = threading.Lock()
 
-# Global instance
-dog_only_manager = DogOnlyImageManager()
+def get_dog_only_manager() -> DogOnlyImageManager:
+    global _dog_only_manager
+    if _dog_only_manager is None:
+        with _manager_lock:
+            if _dog_only_manager is None:
+                _dog_only_manager = DogOnlyImageManager()
+    return _dog_only_manager
 
 def get_unique_dog_image(context: str = "") -> str:
     """Get a unique, verified dog-only image"""
-    return dog_only_manager.get_unique_dog_image(context)
+    return get_dog_only_manager().get_unique_dog_image(context)
 
 def get_multiple_unique_dog_images(count: int, prefix: str = "") -> List[str]:
     """Get multiple unique dog images"""
-    return dog_only_manager.get_multiple_unique_images(count, prefix)
+    return get_dog_only_manager().get_multiple_unique_images(count, prefix)